@@ -0,0 +1,65 @@
+"""Measure the import time of the lghorizon package.
+
+Every statement is timed in a fresh interpreter, so nothing is cached
+between runs. Usage: python benchmarks/import_time.py [--runs 20]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STATEMENTS = {
+    "package": "import lghorizon",
+    "const": "from lghorizon.const import COUNTRY_SETTINGS",
+    "exceptions": "from lghorizon.exceptions import LGHorizonApiConnectionError",
+    "api": "from lghorizon import LGHorizonApi",
+}
+
+HEAVY_MODULES = ["paho.mqtt.client", "requests", "backoff", "lghorizon.models"]
+
+_probe = """
+import sys, time, json
+start = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"elapsed": elapsed, "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def measure(statement: str, runs: int):
+    """Return the timings and the heavy modules loaded by a statement."""
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    timings = []
+    loaded = []
+    for _ in range(runs):
+        output = subprocess.check_output(
+            [sys.executable, "-c", _probe.format(statement=statement, heavy=HEAVY_MODULES)],
+            env=env,
+        )
+        result = json.loads(output)
+        timings.append(result["elapsed"] * 1000)
+        loaded = result["loaded"]
+    return timings, loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'import':<12}{'median ms':>12}{'min ms':>10}  heavy modules loaded")
+    for name, statement in STATEMENTS.items():
+        timings, loaded = measure(statement, args.runs)
+        print(
+            f"{name:<12}{statistics.median(timings):>12.2f}{min(timings):>10.2f}"
+            f"  {', '.join(loaded) or '-'}"
+        )
+
+
+if __name__ == "__main__":
+    main()
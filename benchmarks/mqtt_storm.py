@@ -0,0 +1,336 @@
+"""Synthetic MQTT status storm against the LGHorizon client stack.
+
+Simulates many settop boxes zapping at once: STB status, uiStatus
+(mainUI with linear/replay/nDVR/VOD sources and apps) and CPE.capacity
+messages. The messages go through LGHorizonMqttClient._on_client_message
+into LGHorizonApi._on_mqtt_message. Backoffice calls are answered by an
+in-process synthetic backend mounted on the api session.
+
+In-process (default) a producer thread fills a queue that a single
+consumer thread drains, like the paho network thread would. With
+--broker the messages are published to a local MQTT broker (plain tcp)
+and received by a subscriber that feeds the client.
+
+Usage: python benchmarks/mqtt_storm.py --boxes 2000 --rate 5000 --duration 10
+"""
+
+import argparse
+import json
+import os
+import queue
+import random
+import statistics
+import sys
+import threading
+import time
+
+from requests.adapters import BaseAdapter
+from requests.models import Response
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lghorizon.lghorizon_api import LGHorizonApi  # noqa: E402
+from lghorizon.models import (  # noqa: E402
+    LGHorizonBox,
+    LGHorizonChannel,
+    LGHorizonCustomer,
+    LGHorizonMqttClient,
+)
+from lghorizon.transport import LGHorizonTransportConfig  # noqa: E402
+
+HOUSEHOLD = "loadtest_household"
+BACKEND = "http://synthetic.backend"
+
+
+class SyntheticBackend(BaseAdapter):
+    """Requests adapter answering the backoffice calls made for status updates."""
+
+    def __init__(self, channel_ids, latency: float = 0.0):
+        super().__init__()
+        self._channel_ids = channel_ids
+        self._latency = latency
+        self.calls = 0
+
+    def send(self, request, **kwargs):
+        self.calls += 1
+        if self._latency:
+            time.sleep(self._latency)
+        url = request.url
+        channel_id = random.choice(self._channel_ids)
+        if "/replayEvent/" in url:
+            body = {
+                "channelId": channel_id,
+                "eventId": url.split("/replayEvent/")[1].split("?")[0],
+                "title": "Synthetic programme",
+                "episodeName": "Part 1",
+            }
+        elif "/details/single/" in url:
+            body = {
+                "id": "rec",
+                "title": "Synthetic recording",
+                "channelId": channel_id,
+                "type": "single",
+                "poster": {"url": "https://example.invalid/poster.jpg"},
+            }
+        elif "/detailscreen/" in url:
+            body = {"title": "Synthetic movie", "duration": 5400}
+        else:
+            body = {}
+        response = Response()
+        response.status_code = 200
+        response._content = json.dumps(body).encode()
+        response.headers["Content-Type"] = "application/json"
+        response.url = url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+
+def build_client(boxes: int, channels: int, backend_latency: float):
+    """Create an api with boxes and channels, wired to the synthetic backend."""
+    api = LGHorizonApi(
+        "loadtest",
+        "loadtest",
+        "nl",
+        transport_config=LGHorizonTransportConfig(requests_per_second=1e9, burst=1e9),
+    )
+    api._auth.householdId = HOUSEHOLD
+    api._auth.mqttToken = "token"
+    api._config = {
+        service: {"URL": f"{BACKEND}/{service}"}
+        for service in ("linearService", "recordingService", "vodService")
+    }
+    api._customer = LGHorizonCustomer(
+        {"customerId": "c", "hashedCustomerId": "c", "countryId": "nl", "cityId": 1}
+    )
+    channel_ids = []
+    for number in range(channels):
+        channel = LGHorizonChannel(
+            {
+                "id": f"CH_{number}",
+                "name": f"Channel {number}",
+                "imageStream": {"full": f"https://example.invalid/{number}.jpg"},
+                "logicalChannelNumber": str(number),
+            }
+        )
+        api._channels[channel.id] = channel
+        channel_ids.append(channel.id)
+    backend = SyntheticBackend(channel_ids, backend_latency)
+    api._session.mount(BACKEND, backend)
+
+    mqtt_client = LGHorizonMqttClient(
+        api._auth, "wss://localhost:443/mqtt", None, api._on_mqtt_message
+    )
+    # Nothing is sent to a broker; commands triggered by status updates are dropped
+    mqtt_client.publish_message = lambda topic, payload, qos=2: None
+    api._mqttClient = mqtt_client
+    for number in range(boxes):
+        box = LGHorizonBox(
+            {
+                "deviceId": f"BOX_{number}",
+                "hashedCPEId": f"hash_{number}",
+                "settings": {"deviceFriendlyName": f"Box {number}"},
+            },
+            None,
+            mqtt_client,
+            api._auth,
+            api._channels,
+        )
+        box.state = "ONLINE_RUNNING"
+        api.settop_boxes[box.deviceId] = box
+    return api, mqtt_client, backend
+
+
+def make_message(device_id: str, mix: dict):
+    """Return (topic, payload) of a random message for a box."""
+    kind = random.choices(list(mix), weights=list(mix.values()))[0]
+    now = int(time.time() * 1000)
+    if kind == "capacity":
+        return (
+            f"{HOUSEHOLD}/{device_id}/networkRecordings/capacity",
+            {"CPE.capacity": True, "used": random.randint(0, 100)},
+        )
+    if kind == "state":
+        return (
+            f"{HOUSEHOLD}/{device_id}/status",
+            {
+                "source": device_id,
+                "deviceType": "STB",
+                "state": random.choice(["ONLINE_RUNNING", "ONLINE_STANDBY"]),
+            },
+        )
+    if kind == "apps":
+        status = {
+            "uiStatus": "apps",
+            "appsState": {"appName": "Netflix", "logoPath": "//example.invalid/n.png"},
+        }
+    else:
+        player_state = {
+            "sourceType": kind,
+            "speed": random.choice([0, 1, 1, 1]),
+            "lastSpeedChangeTime": now,
+            "relativePosition": random.randint(0, 3600000),
+        }
+        if kind in ("linear", "replay"):
+            player_state["source"] = {"eventId": f"event_{random.randint(0, 10**6)}"}
+        elif kind == "nDVR":
+            player_state["source"] = {
+                "recordingId": "rec",
+                "sessionStartTime": now - 1800000,
+                "sessionEndTime": now + 1800000,
+            }
+        else:
+            player_state["source"] = {"titleId": "title"}
+        status = {"uiStatus": "mainUI", "playerState": player_state}
+    return f"{HOUSEHOLD}/{device_id}", {"source": device_id, "status": status}
+
+
+class FakeMessage:
+    """Minimal stand-in for paho's MQTTMessage."""
+
+    __slots__ = ("topic", "payload")
+
+    def __init__(self, topic, payload):
+        self.topic = topic
+        self.payload = payload
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def run(args):
+    api, mqtt_client, backend = build_client(
+        args.boxes, args.channels, args.backend_latency / 1000
+    )
+    mix = {
+        "linear": args.mix_linear,
+        "replay": args.mix_replay,
+        "nDVR": args.mix_ndvr,
+        "VOD": args.mix_vod,
+        "apps": args.mix_apps,
+        "capacity": args.mix_capacity,
+        "state": args.mix_state,
+    }
+    device_ids = list(api.settop_boxes)
+    latencies = []
+    current = threading.local()
+
+    def on_change(device_id):
+        latencies.append(time.perf_counter() - current.enqueued)
+
+    for box in api.settop_boxes.values():
+        box.set_callback(on_change)
+
+    inbound = queue.Queue()
+    depths = []
+    processed = [0]
+    stop = threading.Event()
+
+    def consume(enqueued, topic, payload):
+        current.enqueued = enqueued
+        mqtt_client._on_client_message(None, None, FakeMessage(topic, payload))
+        processed[0] += 1
+
+    def consumer():
+        while not stop.is_set() or not inbound.empty():
+            try:
+                item = inbound.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            consume(*item)
+
+    broker_client = None
+    if args.broker:
+        import paho.mqtt.client as mqtt
+
+        host, _, port = args.broker.partition(":")
+        broker_client = mqtt.Client()
+        broker_client.on_message = lambda client, userdata, message: inbound.put(
+            (json.loads(message.payload).pop("_sent"), message.topic, message.payload)
+        )
+        broker_client.connect(host, int(port or 1883))
+        broker_client.subscribe(f"{HOUSEHOLD}/#")
+        broker_client.loop_start()
+        publisher = mqtt.Client()
+        publisher.connect(host, int(port or 1883))
+        publisher.loop_start()
+
+    consumer_thread = threading.Thread(target=consumer, daemon=True)
+    consumer_thread.start()
+
+    # Pre-generate payloads so the producer only paces and enqueues
+    messages = []
+    for _ in range(min(args.rate * args.duration, 200000)):
+        topic, payload = make_message(random.choice(device_ids), mix)
+        messages.append((topic, payload))
+
+    start = time.perf_counter()
+    sent = 0
+    interval = 1.0 / args.rate
+    next_sample = start
+    while time.perf_counter() - start < args.duration:
+        topic, payload = messages[sent % len(messages)]
+        if broker_client:
+            payload = dict(payload, _sent=time.perf_counter())
+            publisher.publish(topic, json.dumps(payload), qos=0)
+        else:
+            inbound.put((time.perf_counter(), topic, json.dumps(payload).encode()))
+        sent += 1
+        now = time.perf_counter()
+        if now >= next_sample:
+            depths.append(inbound.qsize())
+            next_sample = now + 0.1
+        delay = start + sent * interval - now
+        if delay > 0:
+            time.sleep(delay)
+    produce_time = time.perf_counter() - start
+    stop.set()
+    consumer_thread.join()
+    total_time = time.perf_counter() - start
+    if broker_client:
+        broker_client.loop_stop()
+        publisher.loop_stop()
+
+    latencies_ms = [latency * 1000 for latency in latencies]
+    print(f"boxes            {args.boxes}")
+    print(f"sent             {sent} in {produce_time:.2f}s ({sent / produce_time:.0f} msg/s)")
+    print(
+        f"processed        {processed[0]} in {total_time:.2f}s "
+        f"({processed[0] / total_time:.0f} msg/s)"
+    )
+    print(f"backend calls    {backend.calls}")
+    print(f"callbacks        {len(latencies_ms)}")
+    if depths:
+        print(f"queue depth      avg {statistics.mean(depths):.0f} max {max(depths)}")
+    for label, fraction in (("p50", 0.5), ("p90", 0.9), ("p99", 0.99), ("max", 1.0)):
+        print(f"latency {label}      {percentile(latencies_ms, fraction):.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--boxes", type=int, default=1000)
+    parser.add_argument("--channels", type=int, default=200)
+    parser.add_argument("--rate", type=int, default=2000, help="messages per second")
+    parser.add_argument("--duration", type=int, default=10, help="seconds")
+    parser.add_argument("--backend-latency", type=float, default=0.0, help="ms per backoffice call")
+    parser.add_argument("--broker", help="host[:port] of a local MQTT broker")
+    parser.add_argument("--mix-linear", type=float, default=50)
+    parser.add_argument("--mix-replay", type=float, default=5)
+    parser.add_argument("--mix-ndvr", type=float, default=10)
+    parser.add_argument("--mix-vod", type=float, default=5)
+    parser.add_argument("--mix-apps", type=float, default=10)
+    parser.add_argument("--mix-capacity", type=float, default=10)
+    parser.add_argument("--mix-state", type=float, default=10)
+    run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,40 @@
 """Python client for LG Horizon."""
-from .lghorizon_api import LGHorizonApi
-from .models import LGHorizonBox, LGHorizonRecordingListSeasonShow, LGHorizonRecordingSingle, LGHorizonRecordingShow, LGHorizonRecordingEpisode
+from importlib import import_module
+from typing import Any
+
 from .exceptions import LGHorizonApiUnauthorizedError, LGHorizonApiConnectionError
 from .const import ONLINE_RUNNING, ONLINE_STANDBY, RECORDING_TYPE_SHOW, RECORDING_TYPE_SEASON, RECORDING_TYPE_SINGLE# noqa
+
+# The API class and the models pull in requests, backoff and paho-mqtt.
+# They are imported on first access so constants and exceptions stay cheap.
+_lazy_imports = {
+    "LGHorizonApi": ".lghorizon_api",
+    "LGHorizonBox": ".models",
+    "LGHorizonRecordingListSeasonShow": ".models",
+    "LGHorizonRecordingSingle": ".models",
+    "LGHorizonRecordingShow": ".models",
+    "LGHorizonRecordingEpisode": ".models",
+}
+
+__all__ = [
+    "LGHorizonApiUnauthorizedError",
+    "LGHorizonApiConnectionError",
+    "ONLINE_RUNNING",
+    "ONLINE_STANDBY",
+    "RECORDING_TYPE_SHOW",
+    "RECORDING_TYPE_SEASON",
+    "RECORDING_TYPE_SINGLE",
+    *_lazy_imports,
+]
+
+
+def __getattr__(name: str) -> Any:
+    if name not in _lazy_imports:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(_lazy_imports[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(__all__)
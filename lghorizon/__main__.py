@@ -0,0 +1,302 @@
+"""Command line tools to diagnose the LGHorizon client.
+
+python -m lghorizon profile-connect    time every phase of connect()
+python -m lghorizon capture-mqtt LOG   write the received MQTT messages to LOG
+python -m lghorizon replay-mqtt LOG    feed LOG to the client under cProfile/tracemalloc
+python -m lghorizon stats              print the cache and health metrics of a client
+
+stats reads the metrics of a running client from --stats-file, written by
+LGHorizonApi.start_stats_file(); without it, it runs a short lived client of
+its own. In process, use LGHorizonApi.get_stats().
+
+Credentials are read from a secrets file like test.py uses (username,
+password, country and optionally refresh_token and identifier) and can be
+overridden with options.
+"""
+
+import argparse
+import cProfile
+import gzip
+import io
+import json
+import logging
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from typing import Any, Dict, Iterator, Tuple
+
+
+def _read_secrets(args) -> Dict[str, Any]:
+    secrets: Dict[str, Any] = {}
+    try:
+        with open(args.secrets, "r", encoding="utf-8") as secrets_file:
+            secrets = json.load(secrets_file)
+    except FileNotFoundError:
+        pass
+    for name in ("username", "password", "country", "refresh_token", "identifier"):
+        value = getattr(args, name)
+        if value is not None:
+            secrets[name] = value
+    return secrets
+
+
+def _create_api(args):
+    from .lghorizon_api import LGHorizonApi
+    from .transport import LGHorizonTransportConfig
+
+    secrets = _read_secrets(args)
+    transport_config = LGHorizonTransportConfig(
+        record_file=args.record_http, replay_file=args.replay_http
+    )
+    if args.replay_http:
+        # Nothing to protect from overload, don't let throttling skew timings
+        transport_config.requests_per_second = 1e9
+        transport_config.burst = 1e9
+    return LGHorizonApi(
+        secrets.get("username"),
+        secrets.get("password"),
+        secrets.get("country", "nl"),
+        identifier=secrets.get("identifier"),
+        refresh_token=secrets.get("refresh_token"),
+        transport_config=transport_config,
+    )
+
+
+def _wait_for_mqtt(api, timeout: float) -> float:
+    """Wait until the MQTT client is connected; return the time waited in ms."""
+    start = time.monotonic()
+    while time.monotonic() - start < timeout:
+        if api._mqttClient and api._mqttClient.is_connected:
+            break
+        time.sleep(0.01)
+    return (time.monotonic() - start) * 1000
+
+
+def _print_profile(profiler: cProfile.Profile, top: int) -> None:
+    output = io.StringIO()
+    pstats.Stats(profiler, stream=output).sort_stats("cumulative").print_stats(top)
+    print(output.getvalue())
+
+
+def _print_allocations(snapshot: tracemalloc.Snapshot, top: int) -> None:
+    print(f"Top {top} allocations:")
+    for statistic in snapshot.statistics("lineno")[:top]:
+        print(f"  {statistic}")
+
+
+def profile_connect(args) -> None:
+    api = _create_api(args)
+    profiler = cProfile.Profile() if args.cprofile else None
+    start = time.monotonic()
+    if profiler:
+        profiler.enable()
+    try:
+        api.connect()
+        mqtt_ready = _wait_for_mqtt(api, args.mqtt_timeout)
+    finally:
+        if profiler:
+            profiler.disable()
+    total = (time.monotonic() - start) * 1000
+    print("Connect phases (ms):")
+    for phase, duration in api.connect_timings.items():
+        # channels is part of customer_and_boxes
+        indent = "    " if phase == "channels" else "  "
+        print(f"{indent}{phase:<24}{duration:>8.0f}")
+    print(f"  {'mqtt_ready':<24}{mqtt_ready:>8.0f}")
+    print(f"  {'total':<24}{total:>8.0f}")
+    if api.auth_timings:
+        print("Authorization steps (ms):")
+        for step, duration in api.auth_timings.items():
+            print(f"  {step:<24}{duration:>8.0f}")
+    if profiler:
+        _print_profile(profiler, args.top)
+    api.disconnect()
+
+
+def capture_mqtt(args) -> None:
+    api = _create_api(args)
+    log_file = gzip.open(args.log, "wt", encoding="utf-8")
+    lock = threading.Lock()
+    handle_message = api._on_mqtt_message
+
+    def capture(message: Any, topic: str) -> None:
+        line = json.dumps({"time": time.time(), "topic": topic, "payload": message})
+        with lock:
+            log_file.write(line + "\n")
+        handle_message(message, topic)
+
+    # connect() hands this attribute to the MQTT client
+    api._on_mqtt_message = capture
+    try:
+        api.connect()
+        print(f"Capturing MQTT messages to {args.log} for {args.duration}s")
+        time.sleep(args.duration)
+    finally:
+        api.disconnect()
+        with lock:
+            log_file.close()
+    if args.state:
+        api.save_state(args.state)
+        print(f"Client state written to {args.state}")
+
+
+def _read_mqtt_log(file_path: str) -> Iterator[Tuple[str, bytes]]:
+    with gzip.open(file_path, "rt", encoding="utf-8") as log_file:
+        for line in log_file:
+            entry = json.loads(line)
+            yield entry["topic"], json.dumps(entry["payload"]).encode()
+
+
+class _LogMessage:
+    """The attributes of a paho MQTTMessage used by the client."""
+
+    __slots__ = ("topic", "payload")
+
+    def __init__(self, topic: str, payload: bytes) -> None:
+        self.topic = topic
+        self.payload = payload
+
+
+def replay_mqtt(args) -> None:
+    from .models import LGHorizonMqttClient
+
+    api = _create_api(args)
+    if args.state and not api.restore_state(args.state):
+        sys.exit(f"Unable to restore client state from {args.state}")
+    # Offline client: nothing is sent, the messages are fed in below
+    mqtt_client = LGHorizonMqttClient(
+        api._auth, "wss://localhost:443/mqtt", None, api._on_mqtt_message
+    )
+    api._mqttClient = mqtt_client
+    for box in api.settop_boxes.values():
+        box.set_mqtt_client(mqtt_client)
+    messages = [_LogMessage(topic, payload) for topic, payload in _read_mqtt_log(args.log)]
+
+    profiler = cProfile.Profile() if args.cprofile else None
+    if args.tracemalloc:
+        tracemalloc.start(args.frames)
+    start = time.perf_counter()
+    if profiler:
+        profiler.enable()
+    for message in messages:
+        mqtt_client._on_client_message(None, None, message)
+    if profiler:
+        profiler.disable()
+    elapsed = time.perf_counter() - start
+    print(
+        f"Replayed {len(messages)} messages in {elapsed:.3f}s "
+        f"({len(messages) / max(elapsed, 1e-9):.0f} msg/s)"
+    )
+    if args.tracemalloc:
+        current, peak = tracemalloc.get_traced_memory()
+        print(f"Memory: {current / 1024:.0f} KiB allocated, peak {peak / 1024:.0f} KiB")
+        _print_allocations(tracemalloc.take_snapshot(), args.top)
+        tracemalloc.stop()
+    if profiler:
+        _print_profile(profiler, args.top)
+
+
+def stats(args) -> None:
+    result: Dict[str, Any] = {}
+    if args.image_cache:
+        from .image_cache import LGHorizonImageCache
+
+        result["imageCache"] = LGHorizonImageCache(args.image_cache).stats()
+    if args.stats_file:
+        try:
+            with open(args.stats_file, "r", encoding="utf-8") as stats_file:
+                result.update(json.load(stats_file))
+        except FileNotFoundError:
+            sys.exit(f"No stats file at {args.stats_file}, is start_stats_file() called?")
+        result["age"] = time.time() - result["written"]
+    elif not args.no_connect:
+        api = _create_api(args)
+        if args.state:
+            api.restore_state(args.state)
+        try:
+            api.connect()
+            time.sleep(args.duration)
+            result.update(api.get_stats())
+        finally:
+            api.disconnect()
+    print(json.dumps(result, indent=2, default=str))
+
+
+def main() -> None:
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--secrets", default="secrets.json", help="secrets json file")
+    common.add_argument("--username")
+    common.add_argument("--password")
+    common.add_argument("--country")
+    common.add_argument("--refresh-token", dest="refresh_token")
+    common.add_argument("--identifier")
+    common.add_argument("--record-http", help="record the HTTP traffic to this file")
+    common.add_argument("--replay-http", help="serve HTTP calls from this recording")
+    common.add_argument("-v", "--verbose", action="store_true", help="debug logging")
+
+    parser = argparse.ArgumentParser(
+        prog="python -m lghorizon",
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    command = subparsers.add_parser(
+        "profile-connect", parents=[common], help="time the phases of connect()"
+    )
+    command.add_argument("--cprofile", action="store_true", help="also run cProfile")
+    command.add_argument("--top", type=int, default=25, help="profile lines to print")
+    command.add_argument("--mqtt-timeout", type=float, default=30.0)
+    command.set_defaults(handler=profile_connect)
+
+    command = subparsers.add_parser(
+        "capture-mqtt", parents=[common], help="write received MQTT messages to a log"
+    )
+    command.add_argument("log", help="gzipped JSON lines output file")
+    command.add_argument("--duration", type=float, default=60.0, help="seconds")
+    command.add_argument("--state", help="also save the client state for replay-mqtt")
+    command.set_defaults(handler=capture_mqtt)
+
+    command = subparsers.add_parser(
+        "replay-mqtt", parents=[common], help="profile handling a captured MQTT log"
+    )
+    command.add_argument("log", help="log written by capture-mqtt")
+    command.add_argument("--state", help="client state saved by capture-mqtt")
+    command.add_argument("--no-cprofile", dest="cprofile", action="store_false")
+    command.add_argument("--no-tracemalloc", dest="tracemalloc", action="store_false")
+    command.add_argument("--frames", type=int, default=1, help="tracemalloc frames")
+    command.add_argument("--top", type=int, default=25)
+    command.set_defaults(handler=replay_mqtt)
+
+    command = subparsers.add_parser(
+        "stats",
+        parents=[common],
+        help="print cache and health metrics of a client",
+        description=(
+            "Print the metrics of a running client from --stats-file, or connect "
+            "a client of its own for --duration seconds and print its metrics."
+        ),
+    )
+    command.add_argument(
+        "--stats-file", help="file written by LGHorizonApi.start_stats_file()"
+    )
+    command.add_argument("--duration", type=float, default=10.0, help="seconds to run")
+    command.add_argument("--state", help="restore this client state first")
+    command.add_argument("--image-cache", help="image cache directory to report on")
+    command.add_argument(
+        "--no-connect", action="store_true", help="only report the image cache"
+    )
+    command.set_defaults(handler=stats)
+
+    args = parser.parse_args()
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.WARNING,
+        format="%(asctime)s - %(levelname)s - %(message)s",
+    )
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Process wide cache of the channel lineups, shared by all households."""
+
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Tuple
+
+from .models import LGHorizonChannel
+
+_logger = logging.getLogger(__name__)
+
+# (linear service url, cityId, language, productClass)
+CatalogKey = Tuple[str, int, str, str]
+
+
+class LGHorizonChannelLineup:
+    """All tv channels of one city, with the products that include them."""
+
+    channels: Dict[str, LGHorizonChannel] = None
+    products: Dict[str, FrozenSet[str]] = None
+    fetched: float = None
+
+    def __init__(self, channels_json: Iterable[Dict[str, Any]]) -> None:
+        self.channels = {}
+        self.products = {}
+        for channel in channels_json:
+            if "isRadio" in channel and channel["isRadio"]:
+                continue
+            self.channels[channel["id"]] = LGHorizonChannel(channel)
+            self.products[channel["id"]] = frozenset(channel["linearProducts"])
+        self.fetched = time.monotonic()
+
+    def entitled(self, entitlements: Iterable[str]) -> Dict[str, LGHorizonChannel]:
+        """Return the channels included in any of the entitlements."""
+        entitlements = set(entitlements)
+        return {
+            channel_id: self.channels[channel_id]
+            for channel_id, products in self.products.items()
+            if not entitlements.isdisjoint(products)
+        }
+
+
+class LGHorizonChannelCatalog:
+    """Channel lineups by city, language and product class.
+
+    Households with the same lineup share one LGHorizonChannel per channel
+    and only one of them downloads it; each household keeps a dict of
+    references to the channels it is entitled to. A lineup older than
+    max_age seconds is downloaded again on the next request.
+    """
+
+    max_age: float = 6 * 3600
+
+    def __init__(self, max_age: float = 6 * 3600) -> None:
+        self.max_age = max_age
+        self._lineups: Dict[CatalogKey, LGHorizonChannelLineup] = {}
+        self._locks: Dict[CatalogKey, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self.downloads = 0
+
+    def get_lineup(
+        self,
+        key: CatalogKey,
+        fetch: Callable[[], Iterable[Dict[str, Any]]],
+        refresh: bool = False,
+    ) -> LGHorizonChannelLineup:
+        """Return the lineup for a key, calling fetch when it is missing or stale."""
+        with self._lock:
+            key_lock = self._locks.setdefault(key, threading.Lock())
+        # Households asking for the same lineup wait for a single download
+        with key_lock:
+            lineup = self._lineups.get(key)
+            if (
+                lineup is None
+                or refresh
+                or time.monotonic() - lineup.fetched > self.max_age
+            ):
+                lineup = LGHorizonChannelLineup(fetch())
+                self._lineups[key] = lineup
+                self.downloads += 1
+                _logger.debug(f"Channel lineup {key[1:]} has {len(lineup.channels)} channels")
+            return lineup
+
+    def clear(self) -> None:
+        with self._lock:
+            self._lineups.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lineups: List[LGHorizonChannelLineup] = list(self._lineups.values())
+        return {
+            "lineups": len(lineups),
+            "channels": sum(len(lineup.channels) for lineup in lineups),
+            "downloads": self.downloads,
+        }
+
+
+# Shared by all LGHorizonApi instances of the process
+channel_catalog = LGHorizonChannelCatalog()
@@ -0,0 +1,80 @@
+"""Circuit breaker for the LGHorizon backoffice services."""
+
+import logging
+import threading
+import time
+
+from .const import CIRCUIT_CLOSED, CIRCUIT_HALF_OPEN, CIRCUIT_OPEN
+
+_logger = logging.getLogger(__name__)
+
+
+class LGHorizonCircuitBreaker:
+    """Track failures of one service and fail fast while it is down.
+
+    After failure_threshold consecutive failures the circuit opens and all
+    calls are refused for recovery_timeout seconds. Then a single probe call
+    is let through (half open): success closes the circuit, failure opens it
+    again.
+    """
+
+    name: str = None
+    failure_threshold: int = 5
+    recovery_timeout: float = 30.0
+    state: str = CIRCUIT_CLOSED
+    failures: int = 0
+    opened_at: float = None
+
+    def __init__(
+        self, name: str, failure_threshold: int = 5, recovery_timeout: float = 30.0
+    ) -> None:
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self._lock = threading.Lock()
+        self._probe_in_flight = False
+
+    def allow_request(self) -> bool:
+        """Return whether a call may be made right now."""
+        with self._lock:
+            if self.state == CIRCUIT_CLOSED:
+                return True
+            if self.state == CIRCUIT_OPEN:
+                if time.monotonic() - self.opened_at < self.recovery_timeout:
+                    return False
+                _logger.info(f"Circuit {self.name} half open, probing service")
+                self.state = CIRCUIT_HALF_OPEN
+            if self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+            return True
+
+    def release_probe(self) -> None:
+        """Give the probe back when a call ends without an outcome."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_success(self) -> None:
+        """Register a successful call."""
+        with self._lock:
+            if self.state != CIRCUIT_CLOSED:
+                _logger.info(f"Circuit {self.name} closed")
+            self.state = CIRCUIT_CLOSED
+            self.failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        """Register a failed call."""
+        with self._lock:
+            self.failures += 1
+            self._probe_in_flight = False
+            if (
+                self.state == CIRCUIT_HALF_OPEN
+                or self.failures >= self.failure_threshold
+            ):
+                if self.state != CIRCUIT_OPEN:
+                    _logger.warning(
+                        f"Circuit {self.name} opened after {self.failures} failures"
+                    )
+                self.state = CIRCUIT_OPEN
+                self.opened_at = time.monotonic()
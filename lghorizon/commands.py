@@ -0,0 +1,270 @@
+"""Correlation of MQTT commands with the replies of the settop boxes."""
+
+import heapq
+import itertools
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .const import (
+    COMMAND_ACKNOWLEDGED,
+    COMMAND_FAILED,
+    COMMAND_PUBLISHED,
+    COMMAND_SKIPPED,
+    COMMAND_TIMEOUT,
+    COMMANDS_WITHOUT_REPLY_ID,
+)
+from .exceptions import LGHorizonCommandTimeoutError
+
+_logger = logging.getLogger(__name__)
+
+
+class LGHorizonCommandLatency:
+    """Round-trip latency statistics of the commands sent to one box, in ms."""
+
+    count: int = 0
+    last: float = None
+    average: float = None
+    minimum: float = None
+    maximum: float = None
+
+    def add(self, latency: float) -> None:
+        """Add a measured round-trip time."""
+        self.count += 1
+        self.last = latency
+        if self.average is None:
+            self.average = latency
+            self.minimum = latency
+            self.maximum = latency
+            return
+        self.average += (latency - self.average) / self.count
+        self.minimum = min(self.minimum, latency)
+        self.maximum = max(self.maximum, latency)
+
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "last": self.last,
+            "average": self.average,
+            "minimum": self.minimum,
+            "maximum": self.maximum,
+        }
+
+
+class LGHorizonPendingCommand:
+    """A command waiting for a reply."""
+
+    command_id: str = None
+    device_id: str = None
+    command_type: str = None
+    sent_at: float = None
+    deadline: float = None
+    future: Future = None
+
+    def __init__(
+        self, command_id: str, device_id: str, command_type: str, timeout: float
+    ) -> None:
+        self.command_id = command_id
+        self.device_id = device_id
+        self.command_type = command_type
+        self.sent_at = time.monotonic()
+        self.deadline = self.sent_at + timeout
+        self.future = Future()
+
+
+class _LGHorizonCommandExpiry:
+    """One daemon thread calling the expiry callbacks of all trackers.
+
+    Callbacks are kept in a heap by deadline and are not cancelled; a
+    callback for a command that was resolved in the meantime does nothing.
+    """
+
+    def __init__(self) -> None:
+        self._heap: List[Tuple[float, int, Callable, tuple]] = []
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    def schedule(self, deadline: float, callback: Callable, *args) -> None:
+        with self._condition:
+            heapq.heappush(self._heap, (deadline, next(self._counter), callback, args))
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="lghorizon-command-expiry", daemon=True
+                )
+                self._thread.start()
+            self._condition.notify()
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while True:
+                    now = time.monotonic()
+                    if self._heap and self._heap[0][0] <= now:
+                        break
+                    self._condition.wait(self._heap[0][0] - now if self._heap else None)
+                _, _, callback, args = heapq.heappop(self._heap)
+            try:
+                callback(*args)
+            except Exception:
+                _logger.exception("Command expiry callback failed")
+
+
+_command_expiry = _LGHorizonCommandExpiry()
+
+
+class LGHorizonCommandTracker:
+    """Track outstanding command ids and resolve them when a box replies.
+
+    Replies are matched on their id. A reply without an id resolves the
+    oldest outstanding command of its box, but only for the command types
+    in COMMANDS_WITHOUT_REPLY_ID. Timeouts are handled by a single thread
+    shared by all trackers.
+    """
+
+    default_timeout: float = 10.0
+
+    def __init__(self, default_timeout: float = 10.0) -> None:
+        self.default_timeout = default_timeout
+        self._pending: Dict[str, LGHorizonPendingCommand] = OrderedDict()
+        self._latencies: Dict[str, LGHorizonCommandLatency] = {}
+        self._lock = threading.Lock()
+
+    def track(
+        self,
+        command_id: str,
+        device_id: str,
+        command_type: str,
+        timeout: Optional[float] = None,
+    ) -> Future:
+        """Start tracking a command; the future resolves with the reply."""
+        command = LGHorizonPendingCommand(
+            command_id, device_id, command_type, timeout or self.default_timeout
+        )
+        with self._lock:
+            self._pending[command_id] = command
+        _command_expiry.schedule(command.deadline, self._expire, command_id)
+        return command.future
+
+    def resolve(self, message: Dict[str, Any]) -> bool:
+        """Resolve the command a reply belongs to; return whether one matched."""
+        with self._lock:
+            command = None
+            command_id = message.get("id")
+            if isinstance(command_id, str) and command_id in self._pending:
+                command = self._pending.pop(command_id)
+            elif command_id is None and "source" in message:
+                for pending in self._pending.values():
+                    if (
+                        pending.device_id == message["source"]
+                        and pending.command_type in COMMANDS_WITHOUT_REPLY_ID
+                    ):
+                        command = self._pending.pop(pending.command_id)
+                        break
+            if command is None:
+                return False
+            latency = (time.monotonic() - command.sent_at) * 1000
+            self._latencies.setdefault(
+                command.device_id, LGHorizonCommandLatency()
+            ).add(latency)
+        _logger.debug(
+            f"Command {command.command_type} ({command.command_id}) acknowledged "
+            f"by {command.device_id} in {latency:.0f} ms"
+        )
+        command.future.set_result(message)
+        return True
+
+    def _expire(self, command_id: str) -> None:
+        with self._lock:
+            command = self._pending.pop(command_id, None)
+        if command is None:
+            return
+        command.future.set_exception(
+            LGHorizonCommandTimeoutError(
+                f"No reply from {command.device_id} on {command.command_type}"
+            )
+        )
+
+    def fail_all(self, reason: str) -> None:
+        """Fail all outstanding commands, e.g. on disconnect."""
+        with self._lock:
+            pending = list(self._pending.values())
+            self._pending.clear()
+        for command in pending:
+            command.future.set_exception(LGHorizonCommandTimeoutError(reason))
+
+    def latency(self, device_id: str) -> LGHorizonCommandLatency:
+        """Return the round-trip statistics of a box."""
+        with self._lock:
+            return self._latencies.setdefault(device_id, LGHorizonCommandLatency())
+
+    @property
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+
+class LGHorizonGroupResult:
+    """Combined result of a command sent to several boxes."""
+
+    results: Dict[str, str] = None
+    replies: Dict[str, Any] = None
+    elapsed: float = None
+
+    def __init__(self) -> None:
+        self.results = {}
+        self.replies = {}
+
+    @property
+    def succeeded(self) -> bool:
+        """Whether no box failed or timed out."""
+        return all(
+            result in (COMMAND_ACKNOWLEDGED, COMMAND_PUBLISHED, COMMAND_SKIPPED)
+            for result in self.results.values()
+        )
+
+    def __repr__(self) -> str:
+        return f"LGHorizonGroupResult({self.results}, elapsed={self.elapsed:.3f}s)"
+
+
+def gather_group_results(
+    pending: Dict[str, Any], timeout: float
+) -> LGHorizonGroupResult:
+    """Wait for all published commands at once.
+
+    pending maps device ids to what the box command returned: a Future for
+    acknowledged commands, paho message info for plain publishes, an
+    exception when sending failed, or None when the box skipped the command.
+    """
+    start = time.monotonic()
+    deadline = start + timeout
+    group_result = LGHorizonGroupResult()
+    for device_id, outcome in pending.items():
+        remaining = max(0.0, deadline - time.monotonic())
+        if outcome is None:
+            group_result.results[device_id] = COMMAND_SKIPPED
+        elif isinstance(outcome, Exception):
+            group_result.results[device_id] = COMMAND_FAILED
+            group_result.replies[device_id] = outcome
+        elif isinstance(outcome, Future):
+            try:
+                group_result.replies[device_id] = outcome.result(remaining)
+                group_result.results[device_id] = COMMAND_ACKNOWLEDGED
+            except (LGHorizonCommandTimeoutError, FutureTimeoutError) as ex:
+                group_result.results[device_id] = COMMAND_TIMEOUT
+                group_result.replies[device_id] = ex
+        else:
+            try:
+                outcome.wait_for_publish(remaining)
+            except (ValueError, RuntimeError) as ex:
+                group_result.results[device_id] = COMMAND_FAILED
+                group_result.replies[device_id] = ex
+                continue
+            if outcome.is_published():
+                group_result.results[device_id] = COMMAND_PUBLISHED
+            else:
+                group_result.results[device_id] = COMMAND_TIMEOUT
+    group_result.elapsed = time.monotonic() - start
+    return group_result
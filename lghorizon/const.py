@@ -32,10 +32,42 @@ MEDIA_KEY_STOP = "MediaStop"
 MEDIA_KEY_REWIND = "MediaRewind"
 MEDIA_KEY_FAST_FORWARD = "MediaFastForward"
 
+MEDIA_KEY_ARROW_UP = "ArrowUp"
+MEDIA_KEY_ARROW_DOWN = "ArrowDown"
+MEDIA_KEY_ARROW_LEFT = "ArrowLeft"
+MEDIA_KEY_ARROW_RIGHT = "ArrowRight"
+MEDIA_KEY_DIGITS = "0123456789"
+
+# Pause between the keys of a sequence, roughly the input rate of the boxes
+KEY_SEQUENCE_INTERVAL = 0.2
+
 RECORDING_TYPE_SINGLE = "single"
 RECORDING_TYPE_SHOW = "show"
 RECORDING_TYPE_SEASON = "season"
 
+# Results of commands sent to a group of boxes
+COMMAND_ACKNOWLEDGED = "acknowledged"
+COMMAND_PUBLISHED = "published"
+COMMAND_SKIPPED = "skipped"
+COMMAND_TIMEOUT = "timeout"
+COMMAND_FAILED = "failed"
+
+# Seconds to wait for a burst of purchaseService messages to end before
+# refreshing the channels
+CHANNEL_REFRESH_DELAY = 5.0
+
+# Commands the boxes answer with a status message that does not echo the id
+COMMANDS_WITHOUT_REPLY_ID = ("CPE.getUiStatus",)
+
+# Overflow policies of event subscriptions
+EVENT_OVERFLOW_DROP_OLDEST = "drop_oldest"
+EVENT_OVERFLOW_MERGE = "merge"
+
+# Circuit breaker states
+CIRCUIT_CLOSED = "closed"
+CIRCUIT_OPEN = "open"
+CIRCUIT_HALF_OPEN = "half_open"
+
 BE_AUTH_URL = "https://login.prd.telenet.be/openid/login.do"
 
 COUNTRY_SETTINGS = {
@@ -0,0 +1,235 @@
+"""Typed event stream for settop box updates."""
+
+import asyncio
+import itertools
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Type
+
+from .const import EVENT_OVERFLOW_DROP_OLDEST, EVENT_OVERFLOW_MERGE
+
+_logger = logging.getLogger(__name__)
+
+
+class LGHorizonEvent:
+    """Base class of all box events."""
+
+    device_id: str = None
+    timestamp: float = None
+
+    def __init__(self, device_id: str) -> None:
+        self.device_id = device_id
+        self.timestamp = time.time()
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.device_id})"
+
+
+class LGHorizonStateChangedEvent(LGHorizonEvent):
+    """The box went online, to standby or offline."""
+
+    state: str = None
+
+    def __init__(self, device_id: str, state: str) -> None:
+        super().__init__(device_id)
+        self.state = state
+
+
+class LGHorizonPlayingInfoChangedEvent(LGHorizonEvent):
+    """The box plays something else, or the progress changed."""
+
+    playing_info: Any = None
+
+    def __init__(self, device_id: str, playing_info: Any) -> None:
+        super().__init__(device_id)
+        self.playing_info = playing_info
+
+
+class LGHorizonCapacityChangedEvent(LGHorizonEvent):
+    """The used recording capacity of the box changed.
+
+    device_id is None for the recording quota of the whole household.
+    """
+
+    recording_capacity: int = None
+
+    def __init__(self, device_id: str, recording_capacity: int) -> None:
+        super().__init__(device_id)
+        self.recording_capacity = recording_capacity
+
+
+class LGHorizonRecordingChangedEvent(LGHorizonEvent):
+    """Recordings of the household or a box changed.
+
+    device_id is None for household wide recording updates.
+    """
+
+    topic: str = None
+    payload: Dict[str, Any] = None
+
+    def __init__(self, device_id: Optional[str], topic: str, payload: Dict[str, Any]) -> None:
+        super().__init__(device_id)
+        self.topic = topic
+        self.payload = payload
+
+
+_closed = object()
+
+
+class LGHorizonEventSubscription:
+    """Bounded queue of events, usable as sync and async iterator.
+
+    Publishing never blocks. When the queue is full the oldest event is
+    dropped; with the merge policy a newer event replaces a queued event of
+    the same type for the same box, so a slow consumer only sees the
+    latest state. notify, when set, is called after every queued event,
+    e.g. to wake a consumer that waits on something else.
+    """
+
+    maxsize: int = 100
+    overflow: str = EVENT_OVERFLOW_MERGE
+    dropped: int = 0
+
+    def __init__(
+        self,
+        hub: "LGHorizonEventHub",
+        event_types: Iterable[Type[LGHorizonEvent]] = None,
+        maxsize: int = 100,
+        overflow: str = EVENT_OVERFLOW_MERGE,
+        notify: Callable[[], Any] = None,
+    ) -> None:
+        if overflow not in (EVENT_OVERFLOW_DROP_OLDEST, EVENT_OVERFLOW_MERGE):
+            raise ValueError(f"Unknown overflow policy: {overflow}")
+        self._hub = hub
+        self._event_types = tuple(event_types) if event_types else (LGHorizonEvent,)
+        self.maxsize = maxsize
+        self.overflow = overflow
+        self._notify = notify
+        self._queue: "OrderedDict[Any, Any]" = OrderedDict()
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._async_waiters: List[asyncio.Future] = []
+        self._closed = False
+
+    def wants(self, event: LGHorizonEvent) -> bool:
+        return isinstance(event, self._event_types)
+
+    def put(self, event: Any) -> None:
+        """Queue an event without blocking."""
+        with self._condition:
+            if self._closed:
+                return
+            if self.overflow == EVENT_OVERFLOW_MERGE and event is not _closed:
+                key = (type(event), event.device_id)
+            else:
+                key = next(self._sequence)
+            if key not in self._queue and len(self._queue) >= self.maxsize:
+                self._queue.popitem(last=False)
+                self.dropped += 1
+            self._queue[key] = event
+            if event is _closed:
+                self._closed = True
+            self._condition.notify()
+            waiters, self._async_waiters = self._async_waiters, []
+        for waiter in waiters:
+            if waiter.done():
+                continue
+            try:
+                waiter.get_loop().call_soon_threadsafe(_wake, waiter)
+            except RuntimeError:
+                # The loop of this consumer is closed, nobody will await it
+                _logger.debug("Event loop closed, dropping event waiter")
+        if self._notify:
+            self._notify()
+
+    def _pop(self) -> Any:
+        _, event = self._queue.popitem(last=False)
+        if event is _closed:
+            # Keep the marker so further reads also end
+            self._queue[None] = _closed
+        return event
+
+    def get(self, timeout: float = None) -> Optional[LGHorizonEvent]:
+        """Return the next event; None on timeout or when the subscription is closed."""
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._queue, timeout):
+                return None
+            event = self._pop()
+        return None if event is _closed else event
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> LGHorizonEvent:
+        event = self.get()
+        if event is None:
+            raise StopIteration
+        return event
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> LGHorizonEvent:
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._condition:
+                if self._queue:
+                    event = self._pop()
+                    if event is _closed:
+                        raise StopAsyncIteration
+                    return event
+                waiter = loop.create_future()
+                # Drop the waiters of cancelled reads
+                self._async_waiters = [
+                    pending for pending in self._async_waiters if not pending.done()
+                ]
+                self._async_waiters.append(waiter)
+            await waiter
+
+    def close(self) -> None:
+        """Stop the subscription; iterators end after the queued events."""
+        self._hub.unsubscribe(self)
+        self.put(_closed)
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+
+def _wake(waiter: asyncio.Future) -> None:
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+class LGHorizonEventHub:
+    """Fan out events to all subscriptions."""
+
+    def __init__(self) -> None:
+        self._subscriptions: List[LGHorizonEventSubscription] = []
+        self._lock = threading.Lock()
+
+    def subscribe(
+        self,
+        event_types: Iterable[Type[LGHorizonEvent]] = None,
+        maxsize: int = 100,
+        overflow: str = EVENT_OVERFLOW_MERGE,
+        notify: Callable[[], Any] = None,
+    ) -> LGHorizonEventSubscription:
+        subscription = LGHorizonEventSubscription(
+            self, event_types, maxsize, overflow, notify
+        )
+        with self._lock:
+            self._subscriptions = self._subscriptions + [subscription]
+        return subscription
+
+    def unsubscribe(self, subscription: LGHorizonEventSubscription) -> None:
+        with self._lock:
+            self._subscriptions = [
+                sub for sub in self._subscriptions if sub is not subscription
+            ]
+
+    def publish(self, event: LGHorizonEvent) -> None:
+        for subscription in self._subscriptions:
+            if subscription.wants(event):
+                subscription.put(event)
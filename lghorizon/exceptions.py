@@ -8,4 +8,12 @@ class LGHorizonApiConnectionError(LGHorizonApiError):
 
 class LGHorizonApiUnauthorizedError(Exception):
     """Generic GeocachingApi exception."""
-        
\ No newline at end of file
+        
+class LGHorizonApiCircuitOpenError(LGHorizonApiError):
+    """A backoffice service is failing and calls to it fail fast."""
+
+class LGHorizonApiRateLimitedError(LGHorizonApiConnectionError):
+    """The backend asked us to slow down, or the client side rate limit was hit."""
+
+class LGHorizonCommandTimeoutError(LGHorizonApiError):
+    """A settop box did not acknowledge a command in time."""
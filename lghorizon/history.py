@@ -0,0 +1,246 @@
+"""Fixed size viewing history of a settop box."""
+
+import threading
+import time
+from array import array
+from datetime import datetime
+from typing import Dict, List, Optional
+
+VIEWING_HISTORY_SIZE = 256
+
+
+class _LGHorizonStringTable:
+    """Reference counted interned strings; index 0 is None."""
+
+    def __init__(self) -> None:
+        self._strings: List[Optional[str]] = [None]
+        self._refcounts: List[int] = [0]
+        self._indexes: Dict[str, int] = {}
+        self._free: List[int] = []
+
+    def acquire(self, value: Optional[str]) -> int:
+        if value is None:
+            return 0
+        index = self._indexes.get(value)
+        if index is None:
+            if self._free:
+                index = self._free.pop()
+                self._strings[index] = value
+            else:
+                index = len(self._strings)
+                self._strings.append(value)
+                self._refcounts.append(0)
+            self._indexes[value] = index
+        self._refcounts[index] += 1
+        return index
+
+    def release(self, index: int) -> None:
+        if index == 0:
+            return
+        self._refcounts[index] -= 1
+        if self._refcounts[index] == 0:
+            del self._indexes[self._strings[index]]
+            self._strings[index] = None
+            self._free.append(index)
+
+    def get(self, index: int) -> Optional[str]:
+        return self._strings[index]
+
+    def __len__(self) -> int:
+        return len(self._indexes)
+
+
+class LGHorizonViewingSession:
+    """A continuous period of playing one source on a box."""
+
+    source_type: str = None
+    channel_id: str = None
+    title: str = None
+    start: datetime = None
+    end: datetime = None
+    paused: float = 0.0
+
+    def __init__(
+        self,
+        source_type: str,
+        channel_id: str,
+        title: str,
+        start: float,
+        end: Optional[float],
+        paused: float,
+    ) -> None:
+        self.source_type = source_type
+        self.channel_id = channel_id
+        self.title = title
+        self.start = datetime.fromtimestamp(start)
+        self.end = datetime.fromtimestamp(end) if end else None
+        self.paused = paused
+
+    @property
+    def watched(self) -> float:
+        """Seconds played, without the paused time; ongoing sessions count until now."""
+        end = self.end or datetime.now()
+        return max((end - self.start).total_seconds() - self.paused, 0.0)
+
+    def __repr__(self) -> str:
+        return (
+            f"LGHorizonViewingSession({self.source_type}, {self.channel_id}, "
+            f"{self.title!r}, {self.start:%H:%M}-{'now' if not self.end else f'{self.end:%H:%M}'})"
+        )
+
+
+class LGHorizonViewingHistory:
+    """Ring buffer of the last viewing sessions of one box.
+
+    The sessions are kept in preallocated arrays with the strings interned
+    in a per box table, so memory use only depends on size. A new session
+    starts whenever the source type, channel or title changes; pausing
+    adds to the paused time of the current session.
+    """
+
+    size: int = VIEWING_HISTORY_SIZE
+
+    def __init__(self, size: int = VIEWING_HISTORY_SIZE) -> None:
+        self.size = size
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self) -> None:
+        size = self.size
+        self._strings = _LGHorizonStringTable()
+        self._source_types = array("I", [0]) * size
+        self._channels = array("I", [0]) * size
+        self._titles = array("I", [0]) * size
+        self._starts = array("d", [0.0]) * size
+        # 0.0 while the session is ongoing
+        self._ends = array("d", [0.0]) * size
+        self._paused = array("d", [0.0]) * size
+        self._count = 0
+        self._next = 0
+        self._open = False
+        self._paused_since: Optional[float] = None
+
+    def __len__(self) -> int:
+        return self._count
+
+    def record(self, playing_info, now: float = None) -> None:
+        """Register a new playing info snapshot of the box."""
+        now = time.time() if now is None else now
+        with self._lock:
+            if playing_info.source_type is None and playing_info.title is None:
+                self._close(now)
+                return
+            if self._open and self._is_current(playing_info):
+                self._set_paused(playing_info.paused, now)
+                return
+            self._close(now)
+            self._start(playing_info, now)
+
+    def _current_slot(self) -> int:
+        return (self._next - 1) % self.size
+
+    def _is_current(self, playing_info) -> bool:
+        slot = self._current_slot()
+        return (
+            self._strings.get(self._source_types[slot]) == playing_info.source_type
+            and self._strings.get(self._channels[slot]) == playing_info.channel_id
+            and self._strings.get(self._titles[slot]) == playing_info.title
+        )
+
+    def _set_paused(self, paused: bool, now: float) -> None:
+        if paused and self._paused_since is None:
+            self._paused_since = now
+        elif not paused and self._paused_since is not None:
+            self._paused[self._current_slot()] += now - self._paused_since
+            self._paused_since = None
+
+    def _start(self, playing_info, now: float) -> None:
+        slot = self._next
+        if self._count == self.size:
+            # Overwrite the oldest session
+            for column in (self._source_types, self._channels, self._titles):
+                self._strings.release(column[slot])
+        else:
+            self._count += 1
+        self._source_types[slot] = self._strings.acquire(playing_info.source_type)
+        self._channels[slot] = self._strings.acquire(playing_info.channel_id)
+        self._titles[slot] = self._strings.acquire(playing_info.title)
+        self._starts[slot] = now
+        self._ends[slot] = 0.0
+        self._paused[slot] = 0.0
+        self._next = (slot + 1) % self.size
+        self._open = True
+        self._paused_since = now if playing_info.paused else None
+
+    def _close(self, now: float) -> None:
+        if not self._open:
+            return
+        self._set_paused(False, now)
+        self._ends[self._current_slot()] = now
+        self._open = False
+
+    def _slots(self) -> List[int]:
+        """Slots from newest to oldest."""
+        return [(self._next - 1 - offset) % self.size for offset in range(self._count)]
+
+    def _session(self, slot: int, now: float) -> LGHorizonViewingSession:
+        paused = self._paused[slot]
+        if self._open and slot == self._current_slot() and self._paused_since is not None:
+            paused += now - self._paused_since
+        return LGHorizonViewingSession(
+            self._strings.get(self._source_types[slot]),
+            self._strings.get(self._channels[slot]),
+            self._strings.get(self._titles[slot]),
+            self._starts[slot],
+            self._ends[slot] or None,
+            paused,
+        )
+
+    def sessions(
+        self, limit: int = 10, since: datetime = None
+    ) -> List[LGHorizonViewingSession]:
+        """Return the most recent sessions, newest first."""
+        since_timestamp = since.timestamp() if since else 0.0
+        now = time.time()
+        with self._lock:
+            result = []
+            for slot in self._slots():
+                if len(result) >= limit:
+                    break
+                end = self._ends[slot] or now
+                if end < since_timestamp:
+                    break
+                result.append(self._session(slot, now))
+            return result
+
+    def watch_time_by_channel(
+        self, since: datetime = None, until: datetime = None
+    ) -> Dict[str, float]:
+        """Return the seconds watched per channel id between since and until.
+
+        Paused time is subtracted in proportion to the part of a session
+        that falls within the period.
+        """
+        now = time.time()
+        since_timestamp = since.timestamp() if since else 0.0
+        until_timestamp = until.timestamp() if until else now
+        totals: Dict[str, float] = {}
+        with self._lock:
+            for slot in self._slots():
+                channel_id = self._strings.get(self._channels[slot])
+                if channel_id is None:
+                    continue
+                start = self._starts[slot]
+                end = self._ends[slot] or now
+                overlap = min(end, until_timestamp) - max(start, since_timestamp)
+                if overlap <= 0:
+                    continue
+                paused = self._session(slot, now).paused
+                duration = end - start
+                watched = overlap - (paused * overlap / duration if duration else 0.0)
+                totals[channel_id] = totals.get(channel_id, 0.0) + max(watched, 0.0)
+        return totals
+
+    def clear(self) -> None:
+        with self._lock:
+            self._reset()
@@ -0,0 +1,242 @@
+"""Disk cache for channel logos, posters and app images."""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional
+
+from requests import exceptions as request_exceptions
+
+from .transport import LGHorizonTransportConfig
+
+_logger = logging.getLogger(__name__)
+
+_index_file = "index.json"
+
+
+class LGHorizonImageCache:
+    """Size bounded LRU cache of image urls on disk.
+
+    Images are revalidated with conditional requests (ETag/Last-Modified)
+    once they are older than revalidate_after seconds. When the cache
+    grows beyond max_bytes the least recently used images are removed.
+    The index is written at most every flush_interval seconds and after
+    a prefetch; call flush() before exiting to keep the latest use order.
+    """
+
+    directory: str = None
+    max_bytes: int = 50 * 1024 * 1024
+    revalidate_after: float = 24 * 3600
+    flush_interval: float = 30.0
+
+    def __init__(
+        self,
+        directory: str,
+        max_bytes: int = 50 * 1024 * 1024,
+        revalidate_after: float = 24 * 3600,
+        transport_config: LGHorizonTransportConfig = None,
+        flush_interval: float = 30.0,
+    ) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.revalidate_after = revalidate_after
+        self.flush_interval = flush_interval
+        self._transport_config = transport_config or LGHorizonTransportConfig()
+        self._session = self._transport_config.create_session()
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._size = 0
+        self._dirty = False
+        self._flushed = time.monotonic()
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        os.makedirs(directory, exist_ok=True)
+        self._load_index()
+
+    def _load_index(self) -> None:
+        try:
+            with open(
+                os.path.join(self.directory, _index_file), "r", encoding="utf-8"
+            ) as index_file:
+                entries = json.load(index_file)
+        except (FileNotFoundError, ValueError):
+            return
+        # The index is written in least recently used order
+        for url, entry in entries.items():
+            if os.path.exists(os.path.join(self.directory, entry["file"])):
+                self._entries[url] = entry
+                self._size += entry["size"]
+
+    def _save_index(self) -> None:
+        tmp_path = os.path.join(self.directory, f"{_index_file}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as index_file:
+            json.dump(self._entries, index_file)
+        os.replace(tmp_path, os.path.join(self.directory, _index_file))
+        self._dirty = False
+        self._flushed = time.monotonic()
+
+    def _index_changed(self) -> None:
+        # Called with the lock held
+        self._dirty = True
+        if time.monotonic() - self._flushed >= self.flush_interval:
+            self._save_index()
+
+    def flush(self) -> None:
+        """Write the index when it changed since the last write."""
+        with self._lock:
+            if self._dirty:
+                self._save_index()
+
+    @staticmethod
+    def _file_name(url: str) -> str:
+        extension = os.path.splitext(url.split("?")[0])[1][:5]
+        return hashlib.sha1(url.encode()).hexdigest() + extension
+
+    def get_path(self, url: str) -> Optional[str]:
+        """Return the local path of the image, downloading it when needed.
+
+        Other threads may evict the file at any time; get_bytes handles that.
+        """
+        if not url:
+            return None
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry:
+                self._entries.move_to_end(url)
+                entry["used"] = time.time()
+                self._index_changed()
+        if entry and time.time() - entry["fetched"] < self.revalidate_after:
+            self.hits += 1
+            return os.path.join(self.directory, entry["file"])
+        entry = self._fetch(url, entry)
+        if not entry:
+            return None
+        return os.path.join(self.directory, entry["file"])
+
+    def get_bytes(self, url: str) -> Optional[bytes]:
+        """Return the image content, downloading it when needed.
+
+        Unlike with get_path, an image evicted by another thread in the
+        meantime is downloaded again.
+        """
+        path = self.get_path(url)
+        if not path:
+            return None
+        try:
+            return self._read(path)
+        except FileNotFoundError:
+            pass
+        _logger.debug(f"Image {url} evicted while reading, fetching it again")
+        entry = self._fetch(url, None)
+        if not entry:
+            return None
+        try:
+            return self._read(os.path.join(self.directory, entry["file"]))
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def _read(path: str) -> bytes:
+        with open(path, "rb") as image_file:
+            return image_file.read()
+
+    def _fetch(self, url: str, entry: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        headers = {}
+        if entry and entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry and entry.get("lastModified"):
+            headers["If-Modified-Since"] = entry["lastModified"]
+        try:
+            response = self._session.get(
+                url, headers=headers, timeout=self._transport_config.timeout_for("images")
+            )
+        except request_exceptions.RequestException as ex:
+            _logger.debug(f"Unable to fetch image {url}: {ex}")
+            # A stale image is better than none
+            return entry
+
+        if response.status_code == 304 and entry:
+            self.revalidated += 1
+            with self._lock:
+                entry["fetched"] = time.time()
+                self._index_changed()
+            return entry
+        if not response.ok:
+            _logger.debug(f"Unable to fetch image {url}: {response.status_code}")
+            return entry
+
+        self.misses += 1
+        file_name = self._file_name(url)
+        tmp_path = os.path.join(self.directory, f"{file_name}.tmp")
+        with open(tmp_path, "wb") as image_file:
+            image_file.write(response.content)
+        os.replace(tmp_path, os.path.join(self.directory, file_name))
+        now = time.time()
+        new_entry = {
+            "file": file_name,
+            "size": len(response.content),
+            "etag": response.headers.get("ETag"),
+            "lastModified": response.headers.get("Last-Modified"),
+            "fetched": now,
+            "used": now,
+        }
+        with self._lock:
+            old_entry = self._entries.pop(url, None)
+            if old_entry:
+                self._size -= old_entry["size"]
+            self._entries[url] = new_entry
+            self._size += new_entry["size"]
+            self._evict()
+            self._index_changed()
+        return new_entry
+
+    def _evict(self) -> None:
+        while self._size > self.max_bytes and len(self._entries) > 1:
+            url, entry = self._entries.popitem(last=False)
+            self._size -= entry["size"]
+            try:
+                os.remove(os.path.join(self.directory, entry["file"]))
+            except FileNotFoundError:
+                pass
+            _logger.debug(f"Evicted image {url}")
+
+    def prefetch(self, urls: Iterable[str]) -> threading.Thread:
+        """Download the given images in a background thread."""
+        urls = [url for url in dict.fromkeys(urls) if url]
+
+        def run():
+            for url in urls:
+                self.get_path(url)
+            self.flush()
+            _logger.debug(f"Prefetched {len(urls)} images")
+
+        thread = threading.Thread(target=run, name="lghorizon-image-prefetch", daemon=True)
+        thread.start()
+        return thread
+
+    def clear(self) -> None:
+        """Remove all cached images."""
+        with self._lock:
+            for entry in self._entries.values():
+                try:
+                    os.remove(os.path.join(self.directory, entry["file"]))
+                except FileNotFoundError:
+                    pass
+            self._entries.clear()
+            self._size = 0
+            self._save_index()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "images": len(self._entries),
+            "bytes": self._size,
+            "maxBytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "revalidated": self.revalidated,
+        }
@@ -0,0 +1,110 @@
+"""Incremental parsing of JSON arrays from a chunked response body."""
+
+import codecs
+import json
+from typing import Any, Iterable, Iterator, Optional
+
+from .exceptions import LGHorizonApiError
+
+_decoder = json.JSONDecoder()
+_whitespace = " \t\n\r"
+_number_chars = frozenset("0123456789+-.eE")
+
+
+class _JsonStream:
+    """Text buffer over the chunks, extended on demand."""
+
+    def __init__(self, chunks: Iterable[bytes]) -> None:
+        self._chunks = iter(chunks)
+        self._text_decoder = codecs.getincrementaldecoder("utf-8")()
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self) -> bool:
+        """Read the next chunk; return False at the end of the body."""
+        if self.eof:
+            return False
+        # Drop what has been parsed so the buffer stays as small as one element
+        self.buffer = self.buffer[self.pos :]
+        self.pos = 0
+        for chunk in self._chunks:
+            if chunk:
+                self.buffer += self._text_decoder.decode(chunk)
+                return True
+        self.buffer += self._text_decoder.decode(b"", final=True)
+        self.eof = True
+        return False
+
+    def peek(self) -> str:
+        """Return the next non whitespace character, or "" at the end."""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in _whitespace:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                return ""
+
+    def expect(self, char: str) -> None:
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Expected {char!r} in JSON stream, found {found!r}")
+        self.pos += 1
+
+    def value(self) -> Any:
+        """Decode the next complete JSON value."""
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if self.fill():
+                    continue
+                raise
+            # A number or literal running to the end of the buffer may
+            # continue in the next chunk
+            if not isinstance(value, (dict, list, str)) and self._at_tail(end):
+                if self.fill():
+                    continue
+            self.pos = end
+            return value
+
+    def _at_tail(self, end: int) -> bool:
+        while end < len(self.buffer):
+            if self.buffer[end] not in _number_chars:
+                return False
+            end += 1
+        return True
+
+
+def iter_json_array(chunks: Iterable[bytes], key: Optional[str] = None) -> Iterator[Any]:
+    """Yield the elements of a JSON array one at a time.
+
+    The body is either the array itself or an object with the array under
+    key, e.g. {"data": [...]}. Only one element is held in memory at a time.
+    Raises LGHorizonApiError when the object has no such key.
+    """
+    stream = _JsonStream(chunks)
+    if stream.peek() == "{":
+        if key is None:
+            raise ValueError("JSON stream is an object, a key is required")
+        stream.expect("{")
+        while True:
+            if stream.peek() == "}":
+                raise LGHorizonApiError(f"Key {key!r} not found in JSON stream")
+            name = stream.value()
+            stream.expect(":")
+            if name == key:
+                break
+            stream.value()
+            if stream.peek() == ",":
+                stream.expect(",")
+    stream.expect("[")
+    if stream.peek() == "]":
+        return
+    while True:
+        yield stream.value()
+        if stream.peek() == "]":
+            return
+        stream.expect(",")
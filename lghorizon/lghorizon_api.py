@@ -2,12 +2,50 @@
 
 import logging
 import json
+import gzip
+import os
+import threading
+import time
 import sys, traceback
-from .exceptions import LGHorizonApiUnauthorizedError, LGHorizonApiConnectionError
+from contextlib import contextmanager
+from .exceptions import (
+    LGHorizonApiUnauthorizedError,
+    LGHorizonApiConnectionError,
+    LGHorizonApiCircuitOpenError,
+    LGHorizonApiRateLimitedError,
+)
 import backoff
-from requests import Session, exceptions as request_exceptions
-from paho.mqtt.client import WebsocketConnectionError
+from requests import Response, Session, exceptions as request_exceptions
 import re
+from .transport import LGHorizonTransportConfig
+from .circuit_breaker import LGHorizonCircuitBreaker
+from .token_store import LGHorizonTokenStore
+from .commands import LGHorizonGroupResult, gather_group_results
+from .image_cache import LGHorizonImageCache
+from .search import LGHorizonRecordingIndex
+from .json_stream import iter_json_array
+from .channel_catalog import channel_catalog
+from .watchdog import LGHorizonMqttWatchdog
+from .polling import LGHorizonPoller
+from .loop_bridge import LGHorizonLoopBridge
+from .stats_file import LGHorizonStatsWriter
+from .events import (
+    LGHorizonEvent,
+    LGHorizonEventHub,
+    LGHorizonEventSubscription,
+    LGHorizonRecordingChangedEvent,
+)
+from .rate_limit import (
+    LGHorizonTokenBucket,
+    get_household_bucket,
+    api_call_giveup,
+    non_blocking_throttle,
+    parse_retry_after,
+    retry_budget,
+    retry_budget_exhausted,
+    spend_retry,
+    throttle_may_block,
+)
 from .models import (
     LGHorizonAuth,
     LGHorizonBox,
@@ -31,14 +69,35 @@ from .const import (
     BOX_PLAY_STATE_DVR,
     BOX_PLAY_STATE_REPLAY,
     BOX_PLAY_STATE_VOD,
+    CHANNEL_REFRESH_DELAY,
+    EVENT_OVERFLOW_MERGE,
+    ONLINE_RUNNING,
     RECORDING_TYPE_SINGLE,
     RECORDING_TYPE_SEASON,
     RECORDING_TYPE_SHOW,
 )
-from typing import Any, Callable, Dict, List
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, Iterator, List, Tuple, Type
+
+if TYPE_CHECKING:
+    import asyncio
 
 _logger = logging.getLogger(__name__)
 _supported_platforms = ["EOS", "EOS2", "HORIZON", "APOLLO"]
+_state_version = 1
+# Bytes read at a time when streaming list responses
+_stream_chunk_size = 64 * 1024
+
+
+def _is_entitlement_message(message: Any) -> bool:
+    """Whether a purchaseService message may change the channel entitlements.
+
+    Messages of another type, e.g. VOD rentals, are ignored; messages
+    without a type are assumed to be about entitlements.
+    """
+    if not isinstance(message, dict):
+        return True
+    message_type = message.get("type") or message.get("eventType")
+    return not message_type or "entitlement" in str(message_type).lower()
 
 
 class LGHorizonApi:
@@ -57,6 +116,18 @@ class LGHorizonApi:
     _identifier: str = None
     _config: str = None
     _refresh_callback: Callable = None
+    _channels_callback: Callable[[List[str], List[str], List[str]], None] = None
+    _channel_refresh_timer: threading.Timer = None
+    _watchdog: LGHorizonMqttWatchdog = None
+    _poller: LGHorizonPoller = None
+    _loop_bridge: LGHorizonLoopBridge = None
+    _stats_writer: LGHorizonStatsWriter = None
+    _telenet_session: Session = None
+    auth_timings: Dict[str, float] = None
+    connect_timings: Dict[str, float] = None
+    _token_store: LGHorizonTokenStore = None
+    _transport_config: LGHorizonTransportConfig = None
+    circuit_breakers: Dict[str, LGHorizonCircuitBreaker] = None
 
     def __init__(
         self,
@@ -65,12 +136,21 @@ class LGHorizonApi:
         country_code: str = "nl",
         identifier: str = None,
         refresh_token=None,
+        transport_config: LGHorizonTransportConfig = None,
+        circuit_breaker_threshold: int = 5,
+        circuit_breaker_timeout: float = 30.0,
+        token_store: LGHorizonTokenStore = None,
     ) -> None:
-        """Create LGHorizon API."""
+        """Create LGHorizon API.
+
+        With a token_store the tokens are saved after every login and used
+        on the next start, so a refresh replaces the password login.
+        """
         self.username = username
         self.password = password
         self.refresh_token = refresh_token
-        self._session = Session()
+        self._transport_config = transport_config or LGHorizonTransportConfig()
+        self._session = self._transport_config.create_session()
         self._country_settings = COUNTRY_SETTINGS[country_code]
         self._country_code = country_code
         self._auth = LGHorizonAuth()
@@ -78,11 +158,27 @@ class LGHorizonApi:
         self._channels = {}
         self._entitlements = []
         self._identifier = identifier
+        self.circuit_breakers = {}
+        self.auth_timings = {}
+        self.connect_timings = {}
+        self._token_store = token_store
+        self._stored_tokens_loaded = False
+        self._events = LGHorizonEventHub()
+        self._circuit_breaker_threshold = circuit_breaker_threshold
+        self._circuit_breaker_timeout = circuit_breaker_timeout
+        self._channel_refresh_lock = threading.Lock()
 
     @backoff.on_exception(
-        backoff.expo, LGHorizonApiConnectionError, max_tries=3, logger=_logger
+        backoff.expo,
+        LGHorizonApiConnectionError,
+        max_tries=3,
+        logger=_logger,
+        giveup=retry_budget_exhausted,
+        on_backoff=spend_retry,
     )
     def _authorize(self) -> None:
+        self._load_stored_tokens()
+        self._throttle()
         ctry_code = self._country_code[0:2]
         if ctry_code == "be":
             self.authorize_telenet()
@@ -90,20 +186,75 @@ class LGHorizonApi:
             self.authorize_gb()
         else:
             self._authorize_default()
+        self._save_tokens()
+
+    @property
+    def _token_store_key(self) -> str:
+        return f"{self._country_code}:{self.username}"
+
+    def _load_stored_tokens(self) -> None:
+        if not self._token_store or self._stored_tokens_loaded:
+            return
+        self._stored_tokens_loaded = True
+        tokens = self._token_store.load(self._token_store_key)
+        if not tokens or self._auth.refreshToken:
+            return
+        _logger.debug("Using stored tokens")
+        self._auth.fill(tokens)
+        self._session.cookies["ACCESSTOKEN"] = self._auth.accessToken
+        # An explicitly passed refresh token wins over the stored one
+        if not self.refresh_token:
+            self.refresh_token = self._auth.refreshToken
+
+    def _save_tokens(self) -> None:
+        if not self._token_store or not self._auth.refreshToken:
+            return
+        self._token_store.save(self._token_store_key, self._auth.to_json())
+
+    def _try_refresh_authorization(self) -> bool:
+        """Authorize with the refresh token, return False if there is none or it is rejected."""
+        refresh_token = self.refresh_token or self._auth.refreshToken
+        # A refresh token handed in by the caller has no known expiry, try it anyway
+        expired = self._auth.refreshTokenExpiry and self._auth.is_expired()
+        if not refresh_token or expired:
+            return False
+        _logger.debug("Authorizing via refresh")
+        try:
+            self._refresh_authorization(refresh_token)
+        except (LGHorizonApiUnauthorizedError, ValueError, KeyError) as ex:
+            # ValueError and KeyError: the response was not the expected JSON
+            _logger.info(f"Refresh token rejected ({ex}), logging in again")
+            self._drop_refresh_token()
+            return False
+        return True
+
+    def _drop_refresh_token(self) -> None:
+        """Forget a rejected refresh token so it is not tried again."""
+        self.refresh_token = None
+        self._auth.refreshToken = None
+        self._auth.refreshTokenExpiry = None
+        if self._token_store:
+            self._token_store.delete(self._token_store_key)
 
     def _authorize_default(self) -> None:
+        if self._try_refresh_authorization():
+            return
         _logger.debug("Authorizing")
         auth_url = f"{self._country_settings['api_url']}/auth-service/v1/authorization"
         auth_headers = {"x-device-code": "web"}
         auth_payload = {"password": self.password, "username": self.username}
         try:
             auth_response = self._session.post(
-                auth_url, headers=auth_headers, json=auth_payload
+                auth_url,
+                headers=auth_headers,
+                json=auth_payload,
+                timeout=self._transport_config.timeout_for("auth"),
             )
         except Exception as ex:
             raise LGHorizonApiConnectionError("Unknown connection failure") from ex
 
         if not auth_response.ok:
+            self._handle_rate_limit(auth_response, auth_url)
             error_json = auth_response.json()
             error = error_json["error"]
             if error and error["statusCode"] == 97401:
@@ -114,25 +265,40 @@ class LGHorizonApi:
                 raise LGHorizonApiConnectionError("Unknown connection error")
 
         self._auth.fill(auth_response.json())
+        self.refresh_token = self._auth.refreshToken
         _logger.debug("Authorization succeeded")
 
     def authorize_gb(self) -> None:
         _logger.debug("Authorizing via refresh")
+        self._refresh_authorization(self.refresh_token)
+
+    def _refresh_authorization(self, refresh_token: str) -> None:
         refresh_url = (
             f"{self._country_settings['api_url']}/auth-service/v1/authorization/refresh"
         )
         headers = {"content-type": "application/json", "charset": "utf-8"}
-        payload = '{"refreshToken":"' + self.refresh_token + '"}'
+        payload = json.dumps({"refreshToken": refresh_token})
 
+        step_start = time.monotonic()
         try:
             auth_response = self._session.post(
-                refresh_url, headers=headers, data=payload
+                refresh_url,
+                headers=headers,
+                data=payload,
+                timeout=self._transport_config.timeout_for("auth"),
             )
         except Exception as ex:
             raise LGHorizonApiConnectionError("Unknown connection failure") from ex
+        self._record_auth_step("refresh", step_start)
 
         if not auth_response.ok:
             _logger.debug("response %s", auth_response)
+            self._handle_rate_limit(auth_response, refresh_url)
+            # Expired, revoked or malformed token; too many requests is not a rejection
+            if 400 <= auth_response.status_code < 500 and auth_response.status_code != 429:
+                raise LGHorizonApiUnauthorizedError(
+                    f"Refresh rejected with status {auth_response.status_code}"
+                )
             error_json = auth_response.json()
             error = None
             if "error" in error_json:
@@ -153,33 +319,103 @@ class LGHorizonApi:
 
         _logger.debug("Authorization succeeded")
 
+    @contextmanager
+    def _timed_phase(self, phase: str):
+        """Record the duration of a connect phase in connect_timings, in ms."""
+        phase_start = time.monotonic()
+        try:
+            yield
+        finally:
+            duration = (time.monotonic() - phase_start) * 1000
+            self.connect_timings[phase] = duration
+            _logger.debug(f"Connect phase {phase} took {duration:.0f} ms")
+
+    def _record_auth_step(self, step: str, step_start: float) -> None:
+        duration = (time.monotonic() - step_start) * 1000
+        self.auth_timings[step] = duration
+        _logger.debug(f"Authorization step {step} took {duration:.0f} ms")
+
     def set_callback(self, refresh_callback: Callable) -> None:
         self._refresh_callback = refresh_callback
 
+    def subscribe(
+        self,
+        event_types: Iterable[Type[LGHorizonEvent]] = None,
+        maxsize: int = 100,
+        overflow: str = EVENT_OVERFLOW_MERGE,
+        notify: Callable[[], Any] = None,
+    ) -> LGHorizonEventSubscription:
+        """Subscribe to box events.
+
+        The subscription is a bounded queue that can be consumed with a
+        (async) for loop and never blocks the MQTT thread; see
+        LGHorizonEventSubscription for the overflow policies and notify.
+        """
+        return self._events.subscribe(event_types, maxsize, overflow, notify)
+
+    def _attach_box(self, box: LGHorizonBox) -> None:
+        box.set_event_sink(self._events.publish)
+        if self._loop_bridge:
+            box.set_callback_dispatcher(self._loop_bridge.dispatch)
+
+    def bind_loop(
+        self,
+        loop: "asyncio.AbstractEventLoop",
+        batch_callback: Callable[[List[str]], Any] = None,
+    ) -> LGHorizonLoopBridge:
+        """Deliver the box change callbacks on an asyncio event loop.
+
+        Callbacks from the MQTT thread are batched into one wakeup of the
+        loop per iteration; see LGHorizonLoopBridge.
+        """
+        self._loop_bridge = LGHorizonLoopBridge(loop, batch_callback)
+        for box in self.settop_boxes.values():
+            box.set_callback_dispatcher(self._loop_bridge.dispatch)
+        return self._loop_bridge
+
+    def set_channels_callback(
+        self, channels_callback: Callable[[List[str], List[str], List[str]], None]
+    ) -> None:
+        """Set callback called with the added, removed and updated channel ids."""
+        self._channels_callback = channels_callback
+
     def authorize_telenet(self):
+        self.auth_timings = {}
+        if self._try_refresh_authorization():
+            return
+        self._authorize_telenet_oauth()
+
+    def _authorize_telenet_oauth(self) -> None:
+        if self._telenet_session is None:
+            # Kept between logins to reuse the SSO cookies and connections
+            self._telenet_session = self._transport_config.create_session()
+        login_session = self._telenet_session
+        timeout = self._transport_config.timeout_for("auth")
         try:
-            login_session = Session()
             # Step 1 - Get Authorization data
             _logger.debug("Step 1 - Get Authorization data")
+            step_start = time.monotonic()
             auth_url = (
                 f"{self._country_settings['api_url']}/auth-service/v1/sso/authorization"
             )
-            auth_response = login_session.get(auth_url)
+            auth_response = login_session.get(auth_url, timeout=timeout)
             if not auth_response.ok:
                 raise LGHorizonApiConnectionError("Can't connect to authorization URL")
             auth_response_json = auth_response.json()
             authorizationUri = auth_response_json["authorizationUri"]
             authValidtyToken = auth_response_json["validityToken"]
+            self._record_auth_step("authorization_data", step_start)
 
             # Step 2 - Get Authorization cookie
             _logger.debug("Step 2 - Get Authorization cookie")
-
-            auth_cookie_response = login_session.get(authorizationUri)
+            step_start = time.monotonic()
+            auth_cookie_response = login_session.get(authorizationUri, timeout=timeout)
             if not auth_cookie_response.ok:
                 raise LGHorizonApiConnectionError("Can't connect to authorization URL")
+            self._record_auth_step("authorization_cookie", step_start)
 
             _logger.debug("Step 3 - Login")
-
+            step_start = time.monotonic()
             username_fieldname = self._country_settings["oauth_username_fieldname"]
             pasword_fieldname = self._country_settings["oauth_password_fieldname"]
 
@@ -190,24 +426,37 @@ class LGHorizonApi:
             }
 
             login_response = login_session.post(
-                self._country_settings["oauth_url"], payload, allow_redirects=False
+                self._country_settings["oauth_url"],
+                payload,
+                allow_redirects=False,
+                timeout=timeout,
             )
             if not login_response.ok:
                 raise LGHorizonApiConnectionError("Can't connect to authorization URL")
             redirect_url = login_response.headers[
                 self._country_settings["oauth_redirect_header"]
             ]
+            self._record_auth_step("login", step_start)
 
+            _logger.debug("Step 4 - Follow redirect")
+            step_start = time.monotonic()
             if not self._identifier is None:
                 redirect_url += f"&dtv_identifier={self._identifier}"
-            redirect_response = login_session.get(redirect_url, allow_redirects=False)
+            redirect_response = login_session.get(
+                redirect_url, allow_redirects=False, timeout=timeout
+            )
             success_url = redirect_response.headers[
                 self._country_settings["oauth_redirect_header"]
             ]
             codeMatches = re.findall(r"code=(.*)&", success_url)
+            if not codeMatches:
+                raise LGHorizonApiUnauthorizedError("No authorization code received")
 
             authorizationCode = codeMatches[0]
+            self._record_auth_step("redirect", step_start)
 
+            _logger.debug("Step 5 - Authorization grant")
+            step_start = time.monotonic()
             new_payload = {
                 "authorizationGrant": {
                     "authorizationCode": authorizationCode,
@@ -218,44 +467,129 @@ class LGHorizonApi:
                 "content-type": "application/json",
             }
             post_result = login_session.post(
-                auth_url, json.dumps(new_payload), headers=headers
+                auth_url, json.dumps(new_payload), headers=headers, timeout=timeout
             )
+            if not post_result.ok:
+                raise LGHorizonApiConnectionError("Authorization grant failed")
             self._auth.fill(post_result.json())
+            self.refresh_token = self._auth.refreshToken
             self._session.cookies["ACCESSTOKEN"] = self._auth.accessToken
+            self._record_auth_step("authorization_grant", step_start)
+        except (LGHorizonApiUnauthorizedError, LGHorizonApiConnectionError):
+            raise
         except Exception as ex:
-            pass
+            raise LGHorizonApiConnectionError("Telenet login failed") from ex
+
+        if self._refresh_callback:
+            self._refresh_callback()
+        _logger.debug(
+            f"Authorization succeeded in {sum(self.auth_timings.values()):.0f} ms"
+        )
 
     def _obtain_mqtt_token(self):
         _logger.debug("Obtain mqtt token...")
         mqtt_auth_url = self._config["authorizationService"]["URL"]
-        mqtt_response = self._do_api_call(f"{mqtt_auth_url}/v1/mqtt/token")
+        mqtt_response = self._do_api_call(
+            f"{mqtt_auth_url}/v1/mqtt/token", "authorizationService"
+        )
         self._auth.mqttToken = mqtt_response["token"]
         _logger.debug(f"MQTT token: {self._auth.mqttToken}")
 
     @backoff.on_exception(
-        backoff.expo, BaseException, jitter=None, max_time=600, logger=_logger
+        backoff.expo,
+        BaseException,
+        jitter=None,
+        max_time=600,
+        logger=_logger,
+        giveup=retry_budget_exhausted,
+        on_backoff=spend_retry,
     )
     def connect(self) -> None:
-        self._config = self._get_config(self._country_code)
+        self.connect_timings = {}
+        with self._timed_phase("config"):
+            self._config = self._get_config(self._country_code)
         _logger.debug("Connect to API")
-        self._authorize()
-        self._obtain_mqtt_token()
+        with self._timed_phase("authorize"):
+            self._authorize()
+        with self._timed_phase("mqtt_token"):
+            self._obtain_mqtt_token()
         self._mqttClient = LGHorizonMqttClient(
             self._auth,
             self._config["mqttBroker"]["URL"],
             self._on_mqtt_connected,
             self._on_mqtt_message,
         )
-        self._register_customer_and_boxes()
-        self._mqttClient.connect()
+        with self._timed_phase("customer_and_boxes"):
+            self._register_customer_and_boxes()
+        with self._timed_phase("mqtt_connect"):
+            if self._poller:
+                # Don't fail on an unreachable broker, poll until it is back
+                self._mqttClient.connect_async()
+                self._poller.start()
+            else:
+                self._mqttClient.connect()
 
     def disconnect(self):
         """Disconnect."""
         _logger.debug("Disconnect from API")
+        if self._watchdog:
+            self._watchdog.stop()
+        if self._poller:
+            self._poller.stop()
+        if self._stats_writer:
+            self._stats_writer.stop()
+        with self._channel_refresh_lock:
+            if self._channel_refresh_timer:
+                self._channel_refresh_timer.cancel()
+                self._channel_refresh_timer = None
+        if self._mqttClient is None:
+            # Never connected, e.g. only restored from a snapshot
+            return
         if not self._mqttClient.is_connected:
+            if self._poller:
+                self._mqttClient.disconnect()
             return
         self._mqttClient.disconnect()
 
+    def reconnect_mqtt(self) -> None:
+        """Reconnect to the MQTT broker with a fresh token."""
+        if self._mqttClient is None:
+            raise LGHorizonApiConnectionError("Not connected, call connect() first")
+        self._obtain_mqtt_token()
+        self._mqttClient.reconnect()
+
+    def start_watchdog(self, **kwargs) -> LGHorizonMqttWatchdog:
+        """Start watching for a stale MQTT connection.
+
+        The keyword arguments are passed to LGHorizonMqttWatchdog.
+        """
+        if self._watchdog:
+            self._watchdog.stop()
+        self._watchdog = LGHorizonMqttWatchdog(self, **kwargs)
+        self._watchdog.start()
+        return self._watchdog
+
+    def start_stats_file(
+        self, file_path: str, interval: float = 60.0
+    ) -> LGHorizonStatsWriter:
+        """Write get_stats() to file_path every interval seconds until disconnect.
+
+        Read it with `python -m lghorizon stats --stats-file file_path`.
+        """
+        if self._stats_writer:
+            self._stats_writer.stop()
+        self._stats_writer = LGHorizonStatsWriter(self, file_path, interval)
+        self._stats_writer.start()
+        return self._stats_writer
+
+    def enable_polling_fallback(self, **kwargs) -> LGHorizonPoller:
+        """Poll the REST state while MQTT is not connected; call before connect().
+
+        The keyword arguments are passed to LGHorizonPoller.
+        """
+        self._poller = LGHorizonPoller(self, **kwargs)
+        return self._poller
+
     def _on_mqtt_connected(self) -> None:
         _logger.debug("Connected to MQTT server. Registering all boxes...")
         box: LGHorizonBox
@@ -263,7 +597,17 @@ class LGHorizonApi:
             box.register_mqtt()
 
     def _on_mqtt_message(self, message: str, topic: str) -> None:
-        if "source" in message:
+        if self._watchdog:
+            self._watchdog.record_message(message, topic)
+        # Runs on the MQTT network loop, API calls must not wait for the rate limit
+        with non_blocking_throttle():
+            self._handle_mqtt_message(message, topic)
+
+    def _handle_mqtt_message(self, message: str, topic: str) -> None:
+        if topic.endswith("/purchaseService"):
+            if _is_entitlement_message(message):
+                self._schedule_channel_refresh()
+        elif "source" in message:
             deviceId = message["source"]
             if not isinstance(deviceId,str):
                 _logger.debug("ignoring message - not a string")
@@ -275,19 +619,39 @@ class LGHorizonApi:
                     self.settop_boxes[deviceId].update_state(message)
                 if "status" in message:
                     self._handle_box_update(deviceId, message)
+            except LGHorizonApiCircuitOpenError as circuitEx:
+                _logger.debug(str(circuitEx))
+                self.settop_boxes[deviceId]._set_unknown_channel_info()
+                self.settop_boxes[deviceId]._trigger_callback()
+            except LGHorizonApiRateLimitedError as rateLimitEx:
+                # Keep the current snapshot, a later status message catches up
+                _logger.debug(f"Status of box {deviceId} not updated: {rateLimitEx}")
             except Exception:
                 _logger.exception("Could not handle status message")
                 _logger.warning(f"Full message: {str(message)}")
-                self.settop_boxes[deviceId].playing_info.reset()
-                self.settop_boxes[deviceId].playing_info.set_paused(False)
-        elif "CPE.capacity" in message:
-            splitted_topic = topic.split("/")
-            if len(splitted_topic) != 4:
-                return
-            deviceId = splitted_topic[1]
-            if not deviceId in self.settop_boxes.keys():
+                self.settop_boxes[deviceId].reset_playing_info()
+        elif "Recordings" in topic or "/recordingStatus" in topic:
+            if "CPE.capacity" in message:
+                self._handle_capacity_message(message, topic)
                 return
-            self.settop_boxes[deviceId].update_recording_capacity(message)
+            splitted_topic = topic.split("/")
+            deviceId = None
+            if len(splitted_topic) > 2 and splitted_topic[1] in self.settop_boxes:
+                deviceId = splitted_topic[1]
+            self._events.publish(
+                LGHorizonRecordingChangedEvent(deviceId, topic, message)
+            )
+        elif "CPE.capacity" in message:
+            self._handle_capacity_message(message, topic)
+
+    def _handle_capacity_message(self, message: Any, topic: str) -> None:
+        splitted_topic = topic.split("/")
+        if len(splitted_topic) != 4:
+            return
+        deviceId = splitted_topic[1]
+        if not deviceId in self.settop_boxes.keys():
+            return
+        self.settop_boxes[deviceId].update_recording_capacity(message)
 
     def _handle_box_update(self, deviceId: str, raw_message: Any) -> None:
         statusPayload = raw_message["status"]
@@ -300,9 +664,8 @@ class LGHorizonApi:
                 return
             source_type = playerState["sourceType"]
             state_source = playerState["source"]
-            self.settop_boxes[deviceId].playing_info.set_paused(
-                playerState["speed"] == 0
-            )
+            # Applied together with the rest of the update, in one snapshot
+            paused = playerState["speed"] == 0
             if (
                 source_type
                 in (
@@ -314,12 +677,13 @@ class LGHorizonApi:
             ):
                 eventId = state_source["eventId"]
                 raw_replay_event = self._do_api_call(
-                    f"{self._config['linearService']['URL']}/v2/replayEvent/{eventId}?returnLinearContent=true&language={self._country_settings['language']}"
+                    f"{self._config['linearService']['URL']}/v2/replayEvent/{eventId}?returnLinearContent=true&language={self._country_settings['language']}",
+                    "linearService",
                 )
                 replayEvent = LGHorizonReplayEvent(raw_replay_event)
                 channel = self._channels[replayEvent.channelId]
                 self.settop_boxes[deviceId].update_with_replay_event(
-                    source_type, replayEvent, channel
+                    source_type, replayEvent, channel, paused
                 )
             elif source_type == BOX_PLAY_STATE_DVR:
                 recordingId = state_source["recordingId"]
@@ -328,7 +692,8 @@ class LGHorizonApi:
                 last_speed_change_time = playerState["lastSpeedChangeTime"]
                 relative_position = playerState["relativePosition"]
                 raw_recording = self._do_api_call(
-                    f"{self._config['recordingService']['URL']}/customers/{self._auth.householdId}/details/single/{recordingId}?profileId=4504e28d-c1cb-4284-810b-f5eaab06f034&language={self._country_settings['language']}"
+                    f"{self._config['recordingService']['URL']}/customers/{self._auth.householdId}/details/single/{recordingId}?profileId=4504e28d-c1cb-4284-810b-f5eaab06f034&language={self._country_settings['language']}",
+                    "recordingService",
                 )
                 recording = LGHorizonRecordingSingle(raw_recording)
                 channel = self._channels[recording.channelId]
@@ -340,47 +705,193 @@ class LGHorizonApi:
                     session_end_time,
                     last_speed_change_time,
                     relative_position,
+                    paused,
                 )
             elif source_type == BOX_PLAY_STATE_VOD:
                 titleId = state_source["titleId"]
                 last_speed_change_time = playerState["lastSpeedChangeTime"]
                 relative_position = playerState["relativePosition"]
                 raw_vod = self._do_api_call(
-                    f"{self._config['vodService']['URL']}/v2/detailscreen/{titleId}?language={self._country_settings['language']}&profileId=4504e28d-c1cb-4284-810b-f5eaab06f034&cityId={self._customer.cityId}"
+                    f"{self._config['vodService']['URL']}/v2/detailscreen/{titleId}?language={self._country_settings['language']}&profileId=4504e28d-c1cb-4284-810b-f5eaab06f034&cityId={self._customer.cityId}",
+                    "vodService",
                 )
                 vod = LGHorizonVod(raw_vod)
                 self.settop_boxes[deviceId].update_with_vod(
-                    source_type, vod, last_speed_change_time, relative_position
+                    source_type,
+                    vod,
+                    last_speed_change_time,
+                    relative_position,
+                    paused,
                 )
+            else:
+                self.settop_boxes[deviceId].set_paused(paused)
         elif uiStatus == "apps":
             app = LGHorizonApp(statusPayload["appsState"])
             self.settop_boxes[deviceId].update_with_app("app", app)
 
-    @backoff.on_exception(
-        backoff.expo, LGHorizonApiConnectionError, max_tries=3, logger=_logger
-    )
-    def _do_api_call(self, url: str, tries: int = 0) -> str:
+    def _allow_api_call(self, url: str, service: str) -> LGHorizonCircuitBreaker:
+        # Throttle first, a half open circuit hands out its probe slot
+        self._throttle()
+        circuit_breaker = self._get_circuit_breaker(service)
+        if not circuit_breaker.allow_request():
+            raise LGHorizonApiCircuitOpenError(
+                f"Service {circuit_breaker.name} unavailable, not calling {url}"
+            )
         _logger.info(f"Executing API call to {url}")
+        return circuit_breaker
+
+    @contextmanager
+    def _api_call_errors(self, url: str, circuit_breaker: LGHorizonCircuitBreaker):
+        """Translate request errors and feed the outcome to the circuit breaker."""
         try:
-            api_response = self._session.get(url)
-            api_response.raise_for_status()
-            json_response = api_response.json()
+            yield
         except request_exceptions.HTTPError as httpEx:
+            if httpEx.response is not None and httpEx.response.status_code >= 500:
+                circuit_breaker.record_failure()
+            else:
+                circuit_breaker.record_success()
+            self._handle_rate_limit(httpEx.response, url)
             self._authorize()
             raise LGHorizonApiConnectionError(
                 f"Unable to call {url}. Error:{str(httpEx)}"
             )
-        _logger.debug(f"Result API call: {json_response}")
+        except (
+            request_exceptions.Timeout,
+            request_exceptions.ConnectionError,
+            request_exceptions.ChunkedEncodingError,
+        ) as connectionEx:
+            circuit_breaker.record_failure()
+            raise LGHorizonApiConnectionError(
+                f"Unable to call {url}. Error:{str(connectionEx)}"
+            ) from connectionEx
+        except Exception:
+            circuit_breaker.record_failure()
+            raise
+        else:
+            circuit_breaker.record_success()
+        finally:
+            # E.g. an abandoned streamed call: no outcome, but free the probe
+            circuit_breaker.release_probe()
+
+    @backoff.on_exception(
+        backoff.expo,
+        LGHorizonApiConnectionError,
+        max_tries=3,
+        logger=_logger,
+        giveup=api_call_giveup,
+        on_backoff=spend_retry,
+    )
+    def _do_api_call(self, url: str, service: str = None) -> str:
+        circuit_breaker = self._allow_api_call(url, service)
+        with self._api_call_errors(url, circuit_breaker):
+            api_response = self._session.get(
+                url, timeout=self._transport_config.timeout_for(service)
+            )
+            api_response.raise_for_status()
+            json_response = api_response.json()
+        _logger.debug("Result API call: %s", json_response)
         return json_response
 
-    def _register_customer_and_boxes(self):
+    def _do_api_call_streamed(
+        self, url: str, service: str = None, key: str = None
+    ) -> Iterator[Any]:
+        """Yield the elements of a JSON array response while it is downloaded.
+
+        The array is the response itself or the value of key in the response
+        object. Used for the large list endpoints so the whole payload is
+        never held in memory at once.
+        """
+        api_response, circuit_breaker = self._open_api_stream(url, service)
+        count = 0
+        # Errors while reading are not retried, items have been yielded already
+        with api_response, self._api_call_errors(url, circuit_breaker):
+            for item in iter_json_array(
+                api_response.iter_content(_stream_chunk_size), key
+            ):
+                count += 1
+                yield item
+        _logger.debug(f"Result API call: {count} items")
+
+    @backoff.on_exception(
+        backoff.expo,
+        LGHorizonApiConnectionError,
+        max_tries=3,
+        logger=_logger,
+        giveup=api_call_giveup,
+        on_backoff=spend_retry,
+    )
+    def _open_api_stream(
+        self, url: str, service: str
+    ) -> Tuple[Response, LGHorizonCircuitBreaker]:
+        """Send a streamed request and return the response once the headers are in."""
+        circuit_breaker = self._allow_api_call(url, service)
+        with self._api_call_errors(url, circuit_breaker):
+            api_response = self._session.get(
+                url, timeout=self._transport_config.timeout_for(service), stream=True
+            )
+            try:
+                api_response.raise_for_status()
+            except request_exceptions.HTTPError:
+                api_response.close()
+                raise
+        return api_response, circuit_breaker
+
+    def _household_bucket(self) -> LGHorizonTokenBucket:
+        # Before the first login the household is not known yet
+        household = self._auth.householdId or self._token_store_key
+        return get_household_bucket(
+            household,
+            self._transport_config.requests_per_second,
+            self._transport_config.burst,
+        )
+
+    def _throttle(self) -> None:
+        """Wait for the household rate limit before calling the backend."""
+        retry_budget.record_request()
+        max_wait = self._transport_config.max_throttle_wait
+        if not throttle_may_block():
+            max_wait = 0
+        self._household_bucket().acquire(max_wait)
+
+    def _handle_rate_limit(self, response, url: str) -> None:
+        """Honor 429 responses and Retry-After headers for the household."""
+        if response is None or response.status_code not in (429, 503):
+            return
+        retry_after = parse_retry_after(response.headers.get("Retry-After"))
+        if retry_after is None and response.status_code == 503:
+            return
+        if retry_after is None:
+            retry_after = 1.0
+        self._household_bucket().block_for(retry_after)
+        raise LGHorizonApiRateLimitedError(
+            f"Rate limited calling {url}, retry after {retry_after:.0f}s"
+        )
+
+    def _get_circuit_breaker(self, service: str) -> LGHorizonCircuitBreaker:
+        name = service or "default"
+        if name not in self.circuit_breakers:
+            self.circuit_breakers[name] = LGHorizonCircuitBreaker(
+                name, self._circuit_breaker_threshold, self._circuit_breaker_timeout
+            )
+        return self.circuit_breakers[name]
+
+    def _get_personalisation(self) -> Dict[str, Any]:
         _logger.info("Get personalisation info...")
         personalisation_result = self._do_api_call(
-            f"{self._config['personalizationService']['URL']}/v1/customer/{self._auth.householdId}?with=profiles%2Cdevices"
+            f"{self._config['personalizationService']['URL']}/v1/customer/{self._auth.householdId}?with=profiles%2Cdevices",
+            "personalizationService",
         )
         _logger.debug(f"Personalisation result: {personalisation_result}")
+        return personalisation_result
+
+    def _register_customer_and_boxes(self):
+        personalisation_result = self._get_personalisation()
         self._customer = LGHorizonCustomer(personalisation_result)
-        self._get_channels()
+        with self._timed_phase("channels"):
+            self._get_channels()
+        self._register_boxes(personalisation_result)
+
+    def _register_boxes(self, personalisation_result: Dict[str, Any]) -> None:
         if not "assignedDevices" in personalisation_result:
             _logger.warning("No boxes found.")
             return
@@ -396,35 +907,168 @@ class LGHorizonApi:
                 platformType = self._country_settings["platform_types"][platform_type]
             else:
                 platformType = None
+            if device["deviceId"] in self.settop_boxes:
+                # Keep restored boxes (and their callbacks), only attach the live client.
+                box = self.settop_boxes[device["deviceId"]]
+                box.deviceFriendlyName = device["settings"]["deviceFriendlyName"]
+                box.set_mqtt_client(self._mqttClient)
+                continue
             box = LGHorizonBox(
                 device, platformType, self._mqttClient, self._auth, self._channels
             )
+            self._attach_box(box)
             self.settop_boxes[box.deviceId] = box
             _logger.info(f"Box {box.deviceId} registered...")
 
-    def _get_channels(self):
+    def _get_channels(self, refresh_lineup: bool = False):
         self._update_entitlements()
         _logger.info("Retrieving channels...")
-        channels_result = self._do_api_call(
-            f"{self._config['linearService']['URL']}/v2/channels?cityId={self._customer.cityId}&language={self._country_settings['language']}&productClass=Orion-DASH"
+        linear_url = self._config["linearService"]["URL"]
+        language = self._country_settings["language"]
+        product_class = "Orion-DASH"
+        channels_url = (
+            f"{linear_url}/v2/channels?cityId={self._customer.cityId}"
+            f"&language={language}&productClass={product_class}"
         )
-        for channel in channels_result:
-            if "isRadio" in channel and channel["isRadio"]:
-                continue
-            common_entitlements = list(
-                set(self._entitlements) & set(channel["linearProducts"])
-            )
-            if len(common_entitlements) == 0:
+        lineup = channel_catalog.get_lineup(
+            (linear_url, self._customer.cityId, language, product_class),
+            lambda: self._do_api_call_streamed(channels_url, "linearService"),
+            refresh=refresh_lineup,
+        )
+        entitled_channels = lineup.entitled(self._entitlements)
+        # Update the shared dict in place, the boxes hold a reference to it.
+        removed = [
+            channel_id
+            for channel_id in self._channels
+            if channel_id not in entitled_channels
+        ]
+        for channel_id in removed:
+            del self._channels[channel_id]
+        added = []
+        updated = []
+        for channel_id, channel in entitled_channels.items():
+            current = self._channels.get(channel_id)
+            if current is channel:
                 continue
-            channel_id = channel["id"]
-            self._channels[channel_id] = LGHorizonChannel(channel)
+            if current is None:
+                added.append(channel_id)
+            elif current.to_json() != channel.to_json():
+                updated.append(channel_id)
+            self._channels[channel_id] = channel
         _logger.info(f"{len(self._channels)} retrieved.")
+        return added, removed, updated
+
+    def refresh_channels(self) -> None:
+        """Refresh entitlements and the lineup, and update the channels that changed."""
+        added, removed, updated = self._get_channels(refresh_lineup=True)
+        if not added and not removed and not updated:
+            return
+        _logger.info(
+            f"Channels changed: {len(added)} added, {len(removed)} removed, "
+            f"{len(updated)} updated"
+        )
+        if self._channels_callback:
+            self._channels_callback(added, removed, updated)
+
+    def _schedule_channel_refresh(self) -> None:
+        """Refresh the channels in the background once the messages stop coming."""
+        with self._channel_refresh_lock:
+            if self._channel_refresh_timer:
+                self._channel_refresh_timer.cancel()
+            self._channel_refresh_timer = threading.Timer(
+                CHANNEL_REFRESH_DELAY, self._run_channel_refresh
+            )
+            self._channel_refresh_timer.daemon = True
+            self._channel_refresh_timer.start()
+
+    def _run_channel_refresh(self) -> None:
+        with self._channel_refresh_lock:
+            self._channel_refresh_timer = None
+        try:
+            self.refresh_channels()
+        except Exception:
+            _logger.exception("Could not refresh channels")
+
+    def _fan_out(
+        self,
+        command: Callable[[LGHorizonBox], Any],
+        device_ids: List[str] = None,
+        timeout: float = 5.0,
+    ) -> LGHorizonGroupResult:
+        """Send a command to all selected boxes and then wait for all of them."""
+        if device_ids is None:
+            device_ids = list(self.settop_boxes.keys())
+        pending = {}
+        for device_id in device_ids:
+            try:
+                pending[device_id] = command(self.settop_boxes[device_id])
+            except Exception as ex:
+                _logger.warning(f"Command for box {device_id} failed: {ex}")
+                pending[device_id] = ex
+        result = gather_group_results(pending, timeout)
+        _logger.debug(f"Group command done: {result}")
+        return result
+
+    def group_turn_on(
+        self, device_ids: List[str] = None, timeout: float = 5.0
+    ) -> LGHorizonGroupResult:
+        """Turn on all (or the given) boxes that are in standby."""
+        return self._fan_out(lambda box: box.turn_on(), device_ids, timeout)
+
+    def group_turn_off(
+        self, device_ids: List[str] = None, timeout: float = 5.0
+    ) -> LGHorizonGroupResult:
+        """Turn off all (or the given) boxes that are running."""
+        return self._fan_out(lambda box: box.turn_off(), device_ids, timeout)
+
+    def group_send_key(
+        self, key: str, device_ids: List[str] = None, timeout: float = 5.0
+    ) -> LGHorizonGroupResult:
+        """Send a key press to all (or the given) running boxes."""
+
+        def send_key(box: LGHorizonBox):
+            if box.state != ONLINE_RUNNING:
+                return None
+            return box.send_key_to_box(key)
+
+        return self._fan_out(send_key, device_ids, timeout)
+
+    def group_set_channel(
+        self, channel_title: str, device_ids: List[str] = None, timeout: float = 5.0
+    ) -> LGHorizonGroupResult:
+        """Tune all (or the given) running boxes to a channel and wait for the acknowledgements."""
+        if not any(
+            channel.title == channel_title for channel in list(self._channels.values())
+        ):
+            raise ValueError(f"Unknown channel: {channel_title}")
+
+        def set_channel(box: LGHorizonBox):
+            if box.state != ONLINE_RUNNING:
+                return None
+            return box.set_channel(channel_title, timeout)
+
+        return self._fan_out(set_channel, device_ids, timeout)
+
+    def prefetch_channel_images(
+        self, image_cache: LGHorizonImageCache, stream_images: bool = False
+    ):
+        """Download the logos of all entitled channels in the background.
+
+        With stream_images the stream images are downloaded as well.
+        """
+        urls = []
+        for channel in list(self._channels.values()):
+            urls.append(channel.logo_image)
+            if stream_images:
+                urls.append(channel.stream_image)
+        return image_cache.prefetch(urls)
 
     def _get_replay_event(self, listingId) -> Any:
         """Get listing."""
         _logger.info("Retrieving replay event details...")
         response = self._do_api_call(
-            f"{self._config['linearService']['URL']}/v2/replayEvent/{listingId}?returnLinearContent=true&language={self._country_settings['language']}"
+            f"{self._config['linearService']['URL']}/v2/replayEvent/{listingId}?returnLinearContent=true&language={self._country_settings['language']}",
+            "linearService",
         )
         _logger.info("Replay event details retrieved")
         return response
@@ -438,7 +1082,8 @@ class LGHorizonApi:
         try:
             _logger.info("Retrieving recordingcapacity...")
             quota_content = self._do_api_call(
-                f"{self._config['recordingService']['URL']}/customers/{self._auth.householdId}/quota"
+                f"{self._config['recordingService']['URL']}/customers/{self._auth.householdId}/quota",
+                "recordingService",
             )
             if not "quota" in quota_content and not "occupied" in quota_content:
                 _logger.error("Unable to fetch recording capacity...")
@@ -453,11 +1098,13 @@ class LGHorizonApi:
 
     def get_recordings(self) -> List[LGHorizonBaseRecording]:
         _logger.info("Retrieving recordings...")
-        recording_content = self._do_api_call(
-            f"{self._config['recordingService']['URL']}/customers/{self._auth.householdId}/recordings?sort=time&sortOrder=desc&language={self._country_settings['language']}"
+        recording_items = self._do_api_call_streamed(
+            f"{self._config['recordingService']['URL']}/customers/{self._auth.householdId}/recordings?sort=time&sortOrder=desc&language={self._country_settings['language']}",
+            "recordingService",
+            "data",
         )
         recordings = []
-        for recording_data_item in recording_content["data"]:
+        for recording_data_item in recording_items:
             type = recording_data_item["type"]
             if type == RECORDING_TYPE_SINGLE:
                 recordings.append(LGHorizonRecordingSingle(recording_data_item))
@@ -468,11 +1115,13 @@ class LGHorizonApi:
 
     def get_recording_show(self, showId: str) -> list[LGHorizonRecordingSingle]:
         _logger.info("Retrieving show recordings...")
-        show_recording_content = self._do_api_call(
-            f"{self._config['recordingService']['URL']}/customers/{self._auth.householdId}/episodes/shows/{showId}?source=recording&language=nl&sort=time&sortOrder=asc"
+        show_recording_items = self._do_api_call_streamed(
+            f"{self._config['recordingService']['URL']}/customers/{self._auth.householdId}/episodes/shows/{showId}?source=recording&language=nl&sort=time&sortOrder=asc",
+            "recordingService",
+            "data",
         )
         recordings = []
-        for item in show_recording_content["data"]:
+        for item in show_recording_items:
             if item["source"] == "show":
                 recordings.append(LGHorizonRecordingShow(item))
             else:
@@ -480,18 +1129,153 @@ class LGHorizonApi:
         _logger.info(f"{len(recordings)} showrecordings retrieved...")
         return recordings
 
+    def build_recording_index(
+        self, index: LGHorizonRecordingIndex = None
+    ) -> LGHorizonRecordingIndex:
+        """Fetch all recordings, including show and season episodes, into a search index.
+
+        Passing the previous index updates it incrementally.
+        """
+        if index is None:
+            index = LGHorizonRecordingIndex()
+        recordings = []
+        for recording in self.get_recordings():
+            recordings.append(recording)
+            if isinstance(recording, LGHorizonRecordingListSeasonShow):
+                recordings.extend(self.get_recording_show(recording.showId))
+        added, removed = index.sync(recordings)
+        _logger.info(f"Recording index updated: {added} added, {removed} removed")
+        return index
+
     def _update_entitlements(self) -> None:
         _logger.info("Retrieving entitlements...")
-        entitlements_json = self._do_api_call(
-            f"{self._config['purchaseService']['URL']}/v2/customers/{self._auth.householdId}/entitlements?enableDaypass=true"
+        entitlements_url = (
+            f"{self._config['purchaseService']['URL']}/v2/customers/"
+            f"{self._auth.householdId}/entitlements?enableDaypass=true"
         )
+        entitlements_json = self._do_api_call(entitlements_url, "purchaseService")
         self._entitlements.clear()
         for entitlement in entitlements_json["entitlements"]:
             self._entitlements.append(entitlement["id"])
 
+    def get_stats(self) -> Dict[str, Any]:
+        """Return timings, cache and health metrics of the client as a json serializable dict."""
+        mqtt_client = self._mqttClient
+        return {
+            "connectTimings": dict(self.connect_timings),
+            "authTimings": dict(self.auth_timings),
+            "mqttConnected": bool(mqtt_client and mqtt_client.is_connected),
+            "pendingCommands": mqtt_client.commands.pending_count if mqtt_client else 0,
+            "boxes": {
+                box.deviceId: {
+                    "state": box.state,
+                    "commandLatency": box.command_latency.to_json(),
+                    "viewingSessions": len(box.history),
+                }
+                for box in list(self.settop_boxes.values())
+            },
+            "channels": len(self._channels),
+            "channelCatalog": channel_catalog.stats(),
+            "circuitBreakers": {
+                name: circuit_breaker.state
+                for name, circuit_breaker in list(self.circuit_breakers.items())
+            },
+            "retryBudget": retry_budget.balance,
+            "watchdog": self._watchdog.stats() if self._watchdog else None,
+            "poller": self._poller.stats() if self._poller else None,
+            "loopBridge": self._loop_bridge.stats() if self._loop_bridge else None,
+        }
+
+    def save_state(self, file_path: str) -> None:
+        """Write the current client state to a compressed snapshot file."""
+        state = {
+            "version": _state_version,
+            "countryCode": self._country_code,
+            "username": self.username,
+            "refreshToken": self.refresh_token,
+            "auth": None,
+            "mqttToken": self._auth.mqttToken,
+            "config": self._config,
+            "customer": None,
+            "entitlements": list(self._entitlements),
+            "channels": [channel.to_json() for channel in self._channels.values()],
+            "boxes": [box.to_json() for box in self.settop_boxes.values()],
+            "recordingCapacity": self.recording_capacity,
+        }
+        if self._auth.householdId:
+            state["auth"] = self._auth.to_json()
+        if self._customer:
+            state["customer"] = self._customer.to_json()
+        tmp_path = f"{file_path}.tmp"
+        # The state holds tokens, only the owner may read it
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "wb") as raw_file, gzip.open(
+            raw_file, "wt", encoding="utf-8"
+        ) as state_file:
+            json.dump(state, state_file, separators=(",", ":"))
+        os.replace(tmp_path, file_path)
+        _logger.debug(f"State saved to {file_path}")
+
+    def restore_state(self, file_path: str) -> bool:
+        """Restore the last known client state from a snapshot file.
+
+        Call this before connect(); the restored boxes are kept and reconciled
+        with live data once the connection is established. Until then box
+        commands raise LGHorizonApiConnectionError.
+        """
+        try:
+            with gzip.open(file_path, "rt", encoding="utf-8") as state_file:
+                state = json.load(state_file)
+        except FileNotFoundError:
+            _logger.debug(f"No state file found at {file_path}")
+            return False
+        except (OSError, ValueError):
+            _logger.warning(f"Unable to read state file {file_path}")
+            return False
+        if (
+            state.get("version") != _state_version
+            or state["countryCode"] != self._country_code
+            or state["username"] != self.username
+        ):
+            _logger.info("State file belongs to another account or version, ignoring")
+            return False
+
+        if not self.refresh_token:
+            self.refresh_token = state["refreshToken"]
+        if state["auth"]:
+            self._auth.fill(state["auth"])
+            self._auth.mqttToken = state["mqttToken"]
+            self._session.cookies["ACCESSTOKEN"] = self._auth.accessToken
+        self._config = state["config"]
+        if state["customer"]:
+            self._customer = LGHorizonCustomer(state["customer"])
+        self._entitlements.clear()
+        self._entitlements.extend(state["entitlements"])
+        self._channels.clear()
+        for channel_json in state["channels"]:
+            channel = LGHorizonChannel(channel_json)
+            self._channels[channel.id] = channel
+        for box_json in state["boxes"]:
+            box = LGHorizonBox(
+                box_json,
+                box_json["platformType"],
+                self._mqttClient,
+                self._auth,
+                self._channels,
+            )
+            box.restore_state(box_json)
+            self._attach_box(box)
+            self.settop_boxes[box.deviceId] = box
+        self.recording_capacity = state["recordingCapacity"]
+        _logger.info(
+            f"State restored from {file_path}: {len(self.settop_boxes)} boxes, "
+            f"{len(self._channels)} channels"
+        )
+        return True
+
     def _get_config(self, country_code: str):
         ctryCode = country_code[0:2]
         config_url = f"{self._country_settings['api_url']}/{ctryCode}/en/config-service/conf/web/backoffice.json"
-        result = self._do_api_call(config_url)
+        result = self._do_api_call(config_url, "config")
         _logger.debug(result)
         return result
@@ -0,0 +1,82 @@
+"""Delivery of box change callbacks on an asyncio event loop."""
+
+import logging
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Tuple
+
+if TYPE_CHECKING:
+    import asyncio
+
+_logger = logging.getLogger(__name__)
+
+
+class LGHorizonLoopBridge:
+    """Move change callbacks from the MQTT thread onto an event loop in batches.
+
+    Callbacks requested from other threads are collected and delivered by
+    a single call_soon_threadsafe wakeup per loop iteration. Repeated
+    callbacks for the same box within one batch are delivered once, the
+    callback reads the latest box state anyway. batch_callback, when set,
+    is called on the loop with the device ids of every batch.
+    """
+
+    wakeups: int = 0
+    delivered: int = 0
+    coalesced: int = 0
+
+    def __init__(
+        self,
+        loop: "asyncio.AbstractEventLoop",
+        batch_callback: Callable[[List[str]], Any] = None,
+    ) -> None:
+        self.loop = loop
+        self._batch_callback = batch_callback
+        self._lock = threading.Lock()
+        self._pending: "OrderedDict[Tuple[Callable, str], None]" = OrderedDict()
+        self._scheduled = False
+
+    def dispatch(self, callback: Callable[[str], Any], device_id: str) -> None:
+        """Schedule callback(device_id) on the loop; safe from any thread."""
+        with self._lock:
+            key = (callback, device_id)
+            if key in self._pending:
+                self.coalesced += 1
+                return
+            self._pending[key] = None
+            if self._scheduled:
+                return
+            self._scheduled = True
+            self.wakeups += 1
+        try:
+            self.loop.call_soon_threadsafe(self._deliver)
+        except RuntimeError:
+            # The loop is closed, nobody is listening anymore
+            _logger.debug("Event loop closed, dropping box callbacks")
+            with self._lock:
+                self._pending.clear()
+                self._scheduled = False
+
+    def _deliver(self) -> None:
+        with self._lock:
+            batch = list(self._pending)
+            self._pending.clear()
+            self._scheduled = False
+        for callback, device_id in batch:
+            self.delivered += 1
+            try:
+                callback(device_id)
+            except Exception:
+                _logger.exception(f"Change callback for box {device_id} failed")
+        if self._batch_callback:
+            try:
+                self._batch_callback(list(dict.fromkeys(device_id for _, device_id in batch)))
+            except Exception:
+                _logger.exception("Batch callback failed")
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "wakeups": self.wakeups,
+            "delivered": self.delivered,
+            "coalesced": self.coalesced,
+        }
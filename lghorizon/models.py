@@ -1,7 +1,9 @@
 from datetime import datetime
-from typing import Any, Callable, Dict, List
-import paho.mqtt.client as mqtt
-import requests
+from concurrent.futures import Future
+from functools import lru_cache
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, List, Tuple, Union
 from .const import (
     BOX_PLAY_STATE_BUFFER,
     BOX_PLAY_STATE_CHANNEL,
@@ -20,23 +22,43 @@ from .const import (
     MEDIA_KEY_REWIND,
     MEDIA_KEY_FAST_FORWARD,
     MEDIA_KEY_RECORD,
+    MEDIA_KEY_DIGITS,
+    KEY_SEQUENCE_INTERVAL,
     RECORDING_TYPE_SEASON,
     RECORDING_TYPE_SHOW,
 )
 
 import json
 from .helpers import make_id
+from .commands import LGHorizonCommandLatency, LGHorizonCommandTracker
+from .exceptions import LGHorizonApiConnectionError
+from .history import LGHorizonViewingHistory
+from .events import (
+    LGHorizonEvent,
+    LGHorizonCapacityChangedEvent,
+    LGHorizonPlayingInfoChangedEvent,
+    LGHorizonStateChangedEvent,
+)
 import logging
 
+if TYPE_CHECKING:
+    import paho.mqtt.client as mqtt
+
 _logger = logging.getLogger(__name__)
 
 
+@lru_cache(maxsize=64)
+def _encode_key_event(key: str) -> bytes:
+    """Return the encoded CPE.KeyEvent payload for a key."""
+    payload = {"type": "CPE.KeyEvent", "status": {"w3cKey": key, "eventType": "keyDownUp"}}
+    return json.dumps(payload, separators=(",", ":")).encode()
+
+
 class LGHorizonAuth:
-    householdId: str
-    accessToken: str
-    refreshToken: str
-    refreshTokenExpiry: datetime
-    username: str
+    householdId: str = None
+    refreshToken: str = None
+    refreshTokenExpiry: datetime = None
+    username: str = None
     mqttToken: str = None
     accessToken: str = None
 
@@ -49,22 +71,43 @@ class LGHorizonAuth:
         self.accessToken = auth_json["accessToken"]
         self.refreshToken = auth_json["refreshToken"]
         self.username = auth_json["username"]
+        expiry = auth_json.get("refreshTokenExpiry")
+        if expiry is None:
+            # Snapshots store null for tokens without a known expiry
+            self.refreshTokenExpiry = None
+            return
         try:
-            self.refreshTokenExpiry = datetime.fromtimestamp(
-                auth_json["refreshTokenExpiry"]
-            )
+            self.refreshTokenExpiry = datetime.fromtimestamp(expiry)
         except ValueError:
-            # VM uses milliseconds for the expiry time; if the year is too high to be valid, it assumes it's milliseconds and divides it
-            self.refreshTokenExpiry = datetime.fromtimestamp(
-                auth_json["refreshTokenExpiry"] // 1000
-            )
+            # VM uses milliseconds for the expiry time; if the year is too high
+            # to be valid, it assumes it's milliseconds and divides it
+            self.refreshTokenExpiry = datetime.fromtimestamp(expiry // 1000)
 
     def is_expired(self) -> bool:
-        return self.refreshTokenExpiry
+        if not self.refreshTokenExpiry:
+            return True
+        return datetime.now() >= self.refreshTokenExpiry
+
+    def to_json(self) -> Dict[str, Any]:
+        """Return the auth data in the format accepted by fill."""
+        expiry = None
+        if self.refreshTokenExpiry:
+            expiry = int(self.refreshTokenExpiry.timestamp())
+        return {
+            "householdId": self.householdId,
+            "accessToken": self.accessToken,
+            "refreshToken": self.refreshToken,
+            "username": self.username,
+            "refreshTokenExpiry": expiry,
+        }
 
 
 class LGHorizonPlayingInfo:
-    """Represent current state of a box."""
+    """Represent current state of a box.
+
+    Instances are immutable snapshots: a box swaps in a new instance once per
+    update, so readers on other threads always see a consistent state.
+    """
 
     channel_id: str = None
     title: str = None
@@ -76,59 +119,77 @@ class LGHorizonPlayingInfo:
     position: float = None
     last_position_update: datetime = None
 
-    def __init__(self):
+    _fields = (
+        "channel_id",
+        "title",
+        "image",
+        "source_type",
+        "paused",
+        "channel_title",
+        "duration",
+        "position",
+        "last_position_update",
+    )
+
+    def __init__(self, **fields):
         """Initialize the playing info."""
-        pass
-
-    def set_paused(self, paused: bool):
-        """Set pause state."""
-        self.paused = paused
-
-    def set_channel(self, channel_id):
-        """Set channel."""
-        self.channel_id = channel_id
-
-    def set_title(self, title):
-        """Set title."""
-        self.title = title
-
-    def set_channel_title(self, title):
-        """Set channel title."""
-        self.channel_title = title
-
-    def set_image(self, image):
-        """Set image."""
-        self.image = image
-
-    def set_source_type(self, source_type):
-        """Set source type."""
-        self.source_type = source_type
-
-    def set_duration(self, duration: float):
-        """Set duration."""
-        self.duration = duration
-
-    def set_position(self, position: float):
-        """Set position."""
-        self.position = position
-
-    def set_last_position_update(self, last_position_update: datetime):
-        """Set last position update."""
-        self.last_position_update = last_position_update
+        for name in self._fields:
+            object.__setattr__(self, name, fields.pop(name, getattr(self, name)))
+        if fields:
+            raise TypeError(f"Unknown playing info fields: {', '.join(fields)}")
+
+    def __setattr__(self, name, value):
+        raise AttributeError("LGHorizonPlayingInfo is immutable, use replace()")
+
+    def __eq__(self, other):
+        if not isinstance(other, LGHorizonPlayingInfo):
+            return NotImplemented
+        return all(
+            getattr(self, name) == getattr(other, name) for name in self._fields
+        )
 
-    def reset_progress(self):
-        self.last_position_update = None
-        self.duration = None
-        self.position = None
+    def replace(self, **changes) -> "LGHorizonPlayingInfo":
+        """Return a copy with the given fields changed."""
+        fields = {name: getattr(self, name) for name in self._fields}
+        fields.update(changes)
+        return LGHorizonPlayingInfo(**fields)
+
+    def to_json(self) -> Dict[str, Any]:
+        """Return the playing info as a json serializable dict."""
+        last_position_update = None
+        if self.last_position_update:
+            last_position_update = self.last_position_update.timestamp()
+        return {
+            "channelId": self.channel_id,
+            "title": self.title,
+            "image": self.image,
+            "sourceType": self.source_type,
+            "paused": self.paused,
+            "channelTitle": self.channel_title,
+            "duration": self.duration,
+            "position": self.position,
+            "lastPositionUpdate": last_position_update,
+        }
 
-    def reset(self):
-        self.channel_id = None
-        self.title = None
-        self.image = None
-        self.source_type = None
-        self.paused = False
-        self.channel_title = None
-        self.reset_progress()
+    @staticmethod
+    def from_json(playing_info_json: Dict[str, Any]) -> "LGHorizonPlayingInfo":
+        """Create the playing info from the output of to_json."""
+        last_position_update = None
+        if playing_info_json["lastPositionUpdate"] is not None:
+            last_position_update = datetime.fromtimestamp(
+                playing_info_json["lastPositionUpdate"]
+            )
+        return LGHorizonPlayingInfo(
+            channel_id=playing_info_json["channelId"],
+            title=playing_info_json["title"],
+            image=playing_info_json["image"],
+            source_type=playing_info_json["sourceType"],
+            paused=playing_info_json["paused"],
+            channel_title=playing_info_json["channelTitle"],
+            duration=playing_info_json["duration"],
+            position=playing_info_json["position"],
+            last_position_update=last_position_update,
+        )
 
 
 class LGHorizonChannel:
@@ -161,6 +222,16 @@ class LGHorizonChannel:
             return channel_json["logo"]["focused"]
         return ""
 
+    def to_json(self) -> Dict[str, Any]:
+        """Return the channel in the format accepted by the constructor."""
+        return {
+            "id": self.id,
+            "name": self.title,
+            "imageStream": {"full": self.stream_image},
+            "logo": {"focused": self.logo_image},
+            "logicalChannelNumber": self.channel_number,
+        }
+
 
 class LGHorizonReplayEvent:
     episodeNumber: int = None
@@ -315,11 +386,12 @@ class LGHorizonApp:
 
 class LGHorizonMqttClient:
     _brokerUrl: str = None
-    _mqtt_client: mqtt.Client
+    _mqtt_client: "mqtt.Client"
     _auth: LGHorizonAuth
     clientId: str = None
     _on_connected_callback: Callable = None
     _on_message_callback: Callable[[str, str], None] = None
+    commands: LGHorizonCommandTracker = None
 
     @property
     def is_connected(self):
@@ -332,6 +404,9 @@ class LGHorizonMqttClient:
         on_connected_callback: Callable = None,
         on_message_callback: Callable[[str], None] = None,
     ):
+        # paho is only needed once a live connection is made
+        import paho.mqtt.client as mqtt
+
         self._auth = auth
         self._brokerUrl = mqtt_broker_url.replace("wss://", "").replace(":443/mqtt", "")
         self.clientId = make_id()
@@ -346,6 +421,7 @@ class LGHorizonMqttClient:
         self._mqtt_client.on_connect = self._on_mqtt_connect
         self._on_connected_callback = on_connected_callback
         self._on_message_callback = on_message_callback
+        self.commands = LGHorizonCommandTracker()
 
     def _on_mqtt_connect(self, client, userdata, flags, resultCode):
         if resultCode == 0:
@@ -387,20 +463,64 @@ class LGHorizonMqttClient:
         self._mqtt_client.connect(self._brokerUrl, 443)
         self._mqtt_client.loop_start()
 
+    def connect_async(self) -> None:
+        """Connect in the background; paho keeps retrying until the broker is reachable."""
+        self._mqtt_client.connect_async(self._brokerUrl, 443)
+        self._mqtt_client.loop_start()
+
+    def reconnect(self) -> None:
+        """Drop the current connection and connect again with the current token.
+
+        paho may not reconnect while its network thread runs, so the thread
+        is stopped first; do not call this from an MQTT callback. When the
+        connection fails the restarted network thread keeps retrying.
+        """
+        self.commands.fail_all("MQTT client reconnecting")
+        self._mqtt_client.loop_stop()
+        self._mqtt_client.username_pw_set(self._auth.householdId, self._auth.mqttToken)
+        try:
+            self._mqtt_client.reconnect()
+        except Exception as ex:
+            _logger.warning(f"MQTT reconnect failed, retrying in the background: {ex}")
+        finally:
+            self._mqtt_client.loop_start()
+
     def _on_client_message(self, client, userdata, message):
         """Handle messages received by mqtt client."""
         _logger.debug(f"Received MQTT message. Topic: {message.topic}")
         jsonPayload = json.loads(message.payload)
         _logger.debug(f"Message: {jsonPayload}")
+        if message.topic == f"{self._auth.householdId}/{self.clientId}":
+            self.commands.resolve(jsonPayload)
         if self._on_message_callback:
             self._on_message_callback(jsonPayload, message.topic)
 
-    def publish_message(self, topic: str, json_payload: str) -> None:
-        self._mqtt_client.publish(topic, json_payload, qos=2)
+    def publish_message(
+        self, topic: str, json_payload: Union[str, bytes], qos: int = 2
+    ) -> "mqtt.MQTTMessageInfo":
+        return self._mqtt_client.publish(topic, json_payload, qos=qos)
+
+    def publish_command(
+        self,
+        topic: str,
+        json_payload: str,
+        command_id: str,
+        device_id: str,
+        command_type: str,
+        timeout: float = None,
+    ) -> Future:
+        """Publish a command and return a future resolving with the reply."""
+        future = self.commands.track(command_id, device_id, command_type, timeout)
+        self.publish_message(topic, json_payload)
+        return future
 
     def disconnect(self) -> None:
         if self._mqtt_client.is_connected:
             self._mqtt_client.disconnect()
+        else:
+            # Stop a background connect that is still retrying
+            self._mqtt_client.loop_stop()
+        self.commands.fail_all("MQTT client disconnected")
 
 
 class LGHorizonBox:
@@ -408,16 +528,21 @@ class LGHorizonBox:
     hashedCPEId: str = None
     deviceFriendlyName: str = None
     state: str = None
-    playing_info: LGHorizonPlayingInfo = None
+    _playing_info: LGHorizonPlayingInfo = None
     manufacturer: str = None
     model: str = None
     recording_capacity: int = None
+    history: LGHorizonViewingHistory = None
 
     _mqtt_client: LGHorizonMqttClient
     _change_callback: Callable = None
+    _callback_dispatcher: Callable[[Callable, str], None] = None
+    _event_sink: Callable[[LGHorizonEvent], None] = None
     _auth: LGHorizonAuth = None
     _channels: Dict[str, LGHorizonChannel] = None
     _message_stamp = None
+    # False for boxes restored from a snapshot until their first live status
+    _reconciled: bool = True
 
     def __init__(
         self,
@@ -433,35 +558,89 @@ class LGHorizonBox:
         self._mqtt_client = mqtt_client
         self._auth = auth
         self._channels = channels
-        self.playing_info = LGHorizonPlayingInfo()
+        self._playing_info = LGHorizonPlayingInfo()
+        self._state_lock = threading.Lock()
+        self.history = LGHorizonViewingHistory()
         if platform_type:
             self.manufacturer = platform_type["manufacturer"]
             self.model = platform_type["model"]
 
+    def set_mqtt_client(self, mqtt_client: LGHorizonMqttClient) -> None:
+        """Attach a (new) mqtt client, e.g. after restoring from a snapshot."""
+        self._mqtt_client = mqtt_client
+
+    def _require_mqtt_client(self) -> LGHorizonMqttClient:
+        # Boxes restored from a snapshot have no client until connect()
+        if self._mqtt_client is None:
+            raise LGHorizonApiConnectionError(
+                f"Box {self.deviceId} has no MQTT connection, call connect() first"
+            )
+        return self._mqtt_client
+
+    def to_json(self) -> Dict[str, Any]:
+        """Return the box and its last known state as a json serializable dict."""
+        platform_type = None
+        if self.manufacturer or self.model:
+            platform_type = {"manufacturer": self.manufacturer, "model": self.model}
+        return {
+            "deviceId": self.deviceId,
+            "hashedCPEId": self.hashedCPEId,
+            "settings": {"deviceFriendlyName": self.deviceFriendlyName},
+            "platformType": platform_type,
+            "state": self.state,
+            "recordingCapacity": self.recording_capacity,
+            "playingInfo": self.playing_info.to_json(),
+        }
+
+    def restore_state(self, box_json: Dict[str, Any]) -> None:
+        """Restore the last known state from the output of to_json."""
+        self.state = box_json["state"]
+        self.recording_capacity = box_json["recordingCapacity"]
+        self._set_playing_info(LGHorizonPlayingInfo.from_json(box_json["playingInfo"]))
+        self._reconciled = False
+
     def register_mqtt(self) -> None:
-        if not self._mqtt_client.is_connected:
+        mqtt_client = self._require_mqtt_client()
+        if not mqtt_client.is_connected:
             raise Exception("MQTT client not connected.")
-        topic = f"{self._auth.householdId}/{self._mqtt_client.clientId}/status"
+        topic = f"{self._auth.householdId}/{mqtt_client.clientId}/status"
         payload = {
-            "source": self._mqtt_client.clientId,
+            "source": mqtt_client.clientId,
             "state": ONLINE_RUNNING,
             "deviceType": "HGO",
         }
-        self._mqtt_client.publish_message(topic, json.dumps(payload))
+        mqtt_client.publish_message(topic, json.dumps(payload))
 
     def set_callback(self, change_callback: Callable) -> None:
         self._change_callback = change_callback
 
+    def set_callback_dispatcher(
+        self, callback_dispatcher: Callable[[Callable, str], None]
+    ) -> None:
+        """Set the function that calls the change callback, e.g. on an event loop."""
+        self._callback_dispatcher = callback_dispatcher
+
+    def set_event_sink(self, event_sink: Callable[[LGHorizonEvent], None]) -> None:
+        """Set the function receiving the typed events of this box."""
+        self._event_sink = event_sink
+
+    def _emit(self, event: LGHorizonEvent) -> None:
+        if self._event_sink:
+            self._event_sink(event)
+
     def update_state(self, payload):
         """Register a new settop box."""
         state = payload["state"]
-        if self.state == state:
+        if self.state == state and self._reconciled:
             return
-        self.state = state
+        # A restored snapshot is refreshed on the first live status, even an unchanged one
+        self._reconciled = True
+        if self.state != state:
+            self.state = state
+            self._emit(LGHorizonStateChangedEvent(self.deviceId, state))
         if state == ONLINE_STANDBY:
-            self.playing_info.reset()
-            if self._change_callback:
-                self._change_callback(self.deviceId)
+            self.reset_playing_info()
+            self._trigger_callback()
         else:
             self._request_settop_box_state()
         self._request_settop_box_recording_capacity()
@@ -469,20 +648,61 @@ class LGHorizonBox:
     def update_recording_capacity(self, payload) -> None:
         if not "CPE.capacity" in payload or not "used" in payload:
             return
+        if self.recording_capacity == payload["used"]:
+            return
         self.recording_capacity = payload["used"]
+        self._emit(LGHorizonCapacityChangedEvent(self.deviceId, self.recording_capacity))
+
+    @property
+    def playing_info(self) -> LGHorizonPlayingInfo:
+        """Snapshot of what the box is playing, replaced as a whole on every update."""
+        return self._playing_info
+
+    def _set_playing_info(self, playing_info: LGHorizonPlayingInfo) -> None:
+        # A single reference assignment, readers see either the old or the new snapshot
+        previous = self._playing_info
+        self._playing_info = playing_info
+        if playing_info != previous:
+            self.history.record(playing_info)
+            self._emit(LGHorizonPlayingInfoChangedEvent(self.deviceId, playing_info))
+
+    def _update_playing_info(self, **changes) -> None:
+        with self._state_lock:
+            self._set_playing_info(self._playing_info.replace(**changes))
+
+    def reset_playing_info(self) -> None:
+        """Forget what the box is playing."""
+        with self._state_lock:
+            self._set_playing_info(LGHorizonPlayingInfo())
+
+    def set_paused(self, paused: bool) -> None:
+        """Set pause state."""
+        self._update_playing_info(paused=paused)
+
+    def _paused_or_current(self, paused: bool) -> bool:
+        return self._playing_info.paused if paused is None else paused
 
     def update_with_replay_event(
-        self, source_type: str, event: LGHorizonReplayEvent, channel: LGHorizonChannel
+        self,
+        source_type: str,
+        event: LGHorizonReplayEvent,
+        channel: LGHorizonChannel,
+        paused: bool = None,
     ) -> None:
-        self.playing_info.set_source_type(source_type)
-        self.playing_info.set_channel(channel.id)
-        self.playing_info.set_channel_title(channel.title)
         title = event.title
         if event.episodeName:
             title += f": {event.episodeName}"
-        self.playing_info.set_title(title)
-        self.playing_info.set_image(channel.stream_image)
-        self.playing_info.reset_progress()
+        with self._state_lock:
+            self._set_playing_info(
+                LGHorizonPlayingInfo(
+                    source_type=source_type,
+                    channel_id=channel.id,
+                    channel_title=channel.title,
+                    title=title,
+                    image=channel.stream_image,
+                    paused=self._paused_or_current(paused),
+                )
+            )
         self._trigger_callback()
 
     def update_with_recording(
@@ -494,19 +714,26 @@ class LGHorizonBox:
         end: float,
         last_speed_change: float,
         relative_position: float,
+        paused: bool = None,
     ) -> None:
-        self.playing_info.set_source_type(source_type)
-        self.playing_info.set_channel(channel.id)
-        self.playing_info.set_channel_title(channel.title)
-        self.playing_info.set_title(f"{recording.title}")
-        self.playing_info.set_image(recording.image)
         start_dt = datetime.fromtimestamp(start / 1000.0)
         end_dt = datetime.fromtimestamp(end / 1000.0)
         duration = (end_dt - start_dt).total_seconds()
-        self.playing_info.set_duration(duration)
-        self.playing_info.set_position(relative_position / 1000.0)
         last_update_dt = datetime.fromtimestamp(last_speed_change / 1000.0)
-        self.playing_info.set_last_position_update(last_update_dt)
+        with self._state_lock:
+            self._set_playing_info(
+                LGHorizonPlayingInfo(
+                    source_type=source_type,
+                    channel_id=channel.id,
+                    channel_title=channel.title,
+                    title=f"{recording.title}",
+                    image=recording.image,
+                    duration=duration,
+                    position=relative_position / 1000.0,
+                    last_position_update=last_update_dt,
+                    paused=self._paused_or_current(paused),
+                )
+            )
         self._trigger_callback()
 
     def update_with_vod(
@@ -515,43 +742,57 @@ class LGHorizonBox:
         vod: LGHorizonVod,
         last_speed_change: float,
         relative_position: float,
+        paused: bool = None,
     ) -> None:
-        self.playing_info.set_source_type(source_type)
-        self.playing_info.set_channel(None)
-        self.playing_info.set_channel_title(None)
-        self.playing_info.set_title(vod.title)
-        self.playing_info.set_image(None)
-        self.playing_info.set_duration(vod.duration)
-        self.playing_info.set_position(relative_position / 1000.0)
         last_update_dt = datetime.fromtimestamp(last_speed_change / 1000.0)
-        self.playing_info.set_last_position_update(last_update_dt)
+        with self._state_lock:
+            self._set_playing_info(
+                LGHorizonPlayingInfo(
+                    source_type=source_type,
+                    title=vod.title,
+                    duration=vod.duration,
+                    position=relative_position / 1000.0,
+                    last_position_update=last_update_dt,
+                    paused=self._paused_or_current(paused),
+                )
+            )
         self._trigger_callback()
 
     def update_with_app(self, source_type: str, app: LGHorizonApp) -> None:
-        self.playing_info.set_source_type(source_type)
-        self.playing_info.set_channel(None)
-        self.playing_info.set_channel_title(app.title)
-        self.playing_info.set_title(app.title)
-        self.playing_info.set_image(app.image)
-        self.playing_info.reset_progress()
+        with self._state_lock:
+            self._set_playing_info(
+                LGHorizonPlayingInfo(
+                    source_type=source_type,
+                    channel_title=app.title,
+                    title=app.title,
+                    image=app.image,
+                    paused=self._playing_info.paused,
+                )
+            )
         self._trigger_callback()
 
     def _trigger_callback(self):
         if self._change_callback:
             _logger.debug(f"Callback called from box {self.deviceId}")
-            self._change_callback(self.deviceId)
+            if self._callback_dispatcher:
+                self._callback_dispatcher(self._change_callback, self.deviceId)
+            else:
+                self._change_callback(self.deviceId)
 
-    def turn_on(self) -> None:
+    def turn_on(self) -> "mqtt.MQTTMessageInfo":
         """Turn the settop box on."""
 
         if self.state == ONLINE_STANDBY:
-            self.send_key_to_box(MEDIA_KEY_POWER)
+            return self.send_key_to_box(MEDIA_KEY_POWER)
+        return None
 
-    def turn_off(self) -> None:
+    def turn_off(self) -> "mqtt.MQTTMessageInfo":
         """Turn the settop box off."""
         if self.state == ONLINE_RUNNING:
-            self.send_key_to_box(MEDIA_KEY_POWER)
-            self.playing_info.reset()
+            message_info = self.send_key_to_box(MEDIA_KEY_POWER)
+            self.reset_playing_info()
+            return message_info
+        return None
 
     def pause(self) -> None:
         """Pause the given settopbox."""
@@ -602,79 +843,151 @@ class LGHorizonBox:
         """Return the availability of the settop box."""
         return self.state == ONLINE_RUNNING or self.state == ONLINE_STANDBY
 
-    def set_channel(self, source: str) -> None:
-        """Change te channel from the settopbox."""
-        channel = [src for src in self._channels.values() if src.title == source][0]
+    @property
+    def command_latency(self) -> LGHorizonCommandLatency:
+        """Round-trip latency of the commands sent to this box."""
+        if not self._mqtt_client:
+            return LGHorizonCommandLatency()
+        return self._mqtt_client.commands.latency(self.deviceId)
+
+    def set_channel(self, source: str, timeout: float = None) -> Future:
+        """Change te channel from the settopbox.
+
+        The returned future resolves when the box acknowledges the command.
+        """
+        mqtt_client = self._require_mqtt_client()
+        channel = [src for src in list(self._channels.values()) if src.title == source][0]
+        command_id = make_id(8)
         payload = (
             '{"id":"'
-            + make_id(8)
+            + command_id
             + '","type":"CPE.pushToTV","source":{"clientId":"'
-            + self._mqtt_client.clientId
+            + mqtt_client.clientId
             + '","friendlyDeviceName":"Home Assistant"},'
             + '"status":{"sourceType":"linear","source":{"channelId":"'
             + channel.id
             + '"},"relativePosition":0,"speed":1}}'
         )
 
-        self._mqtt_client.publish_message(
-            f"{self._auth.householdId}/{self.deviceId}", payload
+        return mqtt_client.publish_command(
+            f"{self._auth.householdId}/{self.deviceId}",
+            payload,
+            command_id,
+            self.deviceId,
+            "CPE.pushToTV",
+            timeout,
         )
 
-    def play_recording(self, recordingId):
-        """Play recording."""
+    def play_recording(self, recordingId, timeout: float = None) -> Future:
+        """Play recording.
+
+        The returned future resolves when the box acknowledges the command.
+        """
+        mqtt_client = self._require_mqtt_client()
+        command_id = make_id(8)
         payload = (
             '{"id":"'
-            + make_id(8)
+            + command_id
             + '","type":"CPE.pushToTV","source":{"clientId":"'
-            + self._mqtt_client.clientId
+            + mqtt_client.clientId
             + '","friendlyDeviceName":"Home Assistant"},'
             + '"status":{"sourceType":"nDVR","source":{"recordingId":"'
             + recordingId
             + '"},"relativePosition":0}}'
         )
-        self._mqtt_client.publish_message(
-            f"{self._auth.householdId}/{self.deviceId}", payload
+        return mqtt_client.publish_command(
+            f"{self._auth.householdId}/{self.deviceId}",
+            payload,
+            command_id,
+            self.deviceId,
+            "CPE.pushToTV",
+            timeout,
         )
 
-    def send_key_to_box(self, key: str) -> None:
+    def send_key_to_box(self, key: str, qos: int = 2) -> "mqtt.MQTTMessageInfo":
         """Send emulated (remote) key press to settopbox."""
-        payload = (
-            '{"type":"CPE.KeyEvent","status":{"w3cKey":"'
-            + key
-            + '","eventType":"keyDownUp"}}'
-        )
-        self._mqtt_client.publish_message(
-            f"{self._auth.householdId}/{self.deviceId}", payload
+        return self._require_mqtt_client().publish_message(
+            f"{self._auth.householdId}/{self.deviceId}", _encode_key_event(key), qos
         )
 
+    def send_key_sequence(
+        self,
+        keys: Iterable[Union[str, Tuple[str, int]]],
+        qos: int = 1,
+        interval: float = KEY_SEQUENCE_INTERVAL,
+    ) -> List["mqtt.MQTTMessageInfo"]:
+        """Send a sequence of key presses, e.g. [MEDIA_KEY_GUIDE, (MEDIA_KEY_ARROW_DOWN, 5)].
+
+        Payloads are encoded up front and the keys are paced by interval
+        seconds so the box does not drop any. qos 0 is fastest but may lose keys.
+        """
+        mqtt_client = self._require_mqtt_client()
+        payloads = []
+        for key in keys:
+            if isinstance(key, tuple):
+                key, count = key
+            else:
+                count = 1
+            payloads.extend([_encode_key_event(key)] * count)
+        topic = f"{self._auth.householdId}/{self.deviceId}"
+        results = []
+        for index, payload in enumerate(payloads):
+            if index and interval:
+                time.sleep(interval)
+            results.append(mqtt_client.publish_message(topic, payload, qos))
+        return results
+
+    def enter_channel_number(
+        self,
+        channel_number: Union[int, str],
+        qos: int = 1,
+        interval: float = KEY_SEQUENCE_INTERVAL,
+    ) -> List["mqtt.MQTTMessageInfo"]:
+        """Tune by typing the channel number digit by digit, followed by enter."""
+        digits = str(channel_number)
+        if not digits or any(digit not in MEDIA_KEY_DIGITS for digit in digits):
+            raise ValueError(f"Invalid channel number: {channel_number}")
+        return self.send_key_sequence([*digits, MEDIA_KEY_ENTER], qos, interval)
+
     def _set_unknown_channel_info(self) -> None:
         """Set unknown channel info."""
         _logger.warning("Couldn't set channel. Channel info set to unknown...")
-        self.playing_info.set_source_type(BOX_PLAY_STATE_CHANNEL)
-        self.playing_info.set_channel(None)
-        self.playing_info.set_title("No information available")
-        self.playing_info.set_image(None)
-        self.playing_info.set_paused(False)
+        self._update_playing_info(
+            source_type=BOX_PLAY_STATE_CHANNEL,
+            channel_id=None,
+            title="No information available",
+            image=None,
+            paused=False,
+        )
 
-    def _request_settop_box_state(self) -> None:
+    def _request_settop_box_state(self, timeout: float = None) -> Future:
         """Send mqtt message to receive state from settop box."""
+        mqtt_client = self._require_mqtt_client()
         topic = f"{self._auth.householdId}/{self.deviceId}"
         payload = {
             "id": make_id(8),
             "type": "CPE.getUiStatus",
-            "source": self._mqtt_client.clientId,
+            "source": mqtt_client.clientId,
         }
-        self._mqtt_client.publish_message(topic, json.dumps(payload))
+        return mqtt_client.publish_command(
+            topic,
+            json.dumps(payload),
+            payload["id"],
+            self.deviceId,
+            payload["type"],
+            timeout,
+        )
 
     def _request_settop_box_recording_capacity(self) -> None:
         """Send mqtt message to receive state from settop box."""
+        mqtt_client = self._require_mqtt_client()
         topic = f"{self._auth.householdId}/{self.deviceId}"
         payload = {
             "id": make_id(8),
             "type": "CPE.capacity",
-            "source": self._mqtt_client.clientId,
+            "source": mqtt_client.clientId,
         }
-        self._mqtt_client.publish_message(topic, json.dumps(payload))
+        mqtt_client.publish_message(topic, json.dumps(payload))
 
 
 class LGHorizonCustomer:
@@ -691,3 +1004,12 @@ class LGHorizonCustomer:
         self.cityId = json_payload["cityId"]
         if not "assignedDevices" in json_payload:
             return
+
+    def to_json(self) -> Dict[str, Any]:
+        """Return the customer in the format accepted by the constructor."""
+        return {
+            "customerId": self.customerId,
+            "hashedCustomerId": self.hashedCustomerId,
+            "countryId": self.countryId,
+            "cityId": self.cityId,
+        }
@@ -0,0 +1,160 @@
+"""HTTP polling of the household state while MQTT is unavailable."""
+
+import logging
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+from .events import LGHorizonCapacityChangedEvent, LGHorizonRecordingChangedEvent
+from .search import recording_id
+
+_logger = logging.getLogger(__name__)
+
+POLL_MODE_PUSH = "push"
+POLL_MODE_POLL = "poll"
+
+
+class LGHorizonPoller:
+    """Poll the REST state of a household as long as MQTT is not connected.
+
+    Polls the personalisation devices, the recordings and the recording
+    quota of the household, which is kept in api.recording_capacity and
+    published as an LGHorizonCapacityChangedEvent without device id.
+
+    The interval starts at min_interval, is multiplied by backoff_factor
+    after every poll that found no change, up to max_interval, and drops
+    back to min_interval when something changed.
+    Polling pauses as soon as the MQTT client is connected and resumes
+    when it is not.
+    """
+
+    min_interval: float = 30.0
+    max_interval: float = 600.0
+    backoff_factor: float = 2.0
+    interval: float = 30.0
+    mode: str = POLL_MODE_PUSH
+    polls: int = 0
+    changes: int = 0
+
+    def __init__(
+        self,
+        api: Any,
+        min_interval: float = 30.0,
+        max_interval: float = 600.0,
+        backoff_factor: float = 2.0,
+    ) -> None:
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff_factor = backoff_factor
+        self.interval = min_interval
+        self._api = api
+        self._devices: Optional[Tuple] = None
+        self._recordings: Optional[Tuple] = None
+        self._capacity: Optional[int] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Start polling in a background thread."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="lghorizon-poller", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(5.0)
+
+    def _mqtt_connected(self) -> bool:
+        client = self._api._mqttClient
+        return client is not None and client.is_connected
+
+    def _run(self) -> None:
+        wait = 0.0
+        while not self._stop.wait(wait):
+            if self._mqtt_connected():
+                if self.mode == POLL_MODE_POLL:
+                    _logger.info("MQTT connected, switching back to push updates")
+                    self.mode = POLL_MODE_PUSH
+                # Checking the connection is cheap, notice a drop quickly
+                wait = self.min_interval
+                continue
+            if self.mode == POLL_MODE_PUSH:
+                _logger.warning("MQTT not connected, polling for updates")
+                self.mode = POLL_MODE_POLL
+                self.interval = self.min_interval
+            try:
+                changed = self.poll()
+            except Exception as ex:
+                _logger.debug(f"Polling failed: {ex}")
+                changed = False
+            if changed:
+                self.interval = self.min_interval
+            else:
+                self.interval = min(self.interval * self.backoff_factor, self.max_interval)
+            wait = self.interval
+
+    def poll(self) -> bool:
+        """Poll all state once; return True when something changed."""
+        self.polls += 1
+        changed = False
+        for poll_step in (self._poll_devices, self._poll_recordings, self._poll_capacity):
+            try:
+                changed = poll_step() or changed
+            except Exception as ex:
+                _logger.debug(f"Polling step {poll_step.__name__} failed: {ex}")
+        if changed:
+            self.changes += 1
+        return changed
+
+    def _poll_devices(self) -> bool:
+        personalisation_result = self._api._get_personalisation()
+        devices = tuple(
+            sorted(
+                (device["deviceId"], device["settings"]["deviceFriendlyName"])
+                for device in personalisation_result.get("assignedDevices", [])
+            )
+        )
+        previous, self._devices = self._devices, devices
+        if previous is None or previous == devices:
+            return False
+        # Only the boxes, the channel lineup is not affected
+        _logger.info("Devices changed, registering boxes")
+        self._api._register_boxes(personalisation_result)
+        return True
+
+    def _poll_recordings(self) -> bool:
+        recordings = tuple(
+            sorted(str(recording_id(recording)) for recording in self._api.get_recordings())
+        )
+        previous, self._recordings = self._recordings, recordings
+        if previous is None or previous == recordings:
+            return False
+        self._api._events.publish(
+            LGHorizonRecordingChangedEvent(
+                None,
+                f"{self._api._auth.householdId}/recordingStatus",
+                {"polled": True, "count": len(recordings)},
+            )
+        )
+        return True
+
+    def _poll_capacity(self) -> bool:
+        # Updates api.recording_capacity, the quota of the whole household
+        capacity = self._api.get_recording_capacity()
+        previous, self._capacity = self._capacity, capacity
+        if capacity is None or previous is None or previous == capacity:
+            return False
+        self._api._events.publish(LGHorizonCapacityChangedEvent(None, capacity))
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "interval": self.interval,
+            "polls": self.polls,
+            "changes": self.changes,
+        }
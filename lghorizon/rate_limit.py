@@ -0,0 +1,201 @@
+"""Client side rate limiting and retry budget for the LGHorizon API."""
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+
+from .exceptions import LGHorizonApiRateLimitedError
+
+_logger = logging.getLogger(__name__)
+
+
+class LGHorizonTokenBucket:
+    """Token bucket limiting the outgoing calls of one household."""
+
+    rate: float = 5.0
+    capacity: float = 10.0
+
+    def __init__(self, rate: float = 5.0, capacity: float = 10.0) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """Take a token and return how long the caller has to wait for it."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.capacity, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            self._tokens -= 1
+            wait = max(0.0, self._blocked_until - now)
+            if self._tokens < 0:
+                wait = max(wait, -self._tokens / self.rate)
+            return wait
+
+    def acquire(self, max_wait: float = None) -> float:
+        """Block until a call may be made and return the time waited.
+
+        Raises LGHorizonApiRateLimitedError when that would take longer than max_wait.
+        """
+        wait = self._reserve()
+        if max_wait is not None and wait > max_wait:
+            with self._lock:
+                self._tokens += 1
+            raise LGHorizonApiRateLimitedError(
+                f"Rate limited, next call allowed in {wait:.1f}s"
+            )
+        if wait > 0:
+            _logger.debug(f"Rate limited, waiting {wait:.2f}s")
+            time.sleep(wait)
+        return wait
+
+    def block_for(self, seconds: float) -> None:
+        """Refuse calls for the given time, e.g. after a Retry-After header."""
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+
+class LGHorizonRetryBudget:
+    """Retry budget shared by all api instances in the process.
+
+    Every call adds `ratio` to the budget and every retry costs one, so
+    retries stay a fraction of the traffic. `min_per_second` retries are
+    always allowed to keep a quiet client able to recover.
+    """
+
+    ratio: float = 0.2
+    min_per_second: float = 1.0
+    max_balance: float = 50.0
+
+    def __init__(
+        self,
+        ratio: float = 0.2,
+        min_per_second: float = 1.0,
+        max_balance: float = 50.0,
+    ) -> None:
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_balance = max_balance
+        self._balance = max_balance
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._balance = min(
+            self.max_balance,
+            self._balance + (now - self._updated) * self.min_per_second,
+        )
+        self._updated = now
+
+    def record_request(self) -> None:
+        """Register an outgoing call."""
+        with self._lock:
+            self._refill()
+            self._balance = min(self.max_balance, self._balance + self.ratio)
+
+    def can_retry(self) -> bool:
+        """Return whether the budget allows another retry."""
+        with self._lock:
+            self._refill()
+            return self._balance >= 1
+
+    def record_retry(self) -> None:
+        """Spend one retry."""
+        with self._lock:
+            self._refill()
+            self._balance -= 1
+
+    @property
+    def balance(self) -> float:
+        with self._lock:
+            self._refill()
+            return self._balance
+
+
+retry_budget = LGHorizonRetryBudget()
+
+_household_buckets: Dict[str, LGHorizonTokenBucket] = {}
+_household_buckets_lock = threading.Lock()
+
+
+def get_household_bucket(
+    household: str, rate: float, capacity: float
+) -> LGHorizonTokenBucket:
+    """Return the token bucket shared by all api instances of a household."""
+    with _household_buckets_lock:
+        if household not in _household_buckets:
+            _household_buckets[household] = LGHorizonTokenBucket(rate, capacity)
+        return _household_buckets[household]
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Return the number of seconds from a Retry-After header value."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+_thread_state = threading.local()
+
+
+@contextmanager
+def non_blocking_throttle():
+    """Make rate limited calls in this block fail instead of waiting.
+
+    Used on threads that must not stall, like the MQTT network loop.
+    """
+    previous = getattr(_thread_state, "non_blocking", False)
+    _thread_state.non_blocking = True
+    try:
+        yield
+    finally:
+        _thread_state.non_blocking = previous
+
+
+def throttle_may_block() -> bool:
+    """Return whether the calling thread may wait for the rate limit."""
+    return not getattr(_thread_state, "non_blocking", False)
+
+
+def retry_budget_exhausted(ex: Exception) -> bool:
+    """Backoff giveup handler: stop retrying when the retry budget is spent."""
+    if retry_budget.can_retry():
+        return False
+    _logger.warning(f"Retry budget exhausted, not retrying: {ex}")
+    return True
+
+
+def api_call_giveup(ex: Exception) -> bool:
+    """Backoff giveup handler for API calls.
+
+    Besides an exhausted budget, a rate limited call is not retried on a
+    thread that may not wait for the limit.
+    """
+    if isinstance(ex, LGHorizonApiRateLimitedError) and not throttle_may_block():
+        return True
+    return retry_budget_exhausted(ex)
+
+
+def spend_retry(details) -> None:
+    """Backoff on_backoff handler: charge a retry to the budget."""
+    retry_budget.record_retry()
@@ -0,0 +1,226 @@
+"""In-memory search index over the recordings library."""
+
+import re
+import threading
+import unicodedata
+from bisect import bisect_left, insort
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+_token_pattern = re.compile(r"[a-z0-9]+")
+_season_episode_pattern = re.compile(r"\bs(\d+)\s*e(\d+)\b")
+_season_pattern = re.compile(r"\b(?:season|s)\s*(\d+)\b")
+_episode_pattern = re.compile(r"\b(?:episode|ep|e)\s*(\d+)\b")
+
+# Weight of a token per field of the recording
+_field_weights = {
+    "title": 3.0,
+    "showTitle": 3.0,
+    "episodeTitle": 2.0,
+    "channelId": 1.0,
+}
+
+
+def _normalize(text: str) -> str:
+    text = unicodedata.normalize("NFKD", str(text)).encode("ascii", "ignore").decode()
+    return text.lower()
+
+
+def _tokenize(text: str) -> List[str]:
+    return _token_pattern.findall(_normalize(text))
+
+
+def _indexed_values(recording: Any) -> Tuple[Any, ...]:
+    """Return the values of a recording the index depends on."""
+    return tuple(getattr(recording, field, None) for field in _field_weights) + (
+        getattr(recording, "seasonNumber", None),
+        getattr(recording, "episodeNumber", None),
+    )
+
+
+def recording_id(recording: Any) -> Optional[str]:
+    """Return the id to pass to play_recording for any recording model."""
+    return getattr(recording, "id", None) or getattr(recording, "episodeId", None)
+
+
+class LGHorizonSearchResult:
+    """A recording matching a query."""
+
+    recording: Any = None
+    recording_id: str = None
+    score: float = 0.0
+
+    def __init__(self, recording: Any, score: float) -> None:
+        self.recording = recording
+        self.recording_id = recording_id(recording)
+        self.score = score
+
+    def __repr__(self) -> str:
+        return f"LGHorizonSearchResult({self.recording_id}, score={self.score:.2f})"
+
+
+class LGHorizonRecordingIndex:
+    """Inverted token index over the recording models.
+
+    Indexes title, showTitle, episodeTitle and channelId, plus the season
+    and episode numbers. Query tokens match by prefix, so "jour" finds
+    "Journaal". "s2e3", "season 2" and "episode 3" in a query filter on the
+    season and episode numbers.
+    """
+
+    def __init__(self, recordings: Iterable[Any] = None) -> None:
+        self._recordings: Dict[str, Any] = {}
+        self._postings: Dict[str, Dict[str, float]] = {}
+        self._tokens: List[str] = []
+        self._recording_tokens: Dict[str, List[str]] = {}
+        self._recording_values: Dict[str, Tuple[Any, ...]] = {}
+        self._lock = threading.Lock()
+        if recordings:
+            self.sync(recordings)
+
+    def __len__(self) -> int:
+        return len(self._recordings)
+
+    def add(self, recording: Any) -> None:
+        """Add or replace a recording."""
+        rec_id = recording_id(recording)
+        if rec_id is None:
+            return
+        weights: Dict[str, float] = {}
+        for field, weight in _field_weights.items():
+            value = getattr(recording, field, None)
+            if not value:
+                continue
+            for token in _tokenize(value):
+                weights[token] = max(weights.get(token, 0.0), weight)
+        with self._lock:
+            self._remove(rec_id)
+            self._recordings[rec_id] = recording
+            self._recording_tokens[rec_id] = list(weights)
+            self._recording_values[rec_id] = _indexed_values(recording)
+            for token, weight in weights.items():
+                postings = self._postings.get(token)
+                if postings is None:
+                    postings = self._postings[token] = {}
+                    insort(self._tokens, token)
+                postings[rec_id] = weight
+
+    def remove(self, rec_id: str) -> None:
+        """Remove a recording by id."""
+        with self._lock:
+            self._remove(rec_id)
+
+    def _remove(self, rec_id: str) -> None:
+        if rec_id not in self._recordings:
+            return
+        del self._recordings[rec_id]
+        del self._recording_values[rec_id]
+        for token in self._recording_tokens.pop(rec_id):
+            postings = self._postings[token]
+            del postings[rec_id]
+            if not postings:
+                del self._postings[token]
+                del self._tokens[bisect_left(self._tokens, token)]
+
+    def sync(self, recordings: Iterable[Any]) -> Tuple[int, int]:
+        """Make the index match the given recordings; return (added, removed).
+
+        Recordings are only indexed again when an indexed field changed, so
+        a sync with freshly fetched models of the same library is cheap.
+        """
+        recordings = {recording_id(recording): recording for recording in recordings}
+        recordings.pop(None, None)
+        with self._lock:
+            indexed = dict(self._recording_values)
+        removed = [rec_id for rec_id in indexed if rec_id not in recordings]
+        for rec_id in removed:
+            self.remove(rec_id)
+        added = 0
+        unchanged = []
+        for rec_id, recording in recordings.items():
+            if indexed.get(rec_id) == _indexed_values(recording):
+                unchanged.append((rec_id, recording))
+                continue
+            added += rec_id not in indexed
+            self.add(recording)
+        with self._lock:
+            # Search results return the latest models
+            for rec_id, recording in unchanged:
+                if rec_id in self._recordings:
+                    self._recordings[rec_id] = recording
+        return added, len(removed)
+
+    def _match_token(self, query_token: str) -> Dict[str, float]:
+        """Return the recordings matching a token by prefix, with their score."""
+        scores: Dict[str, float] = {}
+        position = bisect_left(self._tokens, query_token)
+        while position < len(self._tokens) and self._tokens[position].startswith(
+            query_token
+        ):
+            token = self._tokens[position]
+            # Exact matches rank above prefix matches
+            closeness = 1.0 if token == query_token else 0.5 * len(query_token) / len(token)
+            for rec_id, weight in self._postings[token].items():
+                scores[rec_id] = max(scores.get(rec_id, 0.0), weight * closeness)
+            position += 1
+        return scores
+
+    def search(self, query: str, limit: int = 10) -> List[LGHorizonSearchResult]:
+        """Return the best matching recordings for a query, best first."""
+        text = _normalize(query)
+        season = episode = None
+        match = _season_episode_pattern.search(text)
+        if match:
+            season, episode = int(match.group(1)), int(match.group(2))
+            text = text.replace(match.group(0), " ")
+        match = _season_pattern.search(text)
+        if match:
+            season = int(match.group(1))
+            text = text.replace(match.group(0), " ")
+        match = _episode_pattern.search(text)
+        if match:
+            episode = int(match.group(1))
+            text = text.replace(match.group(0), " ")
+
+        with self._lock:
+            scores: Optional[Dict[str, float]] = None
+            for query_token in _tokenize(text):
+                token_scores = self._match_token(query_token)
+                if scores is None:
+                    scores = token_scores
+                else:
+                    scores = {
+                        rec_id: score + token_scores[rec_id]
+                        for rec_id, score in scores.items()
+                        if rec_id in token_scores
+                    }
+                if not scores:
+                    return []
+            if scores is None:
+                scores = {rec_id: 0.0 for rec_id in self._recordings}
+            results = []
+            for rec_id, score in scores.items():
+                recording = self._recordings[rec_id]
+                if season is not None and getattr(recording, "seasonNumber", None) != season:
+                    continue
+                if episode is not None and getattr(recording, "episodeNumber", None) != episode:
+                    continue
+                results.append(LGHorizonSearchResult(recording, score))
+        results.sort(key=lambda result: (-result.score, *_episode_key(result.recording)))
+        return results[:limit]
+
+    def latest(self, query: str) -> Optional[LGHorizonSearchResult]:
+        """Return the latest episode among the best matches for a query."""
+        results = self.search(query, limit=len(self._recordings) or 1)
+        if not results:
+            return None
+        best_score = results[0].score
+        best = [result for result in results if result.score == best_score]
+        return min(best, key=lambda result: _episode_key(result.recording))
+
+
+def _episode_key(recording: Any) -> Tuple[int, int]:
+    """Sort key putting the highest season and episode first."""
+    return (
+        -(getattr(recording, "seasonNumber", None) or 0),
+        -(getattr(recording, "episodeNumber", None) or 0),
+    )
@@ -0,0 +1,70 @@
+"""Periodic export of the client stats for diagnosis from outside the process."""
+
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Optional
+
+_logger = logging.getLogger(__name__)
+
+
+class LGHorizonStatsWriter:
+    """Write LGHorizonApi.get_stats() to a json file every interval seconds.
+
+    The file is replaced atomically, so `python -m lghorizon stats
+    --stats-file` can read the stats of a running client at any time.
+    """
+
+    interval: float = 60.0
+    writes: int = 0
+
+    def __init__(self, api: Any, file_path: str, interval: float = 60.0) -> None:
+        self.file_path = file_path
+        self.interval = interval
+        self._api = api
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Write the stats now and then every interval in a background thread."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="lghorizon-stats-writer", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(self.interval)
+
+    def _run(self) -> None:
+        while True:
+            try:
+                self.write()
+            except Exception:
+                _logger.exception(f"Unable to write stats to {self.file_path}")
+            if self._stop.wait(self.interval):
+                return
+
+    def write(self) -> None:
+        stats: Dict[str, Any] = self._api.get_stats()
+        stats["written"] = time.time()
+        fd, tmp_path = tempfile.mkstemp(
+            dir=os.path.dirname(os.path.abspath(self.file_path)),
+            prefix=f"{os.path.basename(self.file_path)}.",
+            suffix=".tmp",
+        )
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as stats_file:
+                json.dump(stats, stats_file, default=str)
+            os.replace(tmp_path, self.file_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        self.writes += 1
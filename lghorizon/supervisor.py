@@ -0,0 +1,404 @@
+"""Spread many LGHorizon accounts over worker processes."""
+
+import hashlib
+import itertools
+import logging
+import multiprocessing
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+_logger = logging.getLogger(__name__)
+
+# Box methods that may be called through the supervisor
+_allowed_commands = {
+    "turn_on",
+    "turn_off",
+    "pause",
+    "play",
+    "stop",
+    "next_channel",
+    "previous_channel",
+    "press_enter",
+    "rewind",
+    "fast_forward",
+    "record",
+    "set_channel",
+    "play_recording",
+    "send_key_to_box",
+    "send_key_sequence",
+    "enter_channel_number",
+}
+
+
+class LGHorizonAccount:
+    """Credentials of one account (household) handled by the supervisor."""
+
+    username: str = None
+    password: str = None
+    country_code: str = "nl"
+    identifier: str = None
+    refresh_token: str = None
+
+    def __init__(
+        self,
+        username: str,
+        password: str,
+        country_code: str = "nl",
+        identifier: str = None,
+        refresh_token: str = None,
+    ) -> None:
+        self.username = username
+        self.password = password
+        self.country_code = country_code
+        self.identifier = identifier
+        self.refresh_token = refresh_token
+
+    @property
+    def key(self) -> str:
+        return f"{self.country_code}:{self.username}"
+
+
+def _worker_for(account_key: str, workers: int) -> int:
+    """Rendezvous hashing: only the accounts of an added or removed worker move."""
+    return max(
+        range(workers),
+        key=lambda worker: hashlib.sha1(f"{worker}:{account_key}".encode()).digest(),
+    )
+
+
+def _worker_main(worker_id: int, commands, results, token_store_path: Optional[str]):
+    """Run the api instances of one worker process."""
+    from .lghorizon_api import LGHorizonApi
+    from .token_store import LGHorizonFileTokenStore
+
+    token_store = LGHorizonFileTokenStore(token_store_path) if token_store_path else None
+    apis: Dict[str, Any] = {}
+    subscriptions: Dict[str, Any] = {}
+    # One thread per account runs its commands in order; key sequences sleep
+    # between keys and must not hold up the other accounts of the worker
+    executors: Dict[str, ThreadPoolExecutor] = {}
+
+    def connect(key: str, api) -> None:
+        try:
+            api.connect()
+        except Exception as ex:
+            results.put(("error", key, None, f"Connect failed: {ex}"))
+            return
+        results.put(
+            ("boxes", key, None, [box.to_json() for box in api.settop_boxes.values()])
+        )
+
+    def reply(request_id: int, ok: bool, value: Any) -> None:
+        results.put(("reply", request_id, ok, value))
+
+    def run_command(request_id: int, key: str, device_id: str, method: str, args):
+        try:
+            box = apis[key].settop_boxes[device_id]
+            outcome = getattr(box, method)(*args)
+        except Exception as ex:
+            reply(request_id, False, str(ex))
+            return
+        if isinstance(outcome, Future):
+            outcome.add_done_callback(
+                lambda future: reply(
+                    request_id,
+                    future.exception() is None,
+                    str(future.exception() or "acknowledged"),
+                )
+            )
+        else:
+            reply(request_id, True, "published")
+
+    # Accounts with queued events; the events wake the loop through the command queue
+    changed_accounts = set()
+    changed_lock = threading.Lock()
+
+    def signal_changed(key: str) -> None:
+        with changed_lock:
+            if key in changed_accounts:
+                return
+            changed_accounts.add(key)
+        commands.put(("changed", key))
+
+    def forward_changes(key: str) -> None:
+        with changed_lock:
+            changed_accounts.discard(key)
+        subscription = subscriptions.get(key)
+        if subscription is None:
+            return
+        # Forward the latest state of every box that changed
+        changed = set()
+        event = subscription.get(0)
+        while event is not None:
+            changed.add(event.device_id)
+            event = subscription.get(0)
+        for device_id in changed:
+            box = apis[key].settop_boxes.get(device_id)
+            if box:
+                results.put(("box", key, device_id, box.to_json()))
+
+    while True:
+        message = commands.get()
+        action = message[0]
+        if action == "add":
+            account: LGHorizonAccount = message[1]
+            api = LGHorizonApi(
+                account.username,
+                account.password,
+                account.country_code,
+                account.identifier,
+                account.refresh_token,
+                token_store=token_store,
+            )
+            apis[account.key] = api
+            subscriptions[account.key] = api.subscribe(
+                maxsize=1000, notify=lambda key=account.key: signal_changed(key)
+            )
+            threading.Thread(
+                target=connect, args=(account.key, api), daemon=True
+            ).start()
+        elif action == "remove":
+            api = apis.pop(message[1], None)
+            subscription = subscriptions.pop(message[1], None)
+            executor = executors.pop(message[1], None)
+            if subscription:
+                subscription.close()
+            if executor:
+                executor.shutdown(wait=False)
+            if api:
+                api.disconnect()
+        elif action == "command":
+            key = message[2]
+            if key not in apis:
+                # Replies with the error right away
+                run_command(*message[1:])
+                continue
+            if key not in executors:
+                executors[key] = ThreadPoolExecutor(
+                    max_workers=1, thread_name_prefix=f"lghorizon-commands-{key}"
+                )
+            executors[key].submit(run_command, *message[1:])
+        elif action == "changed":
+            forward_changes(message[1])
+        elif action == "stop":
+            break
+    for executor in executors.values():
+        executor.shutdown(wait=True)
+    for api in apis.values():
+        api.disconnect()
+
+
+class LGHorizonSupervisor:
+    """Run LGHorizonApi instances for many accounts in worker processes.
+
+    Accounts are assigned to workers by rendezvous hashing of the account
+    key. Crashed workers are restarted with their accounts. The box state
+    of all accounts is kept in the parent as LGHorizonBox.to_json() dicts
+    and commands are forwarded to the worker that owns the account.
+    """
+
+    workers: int = None
+    boxes: Dict[str, Dict[str, Dict[str, Any]]] = None
+    errors: Dict[str, str] = None
+    restarts: int = 0
+
+    def __init__(
+        self,
+        workers: int = None,
+        state_callback: Callable[[str, str, Dict[str, Any]], None] = None,
+        token_store_path: str = None,
+    ) -> None:
+        """Create the supervisor.
+
+        state_callback is called in the parent with the account key, device
+        id and box state on every change.
+        """
+        self.workers = workers or multiprocessing.cpu_count()
+        self.boxes = {}
+        self.errors = {}
+        self._state_callback = state_callback
+        self._token_store_path = token_store_path
+        self._context = multiprocessing.get_context("spawn")
+        self._results = self._context.Queue()
+        self._processes: Dict[int, Any] = {}
+        self._command_queues: Dict[int, Any] = {}
+        self._accounts: Dict[str, LGHorizonAccount] = {}
+        self._assignment: Dict[str, int] = {}
+        # request id: (worker id, future)
+        self._requests: Dict[int, Tuple[int, Future]] = {}
+        self._request_ids = itertools.count()
+        self._lock = threading.RLock()
+        self._running = False
+        self._threads: List[threading.Thread] = []
+
+    def start(self) -> None:
+        """Start the workers and the result and monitor threads."""
+        self._running = True
+        for worker_id in range(self.workers):
+            self._start_worker(worker_id)
+        for target in (self._read_results, self._monitor):
+            thread = threading.Thread(target=target, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Disconnect all accounts and stop the workers."""
+        self._running = False
+        with self._lock:
+            for command_queue in self._command_queues.values():
+                command_queue.put(("stop",))
+            for worker_id in list(self._processes):
+                self._join_worker(worker_id, timeout)
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def _join_worker(self, worker_id: int, timeout: float) -> None:
+        """Wait for a stopped worker and fail the commands it did not answer."""
+        process = self._processes.pop(worker_id)
+        self._command_queues.pop(worker_id, None)
+        process.join(timeout)
+        if process.is_alive():
+            process.terminate()
+            process.join(timeout)
+        self._fail_requests(worker_id, f"Worker {worker_id} stopped")
+
+    def _fail_requests(self, worker_id: int, reason: str) -> None:
+        with self._lock:
+            request_ids = [
+                request_id
+                for request_id, (owner, _) in self._requests.items()
+                if owner == worker_id
+            ]
+            futures = [self._requests.pop(request_id)[1] for request_id in request_ids]
+        for future in futures:
+            future.set_exception(RuntimeError(reason))
+
+    def _start_worker(self, worker_id: int) -> None:
+        command_queue = self._context.Queue()
+        process = self._context.Process(
+            target=_worker_main,
+            args=(worker_id, command_queue, self._results, self._token_store_path),
+            name=f"lghorizon-worker-{worker_id}",
+            daemon=True,
+        )
+        process.start()
+        self._processes[worker_id] = process
+        self._command_queues[worker_id] = command_queue
+        for key, assigned in self._assignment.items():
+            if assigned == worker_id:
+                command_queue.put(("add", self._accounts[key]))
+
+    def add_account(self, account: LGHorizonAccount) -> str:
+        """Start handling an account; returns its key."""
+        with self._lock:
+            if account.key in self._accounts:
+                return account.key
+            worker_id = _worker_for(account.key, self.workers)
+            self._accounts[account.key] = account
+            self._assignment[account.key] = worker_id
+            if worker_id in self._command_queues:
+                self._command_queues[worker_id].put(("add", account))
+        return account.key
+
+    def remove_account(self, key: str) -> None:
+        """Stop handling an account."""
+        with self._lock:
+            worker_id = self._assignment.pop(key, None)
+            self._accounts.pop(key, None)
+            self.boxes.pop(key, None)
+            if worker_id is not None and worker_id in self._command_queues:
+                self._command_queues[worker_id].put(("remove", key))
+
+    def resize(self, workers: int) -> None:
+        """Change the number of workers, moving only the accounts that change owner."""
+        with self._lock:
+            old_workers = self.workers
+            self.workers = workers
+            for worker_id in range(old_workers, workers):
+                self._start_worker(worker_id)
+            for key, old_worker in list(self._assignment.items()):
+                new_worker = _worker_for(key, workers)
+                if new_worker == old_worker:
+                    continue
+                self._assignment[key] = new_worker
+                self._command_queues[old_worker].put(("remove", key))
+                self._command_queues[new_worker].put(("add", self._accounts[key]))
+            for worker_id in range(workers, old_workers):
+                self._command_queues[worker_id].put(("stop",))
+            for worker_id in range(workers, old_workers):
+                self._join_worker(worker_id, 10.0)
+
+    def command(self, key: str, device_id: str, method: str, *args) -> Future:
+        """Call a box method in the owning worker; the future resolves with the outcome."""
+        if method not in _allowed_commands:
+            raise ValueError(f"Unsupported command: {method}")
+        future = Future()
+        with self._lock:
+            request_id = next(self._request_ids)
+            worker_id = self._assignment[key]
+            self._requests[request_id] = (worker_id, future)
+            self._command_queues[worker_id].put(
+                ("command", request_id, key, device_id, method, args)
+            )
+        return future
+
+    def _read_results(self) -> None:
+        while self._running:
+            try:
+                kind, first, second, value = self._results.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                return
+            if kind == "reply":
+                # Not under the lock, which is held while joining workers
+                request = self._requests.pop(first, None)
+                if request is None:
+                    continue
+                future = request[1]
+                if second:
+                    future.set_result(value)
+                else:
+                    future.set_exception(RuntimeError(value))
+            elif kind == "error":
+                self.errors[first] = value
+                _logger.warning(f"Account {first}: {value}")
+            elif kind == "boxes":
+                if first not in self._accounts:
+                    continue
+                self.errors.pop(first, None)
+                self.boxes[first] = {box["deviceId"]: box for box in value}
+                for box in value:
+                    self._notify(first, box["deviceId"], box)
+            elif kind == "box":
+                if first not in self._accounts:
+                    continue
+                self.boxes.setdefault(first, {})[second] = value
+                self._notify(first, second, value)
+
+    def _notify(self, key: str, device_id: str, box: Dict[str, Any]) -> None:
+        if not self._state_callback:
+            return
+        try:
+            self._state_callback(key, device_id, box)
+        except Exception:
+            _logger.exception("State callback failed")
+
+    def _monitor(self) -> None:
+        while self._running:
+            time.sleep(1.0)
+            with self._lock:
+                for worker_id, process in list(self._processes.items()):
+                    if not self._running or process.is_alive():
+                        continue
+                    _logger.warning(
+                        f"Worker {worker_id} exited with {process.exitcode}, restarting"
+                    )
+                    self._fail_requests(
+                        worker_id, f"Worker {worker_id} exited with {process.exitcode}"
+                    )
+                    self.restarts += 1
+                    self._start_worker(worker_id)
@@ -0,0 +1,122 @@
+"""Persistent storage for LGHorizon tokens."""
+
+import json
+import logging
+import os
+import tempfile
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows, only the threads of one process are serialized
+    fcntl = None
+
+_logger = logging.getLogger(__name__)
+
+
+class LGHorizonTokenStore(ABC):
+    """Store the tokens of an account so a restart can skip the password login.
+
+    Tokens are stored per key (country code and username) in the format of
+    LGHorizonAuth.to_json().
+    """
+
+    @abstractmethod
+    def load(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the stored tokens for key, or None."""
+
+    @abstractmethod
+    def save(self, key: str, tokens: Dict[str, Any]) -> None:
+        """Store the tokens for key."""
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """Remove the tokens for key."""
+
+
+class LGHorizonMemoryTokenStore(LGHorizonTokenStore):
+    """Keep tokens in memory, e.g. to share them between api instances."""
+
+    def __init__(self) -> None:
+        self._tokens: Dict[str, Dict[str, Any]] = {}
+
+    def load(self, key: str) -> Optional[Dict[str, Any]]:
+        tokens = self._tokens.get(key)
+        return dict(tokens) if tokens else None
+
+    def save(self, key: str, tokens: Dict[str, Any]) -> None:
+        self._tokens[key] = dict(tokens)
+
+    def delete(self, key: str) -> None:
+        self._tokens.pop(key, None)
+
+
+class LGHorizonFileTokenStore(LGHorizonTokenStore):
+    """Keep tokens of one or more accounts in a json file, readable by the owner only.
+
+    Several processes can share the file, e.g. the workers of the
+    supervisor: updates hold a lock on file_path.lock.
+    """
+
+    file_path: str = None
+
+    def __init__(self, file_path: str) -> None:
+        self.file_path = file_path
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _locked(self):
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            fd = os.open(f"{self.file_path}.lock", os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                yield
+            finally:
+                os.close(fd)
+
+    def _read(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self.file_path, "r", encoding="utf-8") as token_file:
+                return json.load(token_file)
+        except FileNotFoundError:
+            return {}
+        except ValueError:
+            _logger.warning(f"Unable to read token file {self.file_path}")
+            return {}
+
+    def _write(self, all_tokens: Dict[str, Dict[str, Any]]) -> None:
+        # mkstemp creates the file readable by the owner only
+        fd, tmp_path = tempfile.mkstemp(
+            dir=os.path.dirname(os.path.abspath(self.file_path)),
+            prefix=f"{os.path.basename(self.file_path)}.",
+            suffix=".tmp",
+        )
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as token_file:
+                json.dump(all_tokens, token_file)
+            os.replace(tmp_path, self.file_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def load(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._locked():
+            return self._read().get(key)
+
+    def save(self, key: str, tokens: Dict[str, Any]) -> None:
+        with self._locked():
+            all_tokens = self._read()
+            all_tokens[key] = tokens
+            self._write(all_tokens)
+
+    def delete(self, key: str) -> None:
+        with self._locked():
+            all_tokens = self._read()
+            if all_tokens.pop(key, None) is not None:
+                self._write(all_tokens)
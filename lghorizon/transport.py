@@ -0,0 +1,322 @@
+"""HTTP transport settings for the LGHorizon API."""
+
+import base64
+import atexit
+import gzip
+import io
+import json
+import logging
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from requests import Session
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.exceptions import ConnectionError as RequestsConnectionError
+from requests.models import Response
+from requests.structures import CaseInsensitiveDict
+from urllib3.util.request import ACCEPT_ENCODING
+
+_logger = logging.getLogger(__name__)
+
+# Timeouts are (connect, read) in seconds.
+DEFAULT_CONNECT_TIMEOUT = 5.0
+DEFAULT_READ_TIMEOUT = 15.0
+
+
+class LGHorizonTransportConfig:
+    """Timeouts, connection pooling and compression for all HTTP calls.
+
+    Timeouts can be overridden per backoffice service, using the service
+    names from the backoffice config (e.g. ``linearService``) and ``auth``
+    for the login flows.
+    """
+
+    connect_timeout: float = DEFAULT_CONNECT_TIMEOUT
+    read_timeout: float = DEFAULT_READ_TIMEOUT
+    service_timeouts: Dict[str, Tuple[float, float]] = None
+    pool_connections: int = 10
+    pool_maxsize: int = 10
+    compression: bool = True
+    requests_per_second: float = 5.0
+    burst: int = 10
+    max_throttle_wait: float = 30.0
+    record_file: str = None
+    replay_file: str = None
+
+    def __init__(
+        self,
+        connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+        read_timeout: float = DEFAULT_READ_TIMEOUT,
+        service_timeouts: Dict[str, Tuple[float, float]] = None,
+        pool_connections: int = 10,
+        pool_maxsize: int = 10,
+        compression: bool = True,
+        requests_per_second: float = 5.0,
+        burst: int = 10,
+        max_throttle_wait: float = 30.0,
+        record_file: str = None,
+        replay_file: str = None,
+    ) -> None:
+        """Create a transport config.
+
+        pool_connections is the number of hosts to keep a pool for and
+        pool_maxsize the maximum number of keep-alive connections per host.
+        requests_per_second and burst limit the calls per household; a call
+        that would have to wait longer than max_throttle_wait fails instead.
+        With record_file all requests and responses are appended to that
+        file, with credentials and tokens scrubbed. With replay_file the
+        responses are served from a recording and the network is not used.
+        """
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.service_timeouts = dict(service_timeouts or {})
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.compression = compression
+        self.requests_per_second = requests_per_second
+        self.burst = burst
+        self.max_throttle_wait = max_throttle_wait
+        self.record_file = record_file
+        self.replay_file = replay_file
+
+    def timeout_for(self, service: Optional[str]) -> Tuple[float, float]:
+        """Return the (connect, read) timeout for a service."""
+        if service in self.service_timeouts:
+            return self.service_timeouts[service]
+        return (self.connect_timeout, self.read_timeout)
+
+    @property
+    def accept_encoding(self) -> str:
+        """Encodings urllib3 can decode; includes br when brotli is installed."""
+        if not self.compression:
+            return "identity"
+        return ACCEPT_ENCODING
+
+    def create_session(self) -> Session:
+        """Create a requests session with the configured pool and encoding."""
+        session = Session()
+        if self.replay_file:
+            adapter = LGHorizonReplayAdapter(_get_replay(self.replay_file))
+        elif self.record_file:
+            adapter = LGHorizonRecordingAdapter(
+                _get_recorder(self.record_file),
+                pool_connections=self.pool_connections,
+                pool_maxsize=self.pool_maxsize,
+            )
+        else:
+            adapter = HTTPAdapter(
+                pool_connections=self.pool_connections,
+                pool_maxsize=self.pool_maxsize,
+            )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.headers["Accept-Encoding"] = self.accept_encoding
+        return session
+
+
+# Values of these JSON fields, query parameters and form fields are never recorded
+_secret_fields = {
+    "password",
+    "username",
+    "accesstoken",
+    "refreshtoken",
+    "token",
+    "validitytoken",
+    "authorizationcode",
+    "code",
+    "j_username",
+    "j_password",
+}
+# Response headers kept in a recording
+_recorded_headers = (
+    "Content-Type",
+    "Location",
+    "ETag",
+    "Last-Modified",
+    "Retry-After",
+)
+_scrubbed = "SCRUBBED"
+
+
+def _scrub_url(url: str) -> str:
+    parts = urlsplit(url)
+    if not parts.query:
+        return url
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    if not any(name.lower() in _secret_fields for name, _ in query):
+        return url
+    query = [
+        (name, _scrubbed if name.lower() in _secret_fields else value)
+        for name, value in query
+    ]
+    return urlunsplit(parts._replace(query=urlencode(query, safe="/:")))
+
+
+def _scrub_json(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {
+            key: _scrubbed if key.lower() in _secret_fields else _scrub_json(item)
+            for key, item in value.items()
+        }
+    if isinstance(value, list):
+        return [_scrub_json(item) for item in value]
+    return value
+
+
+class _LGHorizonHttpRecorder:
+    """Appends scrubbed request/response pairs to a gzipped JSON lines file."""
+
+    def __init__(self, file_path: str) -> None:
+        self.file_path = file_path
+        self._lock = threading.Lock()
+        self._file = None
+
+    def write(self, response: Response) -> None:
+        request = response.request
+        content = response.content or b""
+        entry: Dict[str, Any] = {
+            "method": request.method,
+            "url": _scrub_url(request.url),
+            "status": response.status_code,
+            "reason": response.reason,
+            "headers": {
+                name: _scrub_url(response.headers[name])
+                if name == "Location"
+                else response.headers[name]
+                for name in _recorded_headers
+                if name in response.headers
+            },
+        }
+        try:
+            entry["json"] = _scrub_json(json.loads(content))
+        except ValueError:
+            entry["body"] = base64.b64encode(content).decode()
+        line = json.dumps(entry, separators=(",", ":")) + "\n"
+        with self._lock:
+            if self._file is None:
+                self._file = gzip.open(self.file_path, "at", encoding="utf-8")
+            self._file.write(line)
+            # Keep the file readable when the process is killed
+            self._file.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class _LGHorizonHttpReplay:
+    """Recorded responses by method and url, served in recorded order."""
+
+    def __init__(self, file_path: str) -> None:
+        self.file_path = file_path
+        self._lock = threading.Lock()
+        self._by_url: Dict[Tuple[str, str], Deque[Dict[str, Any]]] = {}
+        self._by_path: Dict[Tuple[str, str], Deque[Dict[str, Any]]] = {}
+        with gzip.open(file_path, "rt", encoding="utf-8") as record_file:
+            try:
+                for line in record_file:
+                    self._add(json.loads(line))
+            except EOFError:
+                # Recording of a process that did not exit cleanly
+                pass
+        _logger.debug(f"Loaded {len(self._by_url)} recorded urls from {file_path}")
+
+    def _add(self, entry: Dict[str, Any]) -> None:
+        method = entry["method"]
+        self._by_url.setdefault((method, entry["url"]), deque()).append(entry)
+        self._by_path.setdefault((method, entry["url"].split("?")[0]), deque()).append(
+            entry
+        )
+
+    def next_entry(self, method: str, url: str) -> Optional[Dict[str, Any]]:
+        """Return the next response for a request; the last one is repeated."""
+        url = _scrub_url(url)
+        with self._lock:
+            entries = self._by_url.get((method, url)) or self._by_path.get(
+                (method, url.split("?")[0])
+            )
+            if not entries:
+                return None
+            if len(entries) > 1:
+                return entries.popleft()
+            return entries[0]
+
+
+_recorders: Dict[str, _LGHorizonHttpRecorder] = {}
+_replays: Dict[str, _LGHorizonHttpReplay] = {}
+_registry_lock = threading.Lock()
+
+
+def _get_recorder(file_path: str) -> _LGHorizonHttpRecorder:
+    # Sessions recording to the same file share one writer
+    with _registry_lock:
+        if file_path not in _recorders:
+            _recorders[file_path] = _LGHorizonHttpRecorder(file_path)
+        return _recorders[file_path]
+
+
+@atexit.register
+def _close_recorders() -> None:
+    for recorder in _recorders.values():
+        recorder.close()
+
+
+def _get_replay(file_path: str) -> _LGHorizonHttpReplay:
+    # Sessions replaying the same file consume the same responses
+    with _registry_lock:
+        if file_path not in _replays:
+            _replays[file_path] = _LGHorizonHttpReplay(file_path)
+        return _replays[file_path]
+
+
+class LGHorizonRecordingAdapter(HTTPAdapter):
+    """HTTPAdapter that records every response it receives."""
+
+    def __init__(self, recorder: _LGHorizonHttpRecorder, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self._recorder = recorder
+
+    def send(self, request, **kwargs):
+        response = super().send(request, **kwargs)
+        try:
+            self._recorder.write(response)
+        except Exception:
+            _logger.exception(f"Unable to record {request.method} {request.url}")
+        return response
+
+
+class LGHorizonReplayAdapter(BaseAdapter):
+    """Adapter serving recorded responses instead of using the network."""
+
+    def __init__(self, replay: _LGHorizonHttpReplay) -> None:
+        super().__init__()
+        self._replay = replay
+
+    def send(self, request, **kwargs):
+        entry = self._replay.next_entry(request.method, request.url)
+        if entry is None:
+            raise RequestsConnectionError(
+                f"No recorded response for {request.method} {request.url}",
+                request=request,
+            )
+        response = Response()
+        response.status_code = entry["status"]
+        response.reason = entry.get("reason")
+        response.headers = CaseInsensitiveDict(entry["headers"])
+        if "json" in entry:
+            content = json.dumps(entry["json"]).encode()
+            response.encoding = "utf-8"
+        else:
+            content = base64.b64decode(entry["body"])
+        # Read like a network body, so streamed requests and close() work
+        response.raw = io.BytesIO(content)
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self) -> None:
+        pass
@@ -0,0 +1,204 @@
+"""Detection of MQTT connections that stopped delivering messages."""
+
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional
+
+from .commands import LGHorizonCommandLatency
+from .const import ONLINE_RUNNING
+
+_logger = logging.getLogger(__name__)
+
+
+class LGHorizonMqttWatchdog:
+    """Watch the message flow of an api and reconnect when it dries up.
+
+    The socket of a websocket connection can die without paho noticing, in
+    which case is_connected stays true and no messages arrive. The
+    watchdog keeps the time of the last message per box and per topic.
+    Running boxes that have been quiet for quiet_after seconds are probed
+    with CPE.getUiStatus. When every probed box left max_failed_probes
+    probes in a row unanswered, or when no message at all arrived for
+    max_silence seconds while a box is running, the MQTT connection is
+    re-established. A single box that stopped answering, e.g. because it
+    lost its own connection, does not cause a reconnect.
+    """
+
+    check_interval: float = 30.0
+    quiet_after: float = 300.0
+    probe_timeout: float = 10.0
+    max_failed_probes: int = 2
+    max_silence: float = 900.0
+    messages: int = 0
+    message_rate: float = 0.0
+    probes: int = 0
+    failed_probes: int = 0
+    reconnects: int = 0
+    last_reconnect: float = None
+    probe_latency: LGHorizonCommandLatency = None
+
+    def __init__(
+        self,
+        api: Any,
+        check_interval: float = 30.0,
+        quiet_after: float = 300.0,
+        probe_timeout: float = 10.0,
+        max_failed_probes: int = 2,
+        max_silence: float = 900.0,
+        metrics_callback: Callable[[Dict[str, Any]], None] = None,
+    ) -> None:
+        self.check_interval = check_interval
+        self.quiet_after = quiet_after
+        self.probe_timeout = probe_timeout
+        self.max_failed_probes = max_failed_probes
+        self.max_silence = max_silence
+        self.probe_latency = LGHorizonCommandLatency()
+        self._api = api
+        self._metrics_callback = metrics_callback
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+        self._last_message: float = self._started
+        self._last_by_box: Dict[str, float] = {}
+        self._last_by_topic: Dict[str, float] = {}
+        self._count_by_topic: Dict[str, int] = {}
+        self._probing: Dict[str, Future] = {}
+        # Unanswered probes in a row per box
+        self._failed_by_box: Dict[str, int] = {}
+        self._rate_count = 0
+        self._rate_since = time.monotonic()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Start checking in a background thread."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="lghorizon-mqtt-watchdog", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(self.check_interval)
+
+    def record_message(self, message: Any, topic: str) -> None:
+        """Register a received message; called from the MQTT thread."""
+        now = time.monotonic()
+        device_id = None
+        if isinstance(message, dict) and isinstance(message.get("source"), str):
+            device_id = message["source"]
+        else:
+            splitted_topic = topic.split("/")
+            if len(splitted_topic) > 1:
+                device_id = splitted_topic[1]
+        with self._lock:
+            self.messages += 1
+            self._rate_count += 1
+            self._last_message = now
+            self._last_by_topic[topic] = now
+            self._count_by_topic[topic] = self._count_by_topic.get(topic, 0) + 1
+            if device_id in self._api.settop_boxes:
+                self._last_by_box[device_id] = now
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.check_interval):
+            try:
+                self.check()
+            except Exception:
+                _logger.exception("MQTT watchdog check failed")
+
+    def check(self) -> None:
+        """Probe quiet boxes and reconnect when the connection looks dead."""
+        now = time.monotonic()
+        with self._lock:
+            self.message_rate = self._rate_count / max(now - self._rate_since, 1e-6)
+            self._rate_count = 0
+            self._rate_since = now
+            silence = now - self._last_message
+        client = self._api._mqttClient
+        if client is None or not client.is_connected:
+            # paho is reconnecting by itself
+            return
+        running = [
+            box for box in self._api.settop_boxes.values() if box.state == ONLINE_RUNNING
+        ]
+        if running and silence > self.max_silence:
+            self._reconnect(f"no messages for {silence:.0f}s")
+            return
+        probed = [
+            self._failed_by_box[box.deviceId]
+            for box in running
+            if box.deviceId in self._failed_by_box
+        ]
+        if probed and min(probed) >= self.max_failed_probes:
+            self._reconnect(f"probes of {len(probed)} boxes unanswered")
+            return
+        for box in running:
+            last = self._last_by_box.get(box.deviceId, self._started)
+            if now - last < self.quiet_after or box.deviceId in self._probing:
+                continue
+            self._probe(box)
+        if self._metrics_callback:
+            self._metrics_callback(self.stats())
+
+    def _probe(self, box: Any) -> None:
+        _logger.debug(f"Box {box.deviceId} is quiet, probing")
+        self.probes += 1
+        sent_at = time.monotonic()
+        future = box._request_settop_box_state(self.probe_timeout)
+        self._probing[box.deviceId] = future
+
+        def done(future: Future) -> None:
+            self._probing.pop(box.deviceId, None)
+            if future.exception() is None:
+                self._failed_by_box[box.deviceId] = 0
+                self.probe_latency.add((time.monotonic() - sent_at) * 1000)
+                return
+            self.failed_probes += 1
+            self._failed_by_box[box.deviceId] = self._failed_by_box.get(box.deviceId, 0) + 1
+            _logger.debug(f"Probe of box {box.deviceId} failed: {future.exception()}")
+
+        future.add_done_callback(done)
+
+    def _reconnect(self, reason: str) -> None:
+        _logger.warning(f"MQTT connection looks dead ({reason}), reconnecting")
+        self.reconnects += 1
+        self.last_reconnect = time.time()
+        try:
+            self._api.reconnect_mqtt()
+        except Exception:
+            _logger.exception("MQTT reconnect failed")
+        # Probes failed by the reconnect don't count against the new connection
+        self._failed_by_box.clear()
+        with self._lock:
+            # Give the new connection a full max_silence
+            self._last_message = time.monotonic()
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            return {
+                "messages": self.messages,
+                "messageRate": self.message_rate,
+                "secondsSinceLastMessage": now - self._last_message,
+                "boxes": {
+                    device_id: now - last for device_id, last in self._last_by_box.items()
+                },
+                "topics": {
+                    topic: {
+                        "count": self._count_by_topic[topic],
+                        "secondsSinceLast": now - last,
+                    }
+                    for topic, last in self._last_by_topic.items()
+                },
+                "probes": self.probes,
+                "failedProbes": self.failed_probes,
+                "probeLatency": self.probe_latency.to_json(),
+                "reconnects": self.reconnects,
+                "lastReconnect": self.last_reconnect,
+            }
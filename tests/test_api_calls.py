@@ -0,0 +1,153 @@
+"""Tests for sending API calls: retries, circuit breaker and streaming."""
+
+import io
+import json
+
+import backoff._sync
+import pytest
+from requests import Response, exceptions as request_exceptions
+from requests.adapters import BaseAdapter
+
+from lghorizon.const import CIRCUIT_CLOSED, CIRCUIT_HALF_OPEN, CIRCUIT_OPEN
+from lghorizon.exceptions import (
+    LGHorizonApiConnectionError,
+    LGHorizonApiRateLimitedError,
+)
+from lghorizon.lghorizon_api import LGHorizonApi
+from lghorizon.models import LGHorizonBox, LGHorizonChannel
+from lghorizon.transport import LGHorizonTransportConfig
+
+
+class _FakeAdapter(BaseAdapter):
+    """Answer requests from a list of responses or exceptions."""
+
+    def __init__(self, answers):
+        super().__init__()
+        self.answers = list(answers)
+        self.requests = []
+
+    def send(self, request, **kwargs):
+        self.requests.append(request)
+        answer = self.answers.pop(0)
+        if isinstance(answer, Exception):
+            raise answer
+        response = Response()
+        response.status_code = 200
+        response.url = request.url
+        response.request = request
+        response.raw = io.BytesIO(json.dumps(answer).encode())
+        return response
+
+    def close(self):
+        pass
+
+
+@pytest.fixture(autouse=True)
+def no_backoff_sleep(monkeypatch):
+    monkeypatch.setattr(backoff._sync.time, "sleep", lambda seconds: None)
+
+
+def _api(answers, **kwargs) -> LGHorizonApi:
+    config = LGHorizonTransportConfig(requests_per_second=1e9, burst=1e9)
+    api = LGHorizonApi("user", "secret", "nl", transport_config=config, **kwargs)
+    adapter = _FakeAdapter(answers)
+    api._session.mount("https://", adapter)
+    api.adapter = adapter
+    return api
+
+
+def test_api_call_retries_connection_errors():
+    api = _api(
+        [
+            request_exceptions.ConnectionError("down"),
+            request_exceptions.ConnectionError("down"),
+            {"ok": True},
+        ]
+    )
+    assert api._do_api_call("https://example.com/a", "testService") == {"ok": True}
+    assert len(api.adapter.requests) == 3
+
+
+def test_api_call_gives_up_after_three_tries():
+    api = _api([request_exceptions.ConnectionError("down")] * 3)
+    with pytest.raises(LGHorizonApiConnectionError):
+        api._do_api_call("https://example.com/a", "testService")
+    assert len(api.adapter.requests) == 3
+
+
+def test_streamed_api_call_retries_opening_the_response():
+    api = _api([request_exceptions.ConnectionError("down"), {"data": [1, 2, 3]}])
+    items = api._do_api_call_streamed("https://example.com/a", "testService", "data")
+    assert list(items) == [1, 2, 3]
+    assert len(api.adapter.requests) == 2
+
+
+def test_throttled_call_does_not_take_the_probe(monkeypatch):
+    api = _api([{"ok": True}], circuit_breaker_threshold=1, circuit_breaker_timeout=0)
+    breaker = api._get_circuit_breaker("testService")
+    breaker.record_failure()
+    assert breaker.state == CIRCUIT_OPEN
+
+    def throttled():
+        raise LGHorizonApiRateLimitedError("throttled")
+
+    monkeypatch.setattr(api, "_throttle", throttled)
+    with pytest.raises(LGHorizonApiRateLimitedError):
+        api._allow_api_call("https://example.com/a", "testService")
+    monkeypatch.undo()
+    assert api._do_api_call("https://example.com/a", "testService") == {"ok": True}
+    assert breaker.state == CIRCUIT_CLOSED
+
+
+def test_abandoned_stream_releases_the_probe():
+    api = _api(
+        [{"data": [1, 2]}, {"data": [3]}],
+        circuit_breaker_threshold=1,
+        circuit_breaker_timeout=0,
+    )
+    breaker = api._get_circuit_breaker("testService")
+    breaker.record_failure()
+    items = api._do_api_call_streamed("https://example.com/a", "testService", "data")
+    assert next(items) == 1
+    items.close()
+    assert breaker.state in (CIRCUIT_CLOSED, CIRCUIT_HALF_OPEN)
+    assert breaker.allow_request()
+
+
+def _linear_status(device_id: str):
+    return {
+        "source": device_id,
+        "status": {
+            "uiStatus": "mainUI",
+            "playerState": {
+                "sourceType": "linear",
+                "speed": 1,
+                "source": {"eventId": "event1"},
+            },
+        },
+    }
+
+
+def test_rate_limited_status_messages_keep_the_playing_info():
+    replay_event = {"channelId": "NL_1", "eventId": "event1", "title": "Journaal"}
+    api = _api([replay_event] * 20)
+    api._transport_config = LGHorizonTransportConfig(requests_per_second=0.01, burst=10)
+    api._auth.householdId = "rate-limited-household"
+    api._config = {"linearService": {"URL": "https://linear"}}
+    api._country_settings = {"language": "nl"}
+    channel = LGHorizonChannel(
+        {"id": "NL_1", "name": "NPO 1", "imageStream": {}, "logicalChannelNumber": "1"}
+    )
+    api._channels["NL_1"] = channel
+    box = LGHorizonBox(
+        {"deviceId": "box1", "hashedCPEId": "x", "settings": {"deviceFriendlyName": "Tv"}},
+        None,
+        None,
+        api._auth,
+        api._channels,
+    )
+    api.settop_boxes["box1"] = box
+    for _ in range(15):
+        api._on_mqtt_message(_linear_status("box1"), "household/box1/status")
+    assert len(api.adapter.requests) == 10
+    assert box.playing_info.title == "Journaal"
@@ -0,0 +1,120 @@
+"""Tests for authorizing with a stored or passed refresh token."""
+
+import io
+import json
+import time
+
+import pytest
+from requests import Response
+from requests.adapters import BaseAdapter
+
+from lghorizon.exceptions import LGHorizonApiRateLimitedError
+from lghorizon.lghorizon_api import LGHorizonApi
+from lghorizon.token_store import LGHorizonMemoryTokenStore
+from lghorizon.transport import LGHorizonTransportConfig
+
+
+class _AuthAdapter(BaseAdapter):
+    """Answer the refresh call with a fixed response and the login with new tokens."""
+
+    def __init__(self, refresh_status: int, refresh_body: bytes):
+        super().__init__()
+        self.refresh_status = refresh_status
+        self.refresh_body = refresh_body
+        self.login_status = 200
+        self.retry_after = None
+        self.calls = []
+
+    def send(self, request, **kwargs):
+        response = Response()
+        response.request = request
+        response.url = request.url
+        if request.url.endswith("/authorization/refresh"):
+            self.calls.append("refresh")
+            response.status_code = self.refresh_status
+            body = self.refresh_body
+        else:
+            self.calls.append("login")
+            response.status_code = self.login_status
+            body = json.dumps(_tokens("new-refresh")).encode()
+        if self.retry_after:
+            response.headers["Retry-After"] = self.retry_after
+        response.raw = io.BytesIO(body)
+        return response
+
+    def close(self):
+        pass
+
+
+def _tokens(refresh_token: str):
+    return {
+        "householdId": "household",
+        "accessToken": "access",
+        "refreshToken": refresh_token,
+        "username": "user",
+        "refreshTokenExpiry": int(time.time()) + 3600,
+    }
+
+
+def _api(refresh_status: int, refresh_body: bytes):
+    store = LGHorizonMemoryTokenStore()
+    store.save("nl:user", _tokens("stored-refresh"))
+    config = LGHorizonTransportConfig(requests_per_second=1e9, burst=1e9)
+    api = LGHorizonApi("user", "secret", "nl", transport_config=config, token_store=store)
+    adapter = _AuthAdapter(refresh_status, refresh_body)
+    api._session.mount("https://", adapter)
+    return api, adapter, store
+
+
+@pytest.mark.parametrize(
+    "status, body",
+    [
+        (400, b'{"error": {"statusCode": 1234, "message": "Bad token"}}'),
+        (403, b"<html>Forbidden</html>"),
+        (200, b"<html>Maintenance</html>"),
+    ],
+)
+def test_rejected_refresh_falls_back_to_login(status, body):
+    api, adapter, store = _api(status, body)
+    api._authorize()
+    assert adapter.calls == ["refresh", "login"]
+    assert api.refresh_token == "new-refresh"
+    assert store.load("nl:user")["refreshToken"] == "new-refresh"
+
+
+def test_rejected_refresh_token_is_dropped():
+    api, adapter, store = _api(401, b"{}")
+    api._load_stored_tokens()
+    assert not api._try_refresh_authorization()
+    assert api.refresh_token is None
+    assert api._auth.refreshToken is None
+    assert store.load("nl:user") is None
+
+
+def test_accepted_refresh_skips_login():
+    body = json.dumps(_tokens("rotated-refresh")).encode()
+    api, adapter, store = _api(200, body)
+    api._authorize()
+    assert adapter.calls == ["refresh"]
+    assert store.load("nl:user")["refreshToken"] == "rotated-refresh"
+
+
+def test_rate_limited_refresh_blocks_the_household_and_keeps_the_token():
+    api, adapter, store = _api(429, b"{}")
+    adapter.retry_after = "120"
+    api._load_stored_tokens()
+    with pytest.raises(LGHorizonApiRateLimitedError):
+        api._try_refresh_authorization()
+    assert adapter.calls == ["refresh"]
+    assert store.load("nl:user")["refreshToken"] == "stored-refresh"
+    with pytest.raises(LGHorizonApiRateLimitedError):
+        api._household_bucket().acquire(max_wait=60)
+
+
+def test_rate_limited_login_is_not_a_connection_failure():
+    api, adapter, store = _api(401, b"{}")
+    adapter.login_status = 429
+    store.delete("nl:user")
+    with pytest.raises(LGHorizonApiRateLimitedError):
+        api._authorize_default()
+    assert adapter.calls == ["login"]
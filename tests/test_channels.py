@@ -0,0 +1,93 @@
+"""Tests for refreshing the channels after purchase events."""
+
+import threading
+
+from lghorizon import lghorizon_api
+from lghorizon.channel_catalog import LGHorizonChannelCatalog
+from lghorizon.lghorizon_api import LGHorizonApi, _is_entitlement_message
+from lghorizon.models import LGHorizonCustomer
+
+
+def _channel(id, name, number="1", products=("basic",)):
+    return {
+        "id": id,
+        "name": name,
+        "imageStream": {"full": f"https://images/{id}"},
+        "logo": {"focused": f"https://logos/{id}"},
+        "logicalChannelNumber": number,
+        "linearProducts": list(products),
+    }
+
+
+def _api(monkeypatch, lineups):
+    api = LGHorizonApi("user", "secret", "nl")
+    api._config = {"linearService": {"URL": "https://linear"}}
+    api._customer = LGHorizonCustomer.__new__(LGHorizonCustomer)
+    api._customer.cityId = 1
+    monkeypatch.setattr(lghorizon_api, "channel_catalog", LGHorizonChannelCatalog())
+
+    def update_entitlements():
+        api._entitlements[:] = ["basic"]
+
+    monkeypatch.setattr(api, "_update_entitlements", update_entitlements)
+    monkeypatch.setattr(
+        api, "_do_api_call_streamed", lambda url, service: iter(lineups.pop(0))
+    )
+    return api
+
+
+def test_entitlement_messages():
+    assert _is_entitlement_message({"type": "entitlementsChanged"})
+    assert _is_entitlement_message({"eventType": "ENTITLEMENT_UPDATE"})
+    assert _is_entitlement_message({})
+    assert not _is_entitlement_message({"type": "vodPurchase"})
+
+
+def test_refresh_reports_updated_channels(monkeypatch):
+    api = _api(
+        monkeypatch,
+        [
+            [_channel("NL_1", "One"), _channel("NL_2", "Two")],
+            [_channel("NL_1", "One HD"), _channel("NL_2", "Two"), _channel("NL_3", "Three")],
+        ],
+    )
+    api._get_channels()
+    channels = api._channels
+    changes = []
+    api.set_channels_callback(lambda *args: changes.append(args))
+    api.refresh_channels()
+    assert changes == [(["NL_3"], [], ["NL_1"])]
+    assert api._channels is channels
+    assert channels["NL_1"].title == "One HD"
+
+
+def test_purchase_messages_are_debounced_off_the_mqtt_thread(monkeypatch):
+    monkeypatch.setattr(lghorizon_api, "CHANNEL_REFRESH_DELAY", 0.05)
+    api = LGHorizonApi("user", "secret", "nl")
+    refreshed = threading.Event()
+    threads = []
+
+    def refresh_channels():
+        threads.append(threading.current_thread())
+        refreshed.set()
+
+    monkeypatch.setattr(api, "refresh_channels", refresh_channels)
+    for _ in range(5):
+        api._handle_mqtt_message({"type": "entitlementsChanged"}, "household/purchaseService")
+    api._handle_mqtt_message({"type": "vodPurchase"}, "household/purchaseService")
+    assert not threads
+    assert refreshed.wait(2)
+    assert threads[0] is not threading.current_thread()
+    refreshed.clear()
+    assert not refreshed.wait(0.2)
+    assert len(threads) == 1
+
+
+def test_disconnect_cancels_the_pending_refresh(monkeypatch):
+    api = LGHorizonApi("user", "secret", "nl")
+    monkeypatch.setattr(api, "refresh_channels", lambda: None)
+    api._handle_mqtt_message({}, "household/purchaseService")
+    timer = api._channel_refresh_timer
+    api.disconnect()
+    assert api._channel_refresh_timer is None
+    assert not timer.is_alive() or timer.finished.is_set()
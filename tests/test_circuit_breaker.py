@@ -0,0 +1,65 @@
+"""Tests for the per-service circuit breaker."""
+
+import pytest
+
+from lghorizon import circuit_breaker as circuit_breaker_module
+from lghorizon.circuit_breaker import LGHorizonCircuitBreaker
+from lghorizon.const import CIRCUIT_CLOSED, CIRCUIT_HALF_OPEN, CIRCUIT_OPEN
+
+
+@pytest.fixture
+def now(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(circuit_breaker_module.time, "monotonic", lambda: now[0])
+    return now
+
+
+def _open_breaker() -> LGHorizonCircuitBreaker:
+    breaker = LGHorizonCircuitBreaker("test", failure_threshold=2, recovery_timeout=30)
+    breaker.record_failure()
+    breaker.record_failure()
+    return breaker
+
+
+def test_opens_after_consecutive_failures(now):
+    breaker = LGHorizonCircuitBreaker("test", failure_threshold=3)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CIRCUIT_CLOSED
+    breaker.record_failure()
+    assert breaker.state == CIRCUIT_OPEN
+    assert not breaker.allow_request()
+
+
+def test_half_open_lets_one_probe_through(now):
+    breaker = _open_breaker()
+    now[0] += 31
+    assert breaker.allow_request()
+    assert breaker.state == CIRCUIT_HALF_OPEN
+    assert not breaker.allow_request()
+    breaker.record_success()
+    assert breaker.state == CIRCUIT_CLOSED
+    assert breaker.allow_request()
+
+
+def test_failed_probe_opens_again(now):
+    breaker = _open_breaker()
+    now[0] += 31
+    assert breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == CIRCUIT_OPEN
+    assert not breaker.allow_request()
+    now[0] += 31
+    assert breaker.allow_request()
+
+
+def test_released_probe_can_be_taken_again(now):
+    breaker = _open_breaker()
+    now[0] += 31
+    assert breaker.allow_request()
+    breaker.release_probe()
+    assert breaker.state == CIRCUIT_HALF_OPEN
+    assert breaker.allow_request()
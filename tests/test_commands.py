@@ -0,0 +1,86 @@
+"""Tests for correlating box commands with their replies."""
+
+import threading
+from concurrent.futures import Future
+
+import pytest
+
+from lghorizon.commands import LGHorizonCommandTracker, gather_group_results
+from lghorizon.const import COMMAND_ACKNOWLEDGED, COMMAND_SKIPPED, COMMAND_TIMEOUT
+from lghorizon.exceptions import LGHorizonCommandTimeoutError
+
+
+def test_reply_resolves_command_by_id():
+    tracker = LGHorizonCommandTracker()
+    first = tracker.track("id1", "box1", "CPE.pushToTV")
+    second = tracker.track("id2", "box1", "CPE.pushToTV")
+    assert tracker.resolve({"id": "id2", "source": "box1"})
+    assert second.result(0) == {"id": "id2", "source": "box1"}
+    assert not first.done()
+    assert tracker.pending_count == 1
+    assert tracker.latency("box1").count == 1
+
+
+def test_reply_without_id_only_resolves_matching_command_types():
+    tracker = LGHorizonCommandTracker()
+    push = tracker.track("id1", "box1", "CPE.pushToTV")
+    state = tracker.track("id2", "box1", "CPE.getUiStatus")
+    assert tracker.resolve({"source": "box1", "status": {}})
+    assert state.done()
+    assert not push.done()
+    assert not tracker.resolve({"source": "box1", "status": {}})
+
+
+def test_reply_with_unknown_id_resolves_nothing():
+    tracker = LGHorizonCommandTracker()
+    state = tracker.track("id1", "box1", "CPE.getUiStatus")
+    assert not tracker.resolve({"id": "other", "source": "box1"})
+    assert not state.done()
+
+
+def test_unanswered_command_times_out():
+    tracker = LGHorizonCommandTracker()
+    future = tracker.track("id1", "box1", "CPE.pushToTV", timeout=0.05)
+    with pytest.raises(LGHorizonCommandTimeoutError):
+        future.result(2)
+    assert tracker.pending_count == 0
+    assert not tracker.resolve({"id": "id1", "source": "box1"})
+
+
+def test_timeouts_do_not_start_a_thread_per_command():
+    tracker = LGHorizonCommandTracker()
+    tracker.track("warmup", "box1", "CPE.pushToTV", timeout=0.01)
+    threads = threading.active_count()
+    futures = [
+        tracker.track(f"id{n}", "box1", "CPE.pushToTV", timeout=0.2 - n * 0.001)
+        for n in range(100)
+    ]
+    assert threading.active_count() == threads
+    for future in futures:
+        with pytest.raises(LGHorizonCommandTimeoutError):
+            future.result(2)
+
+
+def test_fail_all():
+    tracker = LGHorizonCommandTracker()
+    future = tracker.track("id1", "box1", "CPE.pushToTV")
+    tracker.fail_all("disconnected")
+    with pytest.raises(LGHorizonCommandTimeoutError):
+        future.result(0)
+    assert tracker.pending_count == 0
+
+
+def test_gather_group_results():
+    tracker = LGHorizonCommandTracker()
+    acknowledged = tracker.track("id1", "box1", "CPE.pushToTV")
+    silent = Future()
+    tracker.resolve({"id": "id1", "source": "box1"})
+    result = gather_group_results(
+        {"box1": acknowledged, "box2": silent, "box3": None}, timeout=0.05
+    )
+    assert result.results == {
+        "box1": COMMAND_ACKNOWLEDGED,
+        "box2": COMMAND_TIMEOUT,
+        "box3": COMMAND_SKIPPED,
+    }
+    assert not result.succeeded
@@ -0,0 +1,116 @@
+"""Tests for the event subscriptions."""
+
+import asyncio
+
+from lghorizon.const import EVENT_OVERFLOW_DROP_OLDEST, EVENT_OVERFLOW_MERGE
+from lghorizon.events import (
+    LGHorizonCapacityChangedEvent,
+    LGHorizonEventHub,
+    LGHorizonStateChangedEvent,
+)
+
+
+def _drain(subscription):
+    events = []
+    while True:
+        event = subscription.get(timeout=0)
+        if event is None:
+            return events
+        events.append(event)
+
+
+def test_drop_oldest_keeps_the_newest_events():
+    hub = LGHorizonEventHub()
+    subscription = hub.subscribe(maxsize=2, overflow=EVENT_OVERFLOW_DROP_OLDEST)
+    for state in ("ONLINE_RUNNING", "ONLINE_STANDBY", "OFFLINE"):
+        hub.publish(LGHorizonStateChangedEvent("box1", state))
+    assert [event.state for event in _drain(subscription)] == [
+        "ONLINE_STANDBY",
+        "OFFLINE",
+    ]
+    assert subscription.dropped == 1
+
+
+def test_merge_replaces_queued_events_of_the_same_box():
+    hub = LGHorizonEventHub()
+    subscription = hub.subscribe(maxsize=2, overflow=EVENT_OVERFLOW_MERGE)
+    hub.publish(LGHorizonStateChangedEvent("box1", "ONLINE_RUNNING"))
+    hub.publish(LGHorizonStateChangedEvent("box2", "ONLINE_RUNNING"))
+    hub.publish(LGHorizonStateChangedEvent("box1", "OFFLINE"))
+    events = _drain(subscription)
+    assert [(event.device_id, event.state) for event in events] == [
+        ("box1", "OFFLINE"),
+        ("box2", "ONLINE_RUNNING"),
+    ]
+    assert subscription.dropped == 0
+    hub.publish(LGHorizonStateChangedEvent("box1", "OFFLINE"))
+    hub.publish(LGHorizonStateChangedEvent("box2", "OFFLINE"))
+    hub.publish(LGHorizonCapacityChangedEvent("box1", 10))
+    assert subscription.dropped == 1
+    assert len(_drain(subscription)) == 2
+
+
+def test_event_types_filter():
+    hub = LGHorizonEventHub()
+    subscription = hub.subscribe([LGHorizonCapacityChangedEvent])
+    hub.publish(LGHorizonStateChangedEvent("box1", "OFFLINE"))
+    hub.publish(LGHorizonCapacityChangedEvent(None, 5))
+    assert [event.recording_capacity for event in _drain(subscription)] == [5]
+
+
+def test_close_ends_iteration_after_queued_events():
+    hub = LGHorizonEventHub()
+    subscription = hub.subscribe()
+    hub.publish(LGHorizonStateChangedEvent("box1", "OFFLINE"))
+    subscription.close()
+    hub.publish(LGHorizonStateChangedEvent("box2", "OFFLINE"))
+    assert [event.device_id for event in subscription] == ["box1"]
+    assert list(subscription) == []
+
+
+def test_async_iteration():
+    hub = LGHorizonEventHub()
+    subscription = hub.subscribe()
+
+    async def consume():
+        loop = asyncio.get_running_loop()
+        loop.call_later(0.01, hub.publish, LGHorizonStateChangedEvent("box1", "OFFLINE"))
+        loop.call_later(0.02, subscription.close)
+        return [event async for event in subscription]
+
+    events = asyncio.run(consume())
+    assert [event.device_id for event in events] == ["box1"]
+
+
+def test_publish_survives_a_closed_consumer_loop():
+    hub = LGHorizonEventHub()
+    subscription = hub.subscribe()
+    loop = asyncio.new_event_loop()
+    task = loop.create_task(subscription.__anext__())
+    loop.run_until_complete(asyncio.sleep(0))
+    loop.close()
+    hub.publish(LGHorizonStateChangedEvent("box1", "OFFLINE"))
+    assert not subscription._async_waiters
+    assert subscription.get(timeout=0).device_id == "box1"
+    assert not task.done()
+
+
+def test_cancelled_reads_do_not_keep_their_waiters():
+    hub = LGHorizonEventHub()
+    subscription = hub.subscribe()
+
+    async def cancel_reads():
+        for _ in range(3):
+            task = asyncio.ensure_future(subscription.__anext__())
+            await asyncio.sleep(0)
+            task.cancel()
+            await asyncio.sleep(0)
+        task = asyncio.ensure_future(subscription.__anext__())
+        await asyncio.sleep(0)
+        waiters = len(subscription._async_waiters)
+        hub.publish(LGHorizonStateChangedEvent("box1", "OFFLINE"))
+        return waiters, await task
+
+    waiters, event = asyncio.run(cancel_reads())
+    assert waiters == 1
+    assert event.device_id == "box1"
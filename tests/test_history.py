@@ -0,0 +1,67 @@
+"""Tests for the viewing history ring buffer."""
+
+from datetime import datetime
+
+from lghorizon.history import LGHorizonViewingHistory
+from lghorizon.models import LGHorizonPlayingInfo
+
+
+def _playing(channel_id, title, paused=False):
+    return LGHorizonPlayingInfo(
+        source_type="linear", channel_id=channel_id, title=title, paused=paused
+    )
+
+
+def test_sessions_start_on_changes_and_close_on_standby():
+    history = LGHorizonViewingHistory()
+    history.record(_playing("NL_1", "Journaal"), now=100.0)
+    history.record(_playing("NL_1", "Journaal"), now=150.0)
+    history.record(_playing("NL_2", "Sport"), now=200.0)
+    history.record(LGHorizonPlayingInfo(), now=260.0)
+    sessions = history.sessions()
+    assert [(session.channel_id, session.watched) for session in sessions] == [
+        ("NL_2", 60.0),
+        ("NL_1", 100.0),
+    ]
+    assert all(session.end for session in sessions)
+
+
+def test_paused_time_is_subtracted():
+    history = LGHorizonViewingHistory()
+    history.record(_playing("NL_1", "Film"), now=0.0)
+    history.record(_playing("NL_1", "Film", paused=True), now=10.0)
+    history.record(_playing("NL_1", "Film"), now=40.0)
+    history.record(LGHorizonPlayingInfo(), now=100.0)
+    session = history.sessions()[0]
+    assert session.paused == 30.0
+    assert session.watched == 70.0
+
+
+def test_ring_buffer_overwrites_the_oldest_sessions():
+    history = LGHorizonViewingHistory(size=3)
+    for number in range(5):
+        history.record(_playing(f"NL_{number}", f"Show {number}"), now=number * 10.0)
+    assert len(history) == 3
+    assert [session.channel_id for session in history.sessions()] == ["NL_4", "NL_3", "NL_2"]
+    # The strings of overwritten sessions are released
+    assert len(history._strings) == 1 + 3 * 2
+
+
+def test_watch_time_by_channel_clips_to_the_period():
+    history = LGHorizonViewingHistory()
+    history.record(_playing("NL_1", "Journaal"), now=1000.0)
+    history.record(_playing("NL_2", "Sport"), now=1100.0)
+    history.record(_playing("NL_1", "Weer"), now=1200.0)
+    history.record(LGHorizonPlayingInfo(), now=1300.0)
+    totals = history.watch_time_by_channel(
+        since=datetime.fromtimestamp(1050.0), until=datetime.fromtimestamp(1250.0)
+    )
+    assert totals == {"NL_1": 100.0, "NL_2": 100.0}
+
+
+def test_clear():
+    history = LGHorizonViewingHistory()
+    history.record(_playing("NL_1", "Journaal"), now=0.0)
+    history.clear()
+    assert len(history) == 0
+    assert history.sessions() == []
@@ -0,0 +1,89 @@
+"""Tests for the artwork disk cache."""
+
+import io
+import json
+import os
+
+from requests import Response
+from requests.adapters import BaseAdapter
+
+from lghorizon import image_cache as image_cache_module
+from lghorizon.image_cache import LGHorizonImageCache
+
+
+class _ImageAdapter(BaseAdapter):
+    """Serve 100 bytes for every url."""
+
+    def __init__(self):
+        super().__init__()
+        self.requests = 0
+
+    def send(self, request, **kwargs):
+        self.requests += 1
+        response = Response()
+        response.status_code = 200
+        response.request = request
+        response.url = request.url
+        response.headers["ETag"] = '"v1"'
+        response.raw = io.BytesIO(request.url.encode().ljust(100, b"."))
+        return response
+
+    def close(self):
+        pass
+
+
+def _cache(directory, **kwargs) -> LGHorizonImageCache:
+    cache = LGHorizonImageCache(str(directory), **kwargs)
+    cache.adapter = _ImageAdapter()
+    cache._session.mount("https://", cache.adapter)
+    return cache
+
+
+def _urls(count: int):
+    return [f"https://images.example.com/logo{n}.png" for n in range(count)]
+
+
+def test_prefetch_writes_the_index_once(tmp_path, monkeypatch):
+    cache = _cache(tmp_path)
+    writes = []
+    save_index = cache._save_index
+    monkeypatch.setattr(cache, "_save_index", lambda: (writes.append(1), save_index()))
+    cache.prefetch(_urls(50)).join()
+    assert len(writes) == 1
+    assert cache.stats()["images"] == 50
+
+
+def test_index_is_written_periodically(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(image_cache_module.time, "monotonic", lambda: now[0])
+    cache = _cache(tmp_path, flush_interval=30)
+    cache.get_path(_urls(1)[0])
+    assert not os.path.exists(tmp_path / "index.json")
+    now[0] += 31
+    cache.get_path(_urls(2)[1])
+    with open(tmp_path / "index.json", encoding="utf-8") as index_file:
+        assert len(json.load(index_file)) == 2
+
+
+def test_lru_order_survives_a_restart(tmp_path):
+    first, second, third = _urls(3)
+    cache = _cache(tmp_path, max_bytes=250)
+    cache.get_path(first)
+    cache.get_path(second)
+    # A hit makes the first image the most recently used
+    cache.get_path(first)
+    cache.flush()
+
+    cache = _cache(tmp_path, max_bytes=250)
+    cache.get_path(third)
+    assert list(cache._entries) == [first, third]
+    assert cache.adapter.requests == 1
+
+
+def test_get_bytes_fetches_an_image_evicted_while_reading(tmp_path):
+    url = _urls(1)[0]
+    cache = _cache(tmp_path)
+    path = cache.get_path(url)
+    os.remove(path)
+    assert cache.get_bytes(url).startswith(url.encode())
+    assert cache.adapter.requests == 2
@@ -0,0 +1,64 @@
+"""Tests for the incremental JSON array parser."""
+
+import json
+
+import pytest
+
+from lghorizon.exceptions import LGHorizonApiError
+from lghorizon.json_stream import iter_json_array
+
+
+def _chunks(text: str, size: int):
+    data = text.encode("utf-8")
+    return [data[start : start + size] for start in range(0, len(data), size)]
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64, 4096])
+def test_elements_split_over_chunks(size):
+    items = [
+        {"id": "crid:1", "title": "Journaal ñ €", "nested": {"list": [1, 2.5, None]}},
+        12345,
+        -0.5e3,
+        "plain",
+        True,
+        None,
+        [],
+    ]
+    text = json.dumps({"total": 7, "data": items, "after": {"x": 1}})
+    assert list(iter_json_array(_chunks(text, size), "data")) == items
+
+
+def test_top_level_array():
+    assert list(iter_json_array(_chunks(" [1, 22 , 333] ", 2))) == [1, 22, 333]
+
+
+def test_empty_array():
+    assert list(iter_json_array([b'{"data": []}'], "data")) == []
+
+
+def test_skips_values_before_the_key():
+    text = '{"meta": {"data": [9]}, "other": [1, 2], "data": ["a"]}'
+    assert list(iter_json_array(_chunks(text, 5), "data")) == ["a"]
+
+
+def test_missing_key_raises():
+    with pytest.raises(LGHorizonApiError):
+        list(iter_json_array([b'{"total": 0, "items": []}'], "data"))
+
+
+def test_object_without_key_argument_raises():
+    with pytest.raises(ValueError):
+        list(iter_json_array([b'{"data": []}']))
+
+
+def test_truncated_body_raises():
+    with pytest.raises(ValueError):
+        list(iter_json_array([b'{"data": [{"id": 1}, {"id"'], "data"))
+
+
+def test_elements_are_yielded_before_the_body_ends():
+    def chunks():
+        yield b'{"data": [{"id": 1},'
+        raise AssertionError("read past the first element")
+
+    assert next(iter_json_array(chunks(), "data")) == {"id": 1}
@@ -0,0 +1,92 @@
+"""Tests for sending key presses to a box."""
+
+import json
+
+import pytest
+
+from lghorizon import models
+from lghorizon.const import (
+    KEY_SEQUENCE_INTERVAL,
+    MEDIA_KEY_ARROW_DOWN,
+    MEDIA_KEY_ENTER,
+    MEDIA_KEY_GUIDE,
+)
+from lghorizon.models import LGHorizonAuth, LGHorizonBox, _encode_key_event
+
+
+class _MqttClient:
+    def __init__(self):
+        self.published = []
+
+    def publish_message(self, topic, payload, qos):
+        self.published.append((topic, payload, qos))
+        return len(self.published)
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(models.time, "sleep", sleeps.append)
+    return sleeps
+
+
+def _box():
+    auth = LGHorizonAuth()
+    auth.householdId = "household"
+    client = _MqttClient()
+    box_json = {
+        "deviceId": "box1",
+        "hashedCPEId": "hash",
+        "settings": {"deviceFriendlyName": "Tv"},
+    }
+    return LGHorizonBox(box_json, None, client, auth, {}), client
+
+
+def _keys(client):
+    return [json.loads(payload)["status"]["w3cKey"] for _, payload, _ in client.published]
+
+
+def test_key_counts_are_expanded(sleeps):
+    box, client = _box()
+    results = box.send_key_sequence([MEDIA_KEY_GUIDE, (MEDIA_KEY_ARROW_DOWN, 3)])
+    assert _keys(client) == [MEDIA_KEY_GUIDE] + [MEDIA_KEY_ARROW_DOWN] * 3
+    assert results == [1, 2, 3, 4]
+    assert {topic for topic, _, _ in client.published} == {"household/box1"}
+
+
+def test_qos_and_pacing(sleeps):
+    box, client = _box()
+    box.send_key_sequence(["1", "2", "3"], qos=0, interval=0.5)
+    assert [qos for _, _, qos in client.published] == [0, 0, 0]
+    # No wait before the first key
+    assert sleeps == [0.5, 0.5]
+    box.send_key_sequence(["1", "2"])
+    assert [qos for _, _, qos in client.published[3:]] == [1, 1]
+    assert sleeps[2:] == [KEY_SEQUENCE_INTERVAL]
+    box.send_key_sequence(["1", "2"], interval=0)
+    assert len(sleeps) == 3
+
+
+def test_enter_channel_number(sleeps):
+    box, client = _box()
+    box.enter_channel_number(401, qos=2)
+    assert _keys(client) == ["4", "0", "1", MEDIA_KEY_ENTER]
+    assert [qos for _, _, qos in client.published] == [2, 2, 2, 2]
+
+
+@pytest.mark.parametrize("channel_number", ["", "12a", "-1", "1.5"])
+def test_invalid_channel_numbers(channel_number, sleeps):
+    box, client = _box()
+    with pytest.raises(ValueError):
+        box.enter_channel_number(channel_number)
+    assert client.published == []
+
+
+def test_key_payloads_are_cached_bytes():
+    payload = _encode_key_event(MEDIA_KEY_ENTER)
+    assert isinstance(payload, bytes)
+    assert _encode_key_event(MEDIA_KEY_ENTER) is payload
+    assert json.loads(payload) == {
+        "type": "CPE.KeyEvent",
+        "status": {"w3cKey": MEDIA_KEY_ENTER, "eventType": "keyDownUp"},
+    }
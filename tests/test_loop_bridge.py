@@ -0,0 +1,127 @@
+"""Tests for delivering box callbacks on an asyncio event loop."""
+
+import asyncio
+import threading
+
+from lghorizon.lghorizon_api import LGHorizonApi
+from lghorizon.loop_bridge import LGHorizonLoopBridge
+from lghorizon.models import LGHorizonBox
+
+
+def _run_once(loop):
+    loop.run_until_complete(asyncio.sleep(0))
+
+
+def test_callbacks_run_on_the_loop_thread():
+    loop = asyncio.new_event_loop()
+    loop_thread = threading.Thread(target=loop.run_forever, daemon=True)
+    loop_thread.start()
+    bridge = LGHorizonLoopBridge(loop)
+    delivered = threading.Event()
+    threads = []
+
+    def callback(device_id):
+        threads.append((threading.current_thread(), device_id))
+        delivered.set()
+
+    bridge.dispatch(callback, "box1")
+    assert delivered.wait(5)
+    assert threads == [(loop_thread, "box1")]
+    loop.call_soon_threadsafe(loop.stop)
+    loop_thread.join(5)
+    loop.close()
+
+
+def test_one_wakeup_per_batch_and_coalescing():
+    loop = asyncio.new_event_loop()
+    batches = []
+    bridge = LGHorizonLoopBridge(loop, batches.append)
+    calls = []
+
+    def first(device_id):
+        calls.append(("first", device_id))
+
+    def second(device_id):
+        calls.append(("second", device_id))
+
+    bridge.dispatch(first, "box1")
+    bridge.dispatch(first, "box2")
+    bridge.dispatch(first, "box1")
+    bridge.dispatch(second, "box1")
+    _run_once(loop)
+    assert calls == [("first", "box1"), ("first", "box2"), ("second", "box1")]
+    assert batches == [["box1", "box2"]]
+    assert bridge.stats() == {"wakeups": 1, "delivered": 3, "coalesced": 1}
+    bridge.dispatch(first, "box1")
+    _run_once(loop)
+    assert bridge.wakeups == 2
+    assert batches[-1] == ["box1"]
+    loop.close()
+
+
+def test_failing_callback_does_not_stop_the_batch():
+    loop = asyncio.new_event_loop()
+    bridge = LGHorizonLoopBridge(loop)
+    calls = []
+
+    def failing(device_id):
+        raise RuntimeError("callback failed")
+
+    bridge.dispatch(failing, "box1")
+    bridge.dispatch(calls.append, "box2")
+    _run_once(loop)
+    assert calls == ["box2"]
+    loop.close()
+
+
+def test_closed_loop_drops_callbacks():
+    loop = asyncio.new_event_loop()
+    loop.close()
+    bridge = LGHorizonLoopBridge(loop)
+    calls = []
+    bridge.dispatch(calls.append, "box1")
+    bridge.dispatch(calls.append, "box1")
+    assert calls == []
+    assert bridge.wakeups == 2
+    assert bridge.coalesced == 0
+
+
+def _device(device_id):
+    return {
+        "deviceId": device_id,
+        "hashedCPEId": "hash",
+        "platformType": "EOS",
+        "settings": {"deviceFriendlyName": device_id},
+    }
+
+
+def _state_file(tmp_path) -> str:
+    api = LGHorizonApi("user", "secret", "nl")
+    api._config = {}
+    box = LGHorizonBox(_device("restored"), None, None, api._auth, api._channels)
+    api.settop_boxes["restored"] = box
+    file_path = str(tmp_path / "state.json.gz")
+    api.save_state(file_path)
+    return file_path
+
+
+def test_boxes_added_after_bind_loop_use_the_bridge(tmp_path):
+    loop = asyncio.new_event_loop()
+    api = LGHorizonApi("user", "secret", "nl")
+    bound = LGHorizonBox(_device("bound"), None, None, api._auth, api._channels)
+    api._attach_box(bound)
+    api.settop_boxes["bound"] = bound
+    bridge = api.bind_loop(loop)
+    assert api.restore_state(_state_file(tmp_path))
+    api._country_settings = {}
+    api._register_boxes({"assignedDevices": [_device("registered")]})
+    calls = []
+    for device_id in ("bound", "registered", "restored"):
+        box = api.settop_boxes[device_id]
+        box.set_callback(calls.append)
+        box._trigger_callback()
+    assert calls == []
+    _run_once(loop)
+    assert calls == ["bound", "registered", "restored"]
+    assert bridge.delivered == 3
+    loop.close()
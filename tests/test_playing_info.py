@@ -0,0 +1,33 @@
+"""Tests for the immutable playing info snapshots."""
+
+from datetime import datetime
+
+import pytest
+
+from lghorizon.models import LGHorizonPlayingInfo
+
+
+def test_playing_info_is_immutable():
+    playing_info = LGHorizonPlayingInfo(channel_id="NL_1", title="Journaal")
+    with pytest.raises(AttributeError):
+        playing_info.title = "Sport"
+    changed = playing_info.replace(title="Sport", paused=True)
+    assert playing_info.title == "Journaal"
+    assert (changed.channel_id, changed.title, changed.paused) == ("NL_1", "Sport", True)
+
+
+def test_unknown_fields_are_rejected():
+    with pytest.raises(TypeError):
+        LGHorizonPlayingInfo(channel="NL_1")
+
+
+def test_json_roundtrip():
+    playing_info = LGHorizonPlayingInfo(
+        channel_id="NL_1",
+        title="Journaal",
+        source_type="linear",
+        duration=1800.0,
+        position=60.0,
+        last_position_update=datetime.fromtimestamp(1700000000),
+    )
+    assert LGHorizonPlayingInfo.from_json(playing_info.to_json()) == playing_info
@@ -0,0 +1,90 @@
+"""Tests for the HTTP polling fallback."""
+
+from lghorizon.events import (
+    LGHorizonCapacityChangedEvent,
+    LGHorizonEventHub,
+    LGHorizonRecordingChangedEvent,
+)
+from lghorizon.models import LGHorizonAuth
+from lghorizon.polling import LGHorizonPoller
+
+
+class _Recording:
+    def __init__(self, id):
+        self.id = id
+
+
+class _FakeApi:
+    def __init__(self):
+        self._events = LGHorizonEventHub()
+        self._auth = LGHorizonAuth()
+        self._auth.householdId = "household"
+        self._mqttClient = None
+        self.settop_boxes = {}
+        self.devices = [{"deviceId": "box1", "settings": {"deviceFriendlyName": "Living"}}]
+        self.recordings = ["rec1"]
+        self.recording_capacity = 10
+        self.registered = []
+
+    def _get_personalisation(self):
+        return {"assignedDevices": list(self.devices)}
+
+    def _register_boxes(self, personalisation_result):
+        self.registered.append(personalisation_result)
+
+    def _register_customer_and_boxes(self):
+        raise AssertionError("the channel lineup must not be refreshed")
+
+    def get_recordings(self):
+        return [_Recording(id) for id in self.recordings]
+
+    def get_recording_capacity(self):
+        return self.recording_capacity
+
+
+def test_first_poll_only_records_the_state():
+    api = _FakeApi()
+    poller = LGHorizonPoller(api)
+    assert not poller.poll()
+    assert not api.registered
+
+
+def test_new_device_registers_boxes_only():
+    api = _FakeApi()
+    poller = LGHorizonPoller(api)
+    poller.poll()
+    api.devices.append({"deviceId": "box2", "settings": {"deviceFriendlyName": "Bed"}})
+    assert poller.poll()
+    assert len(api.registered) == 1
+    assert len(api.registered[0]["assignedDevices"]) == 2
+
+
+def test_changes_are_published():
+    api = _FakeApi()
+    subscription = api._events.subscribe()
+    poller = LGHorizonPoller(api)
+    poller.poll()
+    api.recordings.append("rec2")
+    api.recording_capacity = 12
+    assert poller.poll()
+    events = [subscription.get(0), subscription.get(0)]
+    assert isinstance(events[0], LGHorizonRecordingChangedEvent)
+    assert isinstance(events[1], LGHorizonCapacityChangedEvent)
+    assert events[1].device_id is None
+    assert events[1].recording_capacity == 12
+    assert poller.changes == 1
+
+
+def test_unchanged_poll_backs_off():
+    api = _FakeApi()
+    poller = LGHorizonPoller(api, min_interval=0.01, max_interval=0.04)
+    poller.start()
+    try:
+        for _ in range(100):
+            if poller.interval == 0.04:
+                break
+            poller._stop.wait(0.01)
+    finally:
+        poller.stop()
+    assert poller.mode == "poll"
+    assert poller.interval == 0.04
@@ -0,0 +1,121 @@
+"""Tests for the household token bucket and the retry budget."""
+
+import pytest
+
+from lghorizon import rate_limit
+from lghorizon.exceptions import LGHorizonApiRateLimitedError
+from lghorizon.rate_limit import (
+    LGHorizonRetryBudget,
+    LGHorizonTokenBucket,
+    api_call_giveup,
+    non_blocking_throttle,
+    parse_retry_after,
+    throttle_may_block,
+)
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(rate_limit.time, "monotonic", clock.monotonic)
+    monkeypatch.setattr(rate_limit.time, "sleep", clock.sleep)
+    return clock
+
+
+def test_bucket_allows_a_burst_then_paces(clock):
+    bucket = LGHorizonTokenBucket(rate=2.0, capacity=3)
+    assert [bucket.acquire() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.acquire() == pytest.approx(0.5)
+    assert clock.slept == [pytest.approx(0.5)]
+
+
+def test_bucket_refills_over_time(clock):
+    bucket = LGHorizonTokenBucket(rate=1.0, capacity=2)
+    bucket.acquire()
+    bucket.acquire()
+    clock.now += 10
+    assert bucket.acquire() == 0.0
+    assert bucket.acquire() == 0.0
+    assert bucket.acquire() == pytest.approx(1.0)
+
+
+def test_bucket_refuses_waits_over_max_wait(clock):
+    bucket = LGHorizonTokenBucket(rate=1.0, capacity=1)
+    bucket.acquire()
+    with pytest.raises(LGHorizonApiRateLimitedError):
+        bucket.acquire(max_wait=0)
+    assert clock.slept == []
+    # The refused call did not use up a token
+    assert bucket.acquire() == pytest.approx(1.0)
+
+
+def test_bucket_block_for(clock):
+    bucket = LGHorizonTokenBucket(rate=10.0, capacity=10)
+    bucket.block_for(5)
+    with pytest.raises(LGHorizonApiRateLimitedError):
+        bucket.acquire(max_wait=1)
+    clock.now += 5
+    assert bucket.acquire(max_wait=0) == 0.0
+
+
+def test_retry_budget_is_a_fraction_of_the_calls(clock):
+    budget = LGHorizonRetryBudget(ratio=0.5, min_per_second=0.0, max_balance=1.0)
+    assert budget.can_retry()
+    budget.record_retry()
+    assert not budget.can_retry()
+    budget.record_request()
+    assert not budget.can_retry()
+    budget.record_request()
+    assert budget.can_retry()
+
+
+def test_retry_budget_refills_slowly_when_quiet(clock):
+    budget = LGHorizonRetryBudget(ratio=0.0, min_per_second=1.0, max_balance=2.0)
+    budget.record_retry()
+    budget.record_retry()
+    assert not budget.can_retry()
+    clock.now += 1
+    assert budget.can_retry()
+    clock.now += 100
+    assert budget.balance == 2.0
+
+
+def test_non_blocking_throttle_is_per_thread_and_nests():
+    assert throttle_may_block()
+    with non_blocking_throttle():
+        assert not throttle_may_block()
+        with non_blocking_throttle():
+            assert not throttle_may_block()
+        assert not throttle_may_block()
+    assert throttle_may_block()
+
+
+def test_rate_limited_calls_are_not_retried_without_blocking():
+    error = LGHorizonApiRateLimitedError("limited")
+    assert not api_call_giveup(error)
+    with non_blocking_throttle():
+        assert api_call_giveup(error)
+
+
+@pytest.mark.parametrize(
+    "value, expected", [(None, None), ("", None), ("12", 12.0), ("-3", 0.0), ("soon", None)]
+)
+def test_parse_retry_after(value, expected):
+    assert parse_retry_after(value) == expected
+
+
+def test_parse_retry_after_http_date():
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
@@ -0,0 +1,57 @@
+"""Tests for the recordings search index."""
+
+from lghorizon.search import LGHorizonRecordingIndex
+
+
+class _Recording:
+    def __init__(self, id, title, season=None, episode=None, channel="NL_1"):
+        self.id = id
+        self.title = title
+        self.seasonNumber = season
+        self.episodeNumber = episode
+        self.channelId = channel
+
+
+def test_prefix_and_accent_insensitive_search():
+    index = LGHorizonRecordingIndex(
+        [_Recording("1", "Journaal"), _Recording("2", "Café Männer")]
+    )
+    assert [result.recording_id for result in index.search("jour")] == ["1"]
+    assert [result.recording_id for result in index.search("cafe manner")] == ["2"]
+    assert index.search("nothing") == []
+
+
+def test_season_and_episode_filters():
+    index = LGHorizonRecordingIndex(
+        [
+            _Recording("1", "Show", 1, 1),
+            _Recording("2", "Show", 2, 3),
+            _Recording("3", "Show", 2, 4),
+        ]
+    )
+    assert [result.recording_id for result in index.search("show s2e3")] == ["2"]
+    assert {result.recording_id for result in index.search("show season 2")} == {"2", "3"}
+    assert index.latest("show").recording_id == "3"
+
+
+def test_sync_skips_unchanged_recordings(monkeypatch):
+    index = LGHorizonRecordingIndex([_Recording("1", "Journaal"), _Recording("2", "Nieuws")])
+    added = []
+    original_add = index.add
+    monkeypatch.setattr(
+        index, "add", lambda recording: (added.append(recording.id), original_add(recording))
+    )
+    fresh = [_Recording("1", "Journaal"), _Recording("2", "Nieuwsuur"), _Recording("3", "Sport")]
+    assert index.sync(fresh) == (1, 0)
+    assert sorted(added) == ["2", "3"]
+    # The latest model is returned even when it was not indexed again
+    assert index.search("journaal")[0].recording is fresh[0]
+    assert [result.recording_id for result in index.search("nieuwsuur")] == ["2"]
+
+
+def test_sync_removes_recordings():
+    index = LGHorizonRecordingIndex([_Recording("1", "Journaal"), _Recording("2", "Nieuws")])
+    assert index.sync([_Recording("2", "Nieuws")]) == (0, 1)
+    assert len(index) == 1
+    assert index.search("journaal") == []
+    assert not index._tokens.count("journaal")
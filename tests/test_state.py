@@ -0,0 +1,88 @@
+"""Tests for saving and restoring the client state."""
+
+import os
+import stat
+
+import pytest
+
+from lghorizon.exceptions import LGHorizonApiConnectionError
+from lghorizon.lghorizon_api import LGHorizonApi
+from lghorizon.models import LGHorizonBox
+
+_box_json = {
+    "deviceId": "3C36E4-EOSSTB-003656579806",
+    "hashedCPEId": "hash",
+    "settings": {"deviceFriendlyName": "Woonkamer"},
+    "platformType": {"manufacturer": "Arris", "model": "DCX960"},
+}
+
+
+def _saved_state(tmp_path) -> str:
+    api = LGHorizonApi("user", "secret", "nl")
+    api._config = {"mqttBroker": {"URL": "wss://example.com/mqtt"}}
+    api._auth.fill(
+        {
+            "householdId": "household",
+            "accessToken": "access",
+            "refreshToken": "refresh",
+            "username": "user",
+            "refreshTokenExpiry": None,
+        }
+    )
+    box = LGHorizonBox(_box_json, _box_json["platformType"], None, api._auth, {})
+    box.state = "ONLINE_RUNNING"
+    api.settop_boxes[box.deviceId] = box
+    file_path = str(tmp_path / "state.json.gz")
+    api.save_state(file_path)
+    return file_path
+
+
+def test_state_file_is_private(tmp_path):
+    file_path = _saved_state(tmp_path)
+    assert stat.S_IMODE(os.stat(file_path).st_mode) == 0o600
+    assert not os.path.exists(f"{file_path}.tmp")
+
+
+def test_restore_state(tmp_path):
+    api = LGHorizonApi("user", "secret", "nl")
+    assert api.restore_state(_saved_state(tmp_path))
+    assert api._auth.householdId == "household"
+    assert api._auth.refreshTokenExpiry is None
+    box = api.settop_boxes[_box_json["deviceId"]]
+    assert box.deviceFriendlyName == "Woonkamer"
+    assert box.state == "ONLINE_RUNNING"
+
+
+def test_restored_boxes_need_a_connection_for_commands(tmp_path):
+    api = LGHorizonApi("user", "secret", "nl")
+    api.restore_state(_saved_state(tmp_path))
+    box = api.settop_boxes[_box_json["deviceId"]]
+    with pytest.raises(LGHorizonApiConnectionError):
+        box.pause()
+    with pytest.raises(LGHorizonApiConnectionError):
+        box.set_channel("NPO 1")
+    api.disconnect()
+
+
+def test_restore_ignores_other_accounts(tmp_path):
+    api = LGHorizonApi("someone else", "secret", "nl")
+    assert not api.restore_state(_saved_state(tmp_path))
+    assert not api.restore_state(str(tmp_path / "missing.json.gz"))
+
+
+def test_restored_boxes_are_reconciled_on_the_first_live_status(tmp_path, monkeypatch):
+    api = LGHorizonApi("user", "secret", "nl")
+    api.restore_state(_saved_state(tmp_path))
+    box = api.settop_boxes[_box_json["deviceId"]]
+    requests = []
+    monkeypatch.setattr(box, "_request_settop_box_state", lambda: requests.append("state"))
+    monkeypatch.setattr(
+        box, "_request_settop_box_recording_capacity", lambda: requests.append("capacity")
+    )
+    events = []
+    box.set_event_sink(events.append)
+    box.update_state({"state": "ONLINE_RUNNING"})
+    assert requests == ["state", "capacity"]
+    assert events == []
+    box.update_state({"state": "ONLINE_RUNNING"})
+    assert requests == ["state", "capacity"]
@@ -0,0 +1,44 @@
+"""Tests for exporting the stats of a running client."""
+
+import json
+import sys
+import time
+
+from lghorizon.__main__ import main
+from lghorizon.lghorizon_api import LGHorizonApi
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_running_client_writes_its_stats(tmp_path):
+    file_path = str(tmp_path / "stats.json")
+    api = LGHorizonApi("user", "secret", "nl")
+    writer = api.start_stats_file(file_path, interval=0.05)
+    assert _wait_for(lambda: writer.writes >= 2)
+    api.disconnect()
+    writes = writer.writes
+    time.sleep(0.2)
+    assert writer.writes == writes
+    with open(file_path, "r", encoding="utf-8") as stats_file:
+        stats = json.load(stats_file)
+    assert stats["mqttConnected"] is False
+    assert "written" in stats
+    assert [path.name for path in tmp_path.iterdir()] == ["stats.json"]
+
+
+def test_cli_reads_the_stats_file(tmp_path, monkeypatch, capsys):
+    file_path = str(tmp_path / "stats.json")
+    api = LGHorizonApi("user", "secret", "nl")
+    api.start_stats_file(file_path, interval=60)
+    assert _wait_for(lambda: api._stats_writer.writes)
+    api.disconnect()
+    monkeypatch.setattr(sys, "argv", ["lghorizon", "stats", "--stats-file", file_path])
+    main()
+    result = json.loads(capsys.readouterr().out)
+    assert result["channels"] == 0
+    assert 0 <= result["age"] < 60
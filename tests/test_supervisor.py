@@ -0,0 +1,184 @@
+"""Tests for the supervisor, its workers and their shared token file."""
+
+import multiprocessing
+import os
+import queue
+import threading
+
+import pytest
+
+from lghorizon.supervisor import LGHorizonAccount, LGHorizonSupervisor, _worker_for, _worker_main
+from lghorizon.token_store import LGHorizonFileTokenStore
+
+
+class _FakeProcess:
+    def __init__(self, alive=True):
+        self.alive = alive
+        self.exitcode = None if alive else 1
+        self.joined = False
+
+    def is_alive(self):
+        return self.alive
+
+    def join(self, timeout=None):
+        self.joined = True
+        self.alive = False
+
+    def terminate(self):
+        self.alive = False
+
+
+def _supervisor(workers: int) -> LGHorizonSupervisor:
+    supervisor = LGHorizonSupervisor(workers)
+    for worker_id in range(workers):
+        supervisor._processes[worker_id] = _FakeProcess()
+        supervisor._command_queues[worker_id] = queue.Queue()
+    return supervisor
+
+
+def test_rendezvous_hashing_only_moves_accounts_to_a_new_worker():
+    keys = [f"nl:user{n}" for n in range(200)]
+    before = {key: _worker_for(key, 3) for key in keys}
+    after = {key: _worker_for(key, 4) for key in keys}
+    moved = [key for key in keys if before[key] != after[key]]
+    assert moved
+    assert all(after[key] == 3 for key in moved)
+
+
+def test_commands_of_a_removed_worker_fail(monkeypatch):
+    supervisor = _supervisor(2)
+    monkeypatch.setattr(supervisor, "_start_worker", lambda worker_id: None)
+    keys = {}
+    for n in range(20):
+        key = supervisor.add_account(LGHorizonAccount(f"user{n}", "secret"))
+        keys.setdefault(supervisor._assignment[key], key)
+    removed = supervisor._processes[1]
+    pending = supervisor.command(keys[1], "box", "pause")
+    kept = supervisor.command(keys[0], "box", "pause")
+    supervisor.resize(1)
+    assert removed.joined
+    assert 1 not in supervisor._processes
+    with pytest.raises(RuntimeError):
+        pending.result(0)
+    assert not kept.done()
+
+
+def test_commands_of_a_crashed_worker_fail(monkeypatch):
+    supervisor = _supervisor(1)
+    monkeypatch.setattr(supervisor, "_start_worker", lambda worker_id: None)
+    key = supervisor.add_account(LGHorizonAccount("user", "secret"))
+    pending = supervisor.command(key, "box", "pause")
+    supervisor._fail_requests(0, "Worker 0 exited with 1")
+    with pytest.raises(RuntimeError):
+        pending.result(0)
+    assert not supervisor._requests
+
+
+def test_unsupported_command():
+    supervisor = _supervisor(1)
+    with pytest.raises(ValueError):
+        supervisor.command("nl:user", "box", "_request_settop_box_state")
+
+
+def test_worker_blocks_on_commands_until_stopped():
+    commands = queue.Queue()
+    results = queue.Queue()
+    worker = threading.Thread(target=_worker_main, args=(0, commands, results, None))
+    worker.start()
+    commands.put(("command", 7, "nl:unknown", "box", "pause", ()))
+    assert results.get(timeout=5) == ("reply", 7, False, "'nl:unknown'")
+    commands.put(("stop",))
+    worker.join(5)
+    assert not worker.is_alive()
+
+
+class _SlowBox:
+    def __init__(self, release):
+        self.release = release
+
+    def to_json(self):
+        return {"deviceId": "box"}
+
+    def send_key_sequence(self, keys):
+        self.release.wait(5)
+
+    def pause(self):
+        return None
+
+
+class _FakeApi:
+    release = threading.Event()
+
+    def __init__(self, username, *args, **kwargs):
+        self.settop_boxes = {"box": _SlowBox(self.release)}
+
+    def connect(self):
+        pass
+
+    def subscribe(self, **kwargs):
+        return _FakeSubscription()
+
+    def disconnect(self):
+        pass
+
+
+class _FakeSubscription:
+    def get(self, timeout=None):
+        return None
+
+    def close(self):
+        pass
+
+
+def _next_reply(results):
+    while True:
+        message = results.get(timeout=5)
+        if message[0] == "reply":
+            return message
+
+
+def test_slow_commands_do_not_block_other_accounts(monkeypatch):
+    monkeypatch.setattr("lghorizon.lghorizon_api.LGHorizonApi", _FakeApi)
+    commands = queue.Queue()
+    results = queue.Queue()
+    worker = threading.Thread(target=_worker_main, args=(0, commands, results, None))
+    worker.start()
+    slow, other = LGHorizonAccount("slow", "secret"), LGHorizonAccount("other", "secret")
+    commands.put(("add", slow))
+    commands.put(("add", other))
+    commands.put(("command", 1, slow.key, "box", "send_key_sequence", (["1", "2"],)))
+    commands.put(("command", 2, other.key, "box", "pause", ()))
+    assert _next_reply(results) == ("reply", 2, True, "published")
+    _FakeApi.release.set()
+    assert _next_reply(results) == ("reply", 1, True, "published")
+    commands.put(("stop",))
+    worker.join(5)
+    assert not worker.is_alive()
+
+
+def _save_tokens(file_path: str, worker_id: int, count: int) -> None:
+    store = LGHorizonFileTokenStore(file_path)
+    for n in range(count):
+        store.save(f"nl:user{worker_id}", {"refreshToken": f"{worker_id}-{n}"})
+
+
+def test_workers_share_the_token_file(tmp_path):
+    try:
+        context = multiprocessing.get_context("fork")
+    except ValueError:
+        pytest.skip("needs fork")
+    file_path = str(tmp_path / "tokens.json")
+    processes = [
+        context.Process(target=_save_tokens, args=(file_path, worker_id, 50))
+        for worker_id in range(4)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(30)
+    assert [process.exitcode for process in processes] == [0, 0, 0, 0]
+    store = LGHorizonFileTokenStore(file_path)
+    for worker_id in range(4):
+        assert store.load(f"nl:user{worker_id}") == {"refreshToken": f"{worker_id}-49"}
+    assert os.stat(file_path).st_mode & 0o777 == 0o600
+    assert sorted(os.listdir(tmp_path)) == ["tokens.json", "tokens.json.lock"]
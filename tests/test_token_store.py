@@ -0,0 +1,33 @@
+"""Tests for the token stores."""
+
+import pytest
+
+from lghorizon.token_store import (
+    LGHorizonFileTokenStore,
+    LGHorizonMemoryTokenStore,
+    LGHorizonTokenStore,
+)
+
+
+def test_incomplete_store_fails_on_creation():
+    class _LoadOnlyStore(LGHorizonTokenStore):
+        def load(self, key):
+            return None
+
+    with pytest.raises(TypeError):
+        _LoadOnlyStore()
+
+
+@pytest.mark.parametrize("kind", ["memory", "file"])
+def test_save_load_delete(kind, tmp_path):
+    if kind == "memory":
+        store = LGHorizonMemoryTokenStore()
+    else:
+        store = LGHorizonFileTokenStore(str(tmp_path / "tokens.json"))
+    assert store.load("nl:user") is None
+    store.save("nl:user", {"refreshToken": "refresh"})
+    store.save("be:other", {"refreshToken": "other"})
+    assert store.load("nl:user") == {"refreshToken": "refresh"}
+    store.delete("nl:user")
+    assert store.load("nl:user") is None
+    assert store.load("be:other") == {"refreshToken": "other"}
@@ -0,0 +1,77 @@
+"""Tests for recording and replaying the HTTP traffic."""
+
+import gzip
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+from requests.exceptions import ConnectionError as RequestsConnectionError
+
+from lghorizon.json_stream import iter_json_array
+from lghorizon.transport import LGHorizonTransportConfig, _get_recorder
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.startswith("/customer"):
+            body = {"customerId": "1234", "accessToken": "secret-token"}
+        elif self.path.startswith("/recordings"):
+            body = {"total": 3, "data": [{"id": n} for n in range(3)]}
+        else:
+            self.send_error(404)
+            return
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = HTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_record_replay_roundtrip(server, tmp_path):
+    record_file = str(tmp_path / "http.jsonl.gz")
+    session = LGHorizonTransportConfig(record_file=record_file).create_session()
+    recorded = session.get(f"{server}/customer?token=abc&lang=nl").json()
+    with session.get(f"{server}/recordings", stream=True) as response:
+        recorded_items = list(iter_json_array(response.iter_content(4), "data"))
+    _get_recorder(record_file).close()
+
+    with gzip.open(record_file, "rt", encoding="utf-8") as recording:
+        text = recording.read()
+    assert "secret-token" not in text
+    assert "abc" not in text
+
+    session = LGHorizonTransportConfig(replay_file=record_file).create_session()
+    response = session.get(f"{server}/customer?token=xyz&lang=nl")
+    assert response.json() == {"customerId": "1234", "accessToken": "SCRUBBED"}
+    assert recorded["accessToken"] == "secret-token"
+    response.close()
+    with session.get(f"{server}/recordings", stream=True) as response:
+        assert response.status_code == 200
+        items = list(iter_json_array(response.iter_content(4), "data"))
+    assert items == recorded_items == [{"id": 0}, {"id": 1}, {"id": 2}]
+
+
+def test_replay_without_recording_fails(server, tmp_path):
+    record_file = str(tmp_path / "http.jsonl.gz")
+    session = LGHorizonTransportConfig(record_file=record_file).create_session()
+    session.get(f"{server}/customer")
+    _get_recorder(record_file).close()
+
+    session = LGHorizonTransportConfig(replay_file=record_file).create_session()
+    with pytest.raises(RequestsConnectionError):
+        session.get(f"{server}/recordings")
@@ -0,0 +1,130 @@
+"""Tests for the MQTT watchdog."""
+
+from concurrent.futures import Future
+
+from lghorizon.const import ONLINE_RUNNING, ONLINE_STANDBY
+from lghorizon.exceptions import LGHorizonCommandTimeoutError
+from lghorizon.watchdog import LGHorizonMqttWatchdog
+
+
+class _Box:
+    def __init__(self, device_id, state=ONLINE_RUNNING):
+        self.deviceId = device_id
+        self.state = state
+        self.probes = []
+
+    def _request_settop_box_state(self, timeout):
+        future = Future()
+        self.probes.append(future)
+        return future
+
+
+class _Client:
+    is_connected = True
+
+
+class _Api:
+    def __init__(self, *boxes):
+        self.settop_boxes = {box.deviceId: box for box in boxes}
+        self._mqttClient = _Client()
+        self.reconnects = 0
+
+    def reconnect_mqtt(self):
+        self.reconnects += 1
+
+
+def _watchdog(api) -> LGHorizonMqttWatchdog:
+    # Every running box counts as quiet right away
+    return LGHorizonMqttWatchdog(api, quiet_after=0, max_failed_probes=2)
+
+
+def _answer(box, ok: bool):
+    future = box.probes[-1]
+    if ok:
+        future.set_result({"source": box.deviceId})
+    else:
+        future.set_exception(LGHorizonCommandTimeoutError("no reply"))
+
+
+def test_one_silent_box_does_not_reconnect():
+    box1, box2 = _Box("box1"), _Box("box2")
+    api = _Api(box1, box2)
+    watchdog = _watchdog(api)
+    for _ in range(4):
+        watchdog.check()
+        _answer(box1, False)
+        _answer(box2, True)
+    watchdog.check()
+    assert api.reconnects == 0
+    assert watchdog.failed_probes == 4
+
+
+def test_all_probed_boxes_silent_reconnects():
+    box1, box2 = _Box("box1"), _Box("box2")
+    standby = _Box("box3", ONLINE_STANDBY)
+    api = _Api(box1, box2, standby)
+    watchdog = _watchdog(api)
+    for _ in range(2):
+        watchdog.check()
+        _answer(box1, False)
+        _answer(box2, False)
+    assert not standby.probes
+    watchdog.check()
+    assert api.reconnects == 1
+    # The counts start over on the new connection
+    watchdog.check()
+    assert api.reconnects == 1
+
+
+def test_answered_probe_resets_the_count():
+    box = _Box("box1")
+    api = _Api(box)
+    watchdog = _watchdog(api)
+    for ok in (False, True, False):
+        watchdog.check()
+        _answer(box, ok)
+    watchdog.check()
+    assert api.reconnects == 0
+    assert watchdog.probe_latency.count == 1
+
+
+def test_long_silence_reconnects():
+    api = _Api(_Box("box1"))
+    watchdog = LGHorizonMqttWatchdog(api, max_silence=0)
+    watchdog.check()
+    assert api.reconnects == 1
+
+
+class _PahoClient:
+    def __init__(self, fail=False):
+        self.calls = []
+        self.fail = fail
+
+    def loop_stop(self):
+        self.calls.append("loop_stop")
+
+    def username_pw_set(self, username, password):
+        self.calls.append("username_pw_set")
+
+    def reconnect(self):
+        self.calls.append("reconnect")
+        if self.fail:
+            raise OSError("unreachable")
+
+    def loop_start(self):
+        self.calls.append("loop_start")
+
+
+def test_client_reconnects_with_the_network_thread_stopped():
+    from lghorizon.models import LGHorizonAuth, LGHorizonMqttClient
+
+    for fail in (False, True):
+        client = LGHorizonMqttClient(LGHorizonAuth(), "wss://localhost:443/mqtt")
+        client._mqtt_client = _PahoClient(fail)
+        client.reconnect()
+        assert client._mqtt_client.calls == [
+            "loop_stop",
+            "username_pw_set",
+            "reconnect",
+            "loop_start",
+        ]